@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Los benchmarks usan el paquete p2p de la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from p2p.discovery import DiscoveryServer
+from p2p.node import Node, percentile
+
+# Benchmark de un cluster local: un servidor de descubrimiento y N nodos sobre loopback
+# en un mismo bucle asyncio, con una carga de reservas/devoluciones con contención configurable.
+# El resultado es una línea JSON por corrida para poder seguir regresiones.
+
+BASE_PORT = 21000  # Puerto del servidor de descubrimiento; los nodos usan los siguientes
+
+# Opciones del benchmark
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de reservas y gossip en un cluster local")
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--books", type=int, default=100, help="tamaño del inventario")
+    parser.add_argument("--ops", type=int, default=500, help="operaciones de la carga")
+    parser.add_argument("--concurrency", type=int, default=16, help="operaciones en vuelo a la vez")
+    parser.add_argument("--skew", type=float, default=1.0, help="exponente zipf de la elección de libros (0 = uniforme)")
+    parser.add_argument("--unreserve-ratio", type=float, default=0.5, help="probabilidad de devolver un libro propio (si hay) en lugar de reservar")
+    parser.add_argument("--reservation-mode", choices=("all", "quorum"), default="all")
+    parser.add_argument("--gossip-mode", choices=("delta", "full"), default="delta")
+    parser.add_argument("--gossip-interval", type=float, default=1.0, help="segundos medios entre rondas de gossip de cada nodo")
+    parser.add_argument("--gossip-only", action="store_true", help="sin notificaciones de reserva: las réplicas convergen solo por gossip")
+    parser.add_argument("--wire-format", choices=("binary", "json"), default="json")
+    parser.add_argument("--membership", choices=("swim", "discovery"), default="discovery")
+    parser.add_argument("--reliable", action="store_true", help="canal confiable para los mensajes de control")
+    parser.add_argument("--replication", type=int, help="réplicas por libro en el anillo de hash consistente (sin indicar, todos los nodos guardan todo)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--convergence-timeout", type=float, default=60)
+    parser.add_argument("--output", help="archivo JSONL al que se agrega el resultado")
+    return parser
+
+# Elegir libros con distribución zipf: pocos libros concentran la mayoría de los pedidos
+def book_chooser(book_ids, skew, rng):
+    weights = [1 / (rank ** skew) for rank in range(1, len(book_ids) + 1)]
+    return lambda: rng.choices(book_ids, weights)[0]
+
+# Sumar los contadores de tráfico de todos los nodos
+def total_traffic(nodes):
+    totals = {}
+    for node in nodes:
+        for key, value in node.traffic.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+# Esperar hasta que todos los nodos conozcan a todos los demás
+async def wait_for_membership(nodes, timeout=30):
+    deadline = time.monotonic() + timeout
+    while any(len(node.peers) < len(nodes) - 1 for node in nodes):
+        if time.monotonic() > deadline:
+            raise RuntimeError("los nodos no se descubrieron a tiempo")
+        await asyncio.sleep(0.05)
+
+# Si las réplicas coinciden: mismo digest en todos los nodos, o en modo particionado el mismo
+# hash de cada partición en los nodos que la guardan
+def converged(nodes):
+    if nodes[0].replication is None:
+        return len({node.digest_root() for node in nodes}) == 1
+    partitions = {}
+    for node in nodes:
+        for partition, partition_hash in node.partition_hashes().items():
+            partitions.setdefault(partition, set()).add(partition_hash)
+    return all(len(hashes) == 1 for hashes in partitions.values())
+
+# Esperar a que todas las réplicas tengan el mismo digest; devuelve los segundos que tardaron (o None)
+async def wait_for_convergence(nodes, timeout):
+    start = time.perf_counter()
+    while not converged(nodes):
+        if time.perf_counter() - start > timeout:
+            return None
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - start
+
+# Una operación de la carga: devolver uno de los libros propios o intentar reservar uno
+async def run_operation(node, book_id, unreserve, samples, rng):
+    owner = f"{node.host}:{node.port}"
+    owned = [key for key, data in node.inventory.items() if data is not None and data[1] == owner]
+    if unreserve and owned:
+        node.unreserve_book(rng.choice(owned))
+        samples.append(("unreserve", True, 0.0))
+        return
+    start = time.perf_counter()
+    approved = await node.reserve_book_async(book_id)
+    samples.append(("reserve", approved, time.perf_counter() - start))
+
+# Ejecutar la carga con un límite de operaciones concurrentes
+async def run_workload(nodes, args, rng):
+    choose_book = book_chooser([f"Recurso-{i}" for i in range(1, args.books + 1)], args.skew, rng)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    samples = []
+
+    async def limited(node, book_id, unreserve):
+        async with semaphore:
+            await run_operation(node, book_id, unreserve, samples, rng)
+
+    operations = [limited(rng.choice(nodes), choose_book(), rng.random() < args.unreserve_ratio) for _ in range(args.ops)]
+    await asyncio.gather(*operations)
+    return samples
+
+# Ejecutar una corrida completa y devolver el resultado
+async def benchmark(args):
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    discovery_addr = ("127.0.0.1", BASE_PORT)
+    server = DiscoveryServer(*discovery_addr)
+    await server.start_async()
+    nodes = [Node("127.0.0.1", BASE_PORT + 1 + i, discovery_addr,
+                  gossip_mode=args.gossip_mode,
+                  reservation_mode=args.reservation_mode,
+                  wire_format=args.wire_format,
+                  membership=args.membership,
+                  inventory_size=args.books,
+                  reliable=args.reliable,
+                  replication=args.replication,
+                  gossip_interval=args.gossip_interval) for i in range(args.nodes)]
+    for node in nodes:
+        if args.gossip_only:
+            # Sin notificar, los demás nodos solo ven los cambios al fusionar el inventario de un par
+            node.notify_peers = lambda book_id, msg_type: None
+        await node.start_async()
+    await wait_for_membership(nodes)
+
+    before = total_traffic(nodes)
+    start = time.perf_counter()
+    samples = await run_workload(nodes, args, rng)
+    elapsed = time.perf_counter() - start
+    convergence = await wait_for_convergence(nodes, args.convergence_timeout)
+    after = total_traffic(nodes)
+
+    for node in nodes:
+        node.transport.close()
+    server.transport.close()
+
+    reserves = [sample for sample in samples if sample[0] == "reserve"]
+    latencies = sorted(latency for _, _, latency in reserves)
+    reserved = sum(1 for _, approved, _ in reserves if approved)
+    traffic = {key: after[key] - before.get(key, 0) for key in after}
+    operations = len(samples)
+    return {
+        "benchmark": "cluster",
+        "nodes": args.nodes,
+        "books": args.books,
+        "ops": operations,
+        "concurrency": args.concurrency,
+        "skew": args.skew,
+        "reservation_mode": args.reservation_mode,
+        "gossip_mode": args.gossip_mode,
+        "gossip_interval": args.gossip_interval,
+        "gossip_only": args.gossip_only,
+        "wire_format": args.wire_format,
+        "membership": args.membership,
+        "reliable": args.reliable,
+        "replication": args.replication,
+        "seed": args.seed,
+        "elapsed_s": round(elapsed, 4),
+        "reservations": reserved,
+        "reservation_attempts": len(reserves),
+        "unreservations": operations - len(reserves),
+        "reservations_per_s": round(reserved / elapsed, 2) if elapsed > 0 else 0.0,
+        "ops_per_s": round(operations / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        "convergence_s": round(convergence, 4) if convergence is not None else None,
+        "messages_per_op": round(traffic["messages_sent"] / operations, 2) if operations else None,
+        "datagrams_per_op": round(traffic["datagrams_sent"] / operations, 2) if operations else None,
+        "bytes_per_op": round(traffic["bytes_sent"] / operations, 1) if operations else None
+    }
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    result = asyncio.run(benchmark(args))
+    print(json.dumps(result))
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+import time
+
+# Los benchmarks usan el paquete p2p de la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from p2p.codec import encode_binary, decode_binary
+
+# Microbenchmark del codec: costo de codificar/decodificar y bytes en el cable,
+# comparando el protocolo binario con el JSON original.
+
+# Mensajes representativos de cada tipo de tráfico
+def sample_messages():
+    inventory = {f"Recurso-{i}": (1718000000.0 + i, f"192.168.0.15:{5000 + i % 4}") if i % 3 else None for i in range(1, 1001)}
+    versions = {book_id: [i, "192.168.0.15:5000"] for i, book_id in enumerate(inventory)}
+    return {
+        "lock_request": {"type": "lock_request", "book_id": "Recurso-42", "request_id": 1234},
+        "lock_response": {"type": "lock_response", "book_id": "Recurso-42", "approved": True, "request_id": 1234},
+        "node_list": {"type": "node_list", "nodes": [["192.168.0.15", 5000 + i] for i in range(50)]},
+        "gossip_delta": {"type": "gossip_delta", "entries": {book_id: [inventory[book_id], versions[book_id]] for book_id in list(inventory)[:100]}},
+        "inventory_update": {"type": "inventory_update", "inventory": inventory, "updates": [], "versions": versions}
+    }
+
+# Tiempo medio por llamada, en microsegundos
+def time_per_call(function, argument, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(argument)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def json_encode(message):
+    return json.dumps(message).encode()
+
+def json_decode(data):
+    return json.loads(data.decode())
+
+def main(repeat=200):
+    print(f"{'mensaje':<18}{'formato':<9}{'bytes':>9}{'encode us':>12}{'decode us':>12}")
+    for name, message in sample_messages().items():
+        for label, encode, decode in (("json", json_encode, json_decode), ("binary", encode_binary, decode_binary)):
+            data = encode(message)
+            calls = max(1, repeat * 200 // max(len(data), 200))
+            encode_us = time_per_call(encode, message, calls)
+            decode_us = time_per_call(decode, data, calls)
+            print(f"{name:<18}{label:<9}{len(data):>9}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
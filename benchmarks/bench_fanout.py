@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+# Los benchmarks usan el paquete p2p de la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from p2p.node import Node
+
+# Benchmark del envío de un mismo mensaje a muchos pares (notificaciones de reserva, pedidos de
+# bloqueo) sobre sockets UDP reales en loopback. Compara el camino anterior (send_message por
+# par: codificar y un sendto por datagrama), broadcast con sendto y broadcast con sendmmsg.
+# Informa llamadas al sistema de envío y tiempo de CPU por difusión.
+
+BASE_PORT = 23000  # Puerto del nodo emisor; los pares usan los siguientes
+
+# Opciones del benchmark
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de difusión de un mensaje a muchos pares")
+    parser.add_argument("--peers", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200, help="difusiones por variante")
+    parser.add_argument("--payload", type=int, default=0, help="bytes extra en el mensaje (más de ~1200 se fragmenta)")
+    parser.add_argument("--wire-format", choices=("binary", "json"), default="json")
+    return parser
+
+# Mensaje de la difusión: una notificación de reserva como la de notify_peers
+def build_message(args):
+    message = {"type": "reservation", "book_id": "Recurso-17", "data": [time.time(), f"127.0.0.1:{BASE_PORT}"], "version": [42, f"127.0.0.1:{BASE_PORT}"]}
+    if args.payload:
+        message["note"] = "x" * args.payload
+    return message
+
+# Difusión anterior: un send_message por par
+def send_each(node, message, peers):
+    for peer in peers:
+        node.send_message(message, peer)
+
+# Medir una variante: CPU, tiempo y llamadas al sistema de envío por difusión
+def run(node, message, peers, args, variant, sender):
+    node.sender = sender if variant == "broadcast_sendmmsg" else None
+    datagrams = node.traffic["datagrams_sent"]
+    syscalls = sender.stats["syscalls"] if sender is not None else 0
+    batched = sender.stats["datagrams"] if sender is not None else 0
+    cpu = time.process_time()
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        if variant == "send_message":
+            send_each(node, message, peers)
+        else:
+            node.broadcast(message, peers)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    datagrams = node.traffic["datagrams_sent"] - datagrams
+    if sender is not None and variant == "broadcast_sendmmsg":
+        # Lo que no salió en lote (socket lleno) se envió con sendto
+        calls = sender.stats["syscalls"] - syscalls + datagrams - (sender.stats["datagrams"] - batched)
+    else:
+        calls = datagrams
+    return {
+        "variant": variant,
+        "datagrams_per_fanout": datagrams / args.rounds,
+        "syscalls_per_fanout": round(calls / args.rounds, 2),
+        "cpu_us_per_fanout": round(cpu / args.rounds * 1e6, 1),
+        "wall_us_per_fanout": round(elapsed / args.rounds * 1e6, 1),
+        "cpu_us_per_peer": round(cpu / args.rounds / len(peers) * 1e6, 2)
+    }
+
+def benchmark(args):
+    node = Node("127.0.0.1", BASE_PORT, ("127.0.0.1", BASE_PORT - 1), wire_format=args.wire_format)
+    sender = node.sender
+    receivers = []
+    for i in range(args.peers):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", BASE_PORT + 1 + i))
+        receivers.append(receiver)
+    peers = [receiver.getsockname() for receiver in receivers]
+    if args.wire_format == "binary":
+        # Pares que ya negociaron el formato binario
+        for peer in peers:
+            node.peer_codecs[peer] = "binary"
+    message = build_message(args)
+    results = []
+    try:
+        for variant in ("send_message", "broadcast_sendto", "broadcast_sendmmsg"):
+            if variant == "broadcast_sendmmsg" and sender is None:
+                continue
+            results.append(run(node, message, peers, args, variant, sender))
+    finally:
+        for receiver in receivers:
+            receiver.close()
+        node.socket.close()
+    return {"benchmark": "fanout", "peers": args.peers, "rounds": args.rounds, "message_bytes": len(node.encode_message(message, peers[0])), "sendmmsg": sender is not None, "results": results}
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    print(json.dumps(benchmark(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+
+# Los benchmarks usan el paquete p2p de la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from p2p import store as store_module
+from p2p.store import InventoryStore
+
+# Benchmark de la sincronización de inventario: compara el bucle anterior de merge_inventory
+# (una comparación y un print por recurso) con las fusiones masivas del inventario, tanto para
+# entradas con versión como para las que solo traen timestamp. El inventario local tiene una
+# parte de los recursos reservados y el remoto trae entradas más nuevas, más viejas y claves nuevas.
+
+# Opciones del benchmark
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de la fusión masiva del inventario")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="cantidades de entradas remotas, separadas por comas")
+    parser.add_argument("--reserved", type=float, default=0.3, help="fracción de recursos reservados en el inventario local")
+    parser.add_argument("--newer", type=float, default=0.2, help="fracción de entradas remotas más nuevas que las locales")
+    parser.add_argument("--new-keys", type=float, default=0.05, help="fracción de entradas remotas con claves que no existen localmente")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser
+
+# Inventario local y entradas remotas {recurso: (datos, versión)} para un tamaño
+def build_workload(size, args):
+    rng = random.Random(args.seed)
+    local_ids = [f"Recurso-{i}" for i in range(1, size + 1)]
+    store = InventoryStore("10.0.0.1:5000", local_ids)
+    for book_id in rng.sample(local_ids, int(size * args.reserved)):
+        store.set(book_id, (rng.uniform(1000, 2000), "10.0.0.1:5000"))
+    snapshot = store.snapshot()
+    new_keys = int(size * args.new_keys)
+    entries = {}
+    for book_id in rng.sample(local_ids, size - new_keys):
+        data, version = snapshot[book_id]
+        if rng.random() < args.newer:
+            data = None if data is not None and rng.random() < 0.5 else (rng.uniform(2000, 3000), "10.0.0.2:4000")
+            version = (version[0] + rng.randint(1, 3), "10.0.0.2:4000")
+        elif data is not None:
+            data = (data[0] - 1, "10.0.0.2:4000")
+        entries[book_id] = (data, version)
+    for i in range(new_keys):
+        entries[f"Remoto-{i}"] = ((rng.uniform(2000, 3000), "10.0.0.2:4000"), (1, "10.0.0.2:4000"))
+    return store, entries
+
+# Bucle anterior de merge_inventory para entradas con versión: una escritura y un print por recurso
+def loop_merge(store, entries):
+    changed = set()
+    for book_id, (data, version) in entries.items():
+        if store.apply_remote(book_id, data, version):
+            print(f"Actualizando {book_id} con versión {version}")
+            changed.add(book_id)
+    return changed
+
+# Bucle anterior de merge_inventory para entradas con timestamp
+def loop_merge_timestamps(store, entries):
+    changed = set()
+    for book_id, data in entries.items():
+        current = store.get(book_id)
+        if current is None or (data is not None and current[0] < data[0]):
+            print(f"Actualizando {book_id} con timestamp {data}")
+            store.set(book_id, data)
+            changed.add(book_id)
+    return changed
+
+# Datos visibles de un inventario (para comparar los resultados de ambos caminos)
+def visible(store):
+    return dict(store.items())
+
+# Medir una variante sobre un inventario recién construido
+def run(size, args, kind, batched):
+    store, entries = build_workload(size, args)
+    if kind == "timestamps":
+        entries = {book_id: data for book_id, (data, _) in entries.items()}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if kind == "versions":
+            changed = set(store.merge(entries)) if batched else loop_merge(store, entries)
+        else:
+            changed = set(store.merge_timestamps(entries)) if batched else loop_merge_timestamps(store, entries)
+    return time.perf_counter() - start, changed, store
+
+def benchmark(args):
+    results = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        for kind in ("versions", "timestamps"):
+            loop_s, loop_changed, loop_store = run(size, args, kind, False)
+            batch_s, batch_changed, batch_store = run(size, args, kind, True)
+            if kind == "versions":
+                same = batch_changed == loop_changed and batch_store.digest_root() == loop_store.digest_root()
+            else:
+                # El bucle anterior también reescribía (con versión nueva) las claves nuevas sin datos
+                same = {book_id for book_id in loop_changed if loop_store.get(book_id) is not None} == batch_changed and visible(batch_store) == visible(loop_store)
+            results.append({
+                "entries": size,
+                "kind": kind,
+                "changed": len(batch_changed),
+                "loop_s": round(loop_s, 3),
+                "batched_s": round(batch_s, 3),
+                "speedup": round(loop_s / batch_s, 1),
+                "batched_entries_per_s": round(size / batch_s),
+                "same_result": same
+            })
+            del loop_store, batch_store
+    return {"benchmark": "merge", "numpy": store_module.np is not None, "results": results}
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    print(json.dumps(benchmark(args)))
+
+if __name__ == "__main__":
+    main()
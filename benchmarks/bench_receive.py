@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+# Los benchmarks usan el paquete p2p de la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from p2p.node import Node
+from p2p.transport import FRAGMENT_MAGIC, RECV_BUFFER, fragment, kernel_drops
+
+BASE_PORT = 24000
+
+# Benchmark de recepción: un nodo sobre un socket UDP real recibe solicitudes de bloqueo a ritmo
+# fijo mientras le llega una ráfaga de inventory_update grandes (fragmentados). Se mide la
+# latencia de las respuestas de bloqueo sin y con la ráfaga, y lo que se pierde en el camino,
+# con el bucle anterior (recibir y atender de a un datagrama) y con las colas por carril.
+
+# Opciones del benchmark
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de latencia de bloqueos con ráfagas de gossip")
+    parser.add_argument("--resources", type=int, default=100000)
+    parser.add_argument("--entries", type=int, default=2000, help="entradas por inventory_update")
+    parser.add_argument("--gossip-rate", type=float, default=100, help="inventory_update por segundo durante la ráfaga")
+    parser.add_argument("--lock-rate", type=float, default=200, help="solicitudes de bloqueo por segundo")
+    parser.add_argument("--duration", type=float, default=5, help="segundos de cada fase")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser
+
+# Bucle de recepción anterior: cada datagrama se decodifica y se atiende antes de leer el siguiente
+def serve_inline(node):
+    while True:
+        data, addr = node.socket.recvfrom(RECV_BUFFER)
+        if data[0] == FRAGMENT_MAGIC:
+            data = node.reassembler.add(data, addr)
+            if data is None:
+                continue
+        node.handle_message(node.decode_message(data, addr), addr)
+
+# Enviar inventory_update con versiones nuevas a ritmo fijo hasta que se pida parar
+def blast_gossip(args, target, stop, sent):
+    rng = random.Random(args.seed)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1 / args.gossip_rate
+    counter = 0
+    next_send = time.perf_counter()
+    while not stop.is_set():
+        counter += 1
+        book_ids = [f"Recurso-{rng.randint(1, args.resources)}" for _ in range(args.entries)]
+        message = {
+            "type": "inventory_update",
+            "inventory": {book_id: None for book_id in book_ids},
+            "updates": [],
+            "versions": {book_id: [counter, "127.0.0.1:1"] for book_id in book_ids}
+        }
+        for datagram in fragment(json.dumps(message).encode(), counter):
+            sock.sendto(datagram, target)
+        sent[0] += 1
+        next_send += interval
+        time.sleep(max(0.0, next_send - time.perf_counter()))
+    sock.close()
+
+# Enviar solicitudes de bloqueo a ritmo fijo y medir la espera de cada respuesta
+def probe_locks(args, target, duration):
+    rng = random.Random(args.seed + 1)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.2)
+    started = {}
+    latencies = []
+
+    def receive():
+        while True:
+            try:
+                data, _ = sock.recvfrom(RECV_BUFFER)
+            except socket.timeout:
+                if done.is_set():
+                    return
+                continue
+            now = time.perf_counter()
+            request_id = json.loads(data.decode()).get("request_id")
+            if request_id in started:
+                latencies.append(now - started.pop(request_id))
+
+    done = threading.Event()
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+    interval = 1 / args.lock_rate
+    end = time.perf_counter() + duration
+    next_send = time.perf_counter()
+    request_id = 0
+    while time.perf_counter() < end:
+        request_id += 1
+        message = {"type": "lock_request", "book_id": f"Recurso-{rng.randint(1, args.resources)}", "request_id": request_id}
+        started[request_id] = time.perf_counter()
+        sock.sendto(json.dumps(message).encode(), target)
+        next_send += interval
+        time.sleep(max(0.0, next_send - time.perf_counter()))
+    time.sleep(1)
+    done.set()
+    receiver.join()
+    sock.close()
+    return request_id, sorted(latencies)
+
+# Percentil en milisegundos de una lista ordenada
+def percentile_ms(values, pct):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000, 3)
+
+# Medir una fase: solicitudes de bloqueo con o sin ráfaga de gossip
+def phase(args, node, target, gossip):
+    stop = threading.Event()
+    sent = [0]
+    drops = kernel_drops(node.socket)
+    dropped = sum(node.receive_queue.dropped.values())
+    blaster = None
+    if gossip:
+        blaster = threading.Thread(target=blast_gossip, args=(args, target, stop, sent))
+        blaster.start()
+        time.sleep(0.5)
+    requests, latencies = probe_locks(args, target, args.duration)
+    stop.set()
+    if blaster is not None:
+        blaster.join()
+    after = kernel_drops(node.socket)
+    return {
+        "gossip": gossip,
+        "gossip_messages": sent[0],
+        "lock_requests": requests,
+        "lock_lost": requests - len(latencies),
+        "lock_p50_ms": percentile_ms(latencies, 50),
+        "lock_p99_ms": percentile_ms(latencies, 99),
+        "lock_max_ms": percentile_ms(latencies, 100),
+        "kernel_drops": None if drops is None else after - drops,
+        "queue_drops": sum(node.receive_queue.dropped.values()) - dropped
+    }
+
+# Medir una variante del bucle de recepción sobre un nodo nuevo
+def run(args, variant, port):
+    node = Node("127.0.0.1", port, ("127.0.0.1", 1), inventory_size=args.resources)
+    if variant == "inline":
+        # El bucle anterior corría con el buffer de recepción por defecto del sistema
+        try:
+            with open("/proc/sys/net/core/rmem_default") as f:
+                node.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, int(f.read()))
+        except OSError:
+            pass
+        server = threading.Thread(target=serve_inline, args=(node,))
+    else:
+        server = threading.Thread(target=node.run_server)
+    server.daemon = True
+    server.start()
+    target = ("127.0.0.1", port)
+    results = [phase(args, node, target, gossip) for gossip in (False, True)]
+    return {"variant": variant, "receive_buffer": node.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF), "phases": results}
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = [run(args, variant, BASE_PORT + i) for i, variant in enumerate(("inline", "lanes"))]
+    print(json.dumps({
+        "benchmark": "receive",
+        "resources": args.resources,
+        "entries": args.entries,
+        "gossip_rate": args.gossip_rate,
+        "lock_rate": args.lock_rate,
+        "results": results
+    }))
+
+if __name__ == "__main__":
+    main()
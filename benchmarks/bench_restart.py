@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Los benchmarks usan el paquete p2p de la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from p2p.emulator import EmulatedNetwork
+from p2p.node import Node
+
+# Benchmark de reinicio con almacenamiento durable: un nodo con muchos recursos reserva una
+# parte, escribe un snapshot, sigue escribiendo en el WAL y "se cae". Luego se mide cuánto
+# tarda un nodo nuevo sobre el mismo directorio en poder responder bloqueos correctamente.
+
+# Opciones del benchmark
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de reinicio de un nodo con WAL y snapshots")
+    parser.add_argument("--resources", type=int, default=1000000)
+    parser.add_argument("--reserved", type=float, default=0.1, help="fracción de recursos reservados antes del snapshot")
+    parser.add_argument("--wal-records", type=int, default=10000, help="cambios que quedan solo en el WAL")
+    parser.add_argument("--lookups", type=int, default=1000, help="consultas de bloqueo verificadas tras el reinicio")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser
+
+# Memoria de las columnas, ids e índice del inventario
+def store_bytes(store):
+    columns = (store.offsets, store.hashes, store.timestamps, store.owners, store.counters, store.origins, store.table[0])
+    return len(store.ids) + sum(column.itemsize * len(column) for column in columns)
+
+# Crear el nodo sobre la red emulada (sin sockets) con el directorio de datos indicado
+def build_node(args, data_dir):
+    return Node("10.0.0.1", 5000, ("10.0.0.2", 4000), network=EmulatedNetwork(args.seed), inventory_size=args.resources, data_dir=data_dir)
+
+def benchmark(args, data_dir):
+    rng = random.Random(args.seed)
+    owner = "10.0.0.1:5000"
+    start = time.perf_counter()
+    node = build_node(args, data_dir)
+    first_start_s = time.perf_counter() - start
+    # Reinicio apenas sembrado, sin snapshots pedidos ni cambios en el WAL
+    node.storage.close()
+    del node
+    start = time.perf_counter()
+    node = build_node(args, data_dir)
+    seeded_restart_s = time.perf_counter() - start
+
+    book_ids = [f"Recurso-{i}" for i in range(1, args.resources + 1)]
+    for book_id in rng.sample(book_ids, int(args.resources * args.reserved)):
+        node.inventory.compare_and_set(book_id, None, (time.time(), owner))
+    start = time.perf_counter()
+    node.checkpoint()
+    checkpoint_s = time.perf_counter() - start
+
+    # Cambios posteriores al snapshot: reservas y devoluciones que solo están en el WAL
+    for _ in range(args.wal_records):
+        book_id = rng.choice(book_ids)
+        current = node.inventory.get(book_id)
+        node.inventory.compare_and_set(book_id, current, None if current else (time.time(), owner))
+    expected_root = node.digest_root()
+    sample = rng.sample(book_ids, args.lookups)
+    expected = {book_id: node.inventory.get(book_id) is None for book_id in sample}
+    node.storage.close()
+    del node
+
+    start = time.perf_counter()
+    node = build_node(args, data_dir)
+    restart_s = time.perf_counter() - start
+    correct = sum(1 for book_id in sample if (node.inventory.get(book_id) is None) == expected[book_id])
+    ready_s = time.perf_counter() - start
+    start = time.perf_counter()
+    node.inventory.snapshot()
+    snapshot_s = time.perf_counter() - start
+    return {
+        "benchmark": "restart",
+        "resources": args.resources,
+        "reserved": args.reserved,
+        "wal_records": args.wal_records,
+        "first_start_s": round(first_start_s, 3),
+        "seeded_restart_s": round(seeded_restart_s, 3),
+        "checkpoint_s": round(checkpoint_s, 3),
+        "restart_s": round(restart_s, 3),
+        "ready_s": round(ready_s, 3),
+        "lookups_correct": f"{correct}/{len(sample)}",
+        "digest_matches": node.digest_root() == expected_root,
+        "snapshot_s": round(snapshot_s, 3),
+        "bytes_per_resource": round(store_bytes(node.inventory) / len(node.inventory), 1),
+        "snapshot_mb": round(sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(data_dir) for name in names) / 2 ** 20, 1)
+    }
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory() as data_dir:
+        result = benchmark(args, data_dir)
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
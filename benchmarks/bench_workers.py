@@ -0,0 +1,123 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+# Los benchmarks usan el paquete p2p de la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from p2p.node import Node
+from p2p.transport import RECV_BUFFER
+
+BASE_PORT = 25000
+
+# Benchmark de escalado de un nodo en varios procesos: un nodo lógico con 1, 2, 4... workers
+# en el mismo puerto (SO_REUSEPORT) recibe solicitudes de bloqueo de muchos clientes, cada uno
+# con varias solicitudes en vuelo. Se mide cuántas respuestas por segundo da el nodo y qué
+# parte de las solicitudes llegó a un worker que no era el dueño del recurso.
+
+# Opciones del benchmark
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de bloqueos por segundo según los workers del nodo")
+    parser.add_argument("--workers", default="1,2,4", help="cantidades de workers a medir, separadas por comas")
+    parser.add_argument("--resources", type=int, default=100000)
+    parser.add_argument("--clients", type=int, default=4, help="procesos cliente")
+    parser.add_argument("--sockets", type=int, default=16, help="sockets (direcciones de origen) por cliente")
+    parser.add_argument("--window", type=int, default=4, help="solicitudes en vuelo por socket")
+    parser.add_argument("--duration", type=float, default=5)
+    return parser
+
+# Proceso de un worker del nodo: solo atiende la red (sin servidor de descubrimiento)
+def serve(args, port, workers, worker, ready):
+    node = Node("127.0.0.1", port, ("127.0.0.1", 1), membership="discovery", inventory_size=args.resources, workers=workers, worker=worker)
+    server = threading.Thread(target=node.run_server)
+    server.daemon = True
+    server.start()
+    ready.set()
+    threading.Event().wait()
+
+# Proceso cliente: mantiene window solicitudes en vuelo por socket y cuenta respuestas
+def client(args, port, seed, start_at, results):
+    rng = random.Random(seed)
+    target = ("127.0.0.1", port)
+    sockets = []
+    for _ in range(args.sockets):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.setblocking(False)
+        sockets.append(sock)
+    request_ids = iter(range(1, 1 << 62))
+
+    def send(sock):
+        message = {"type": "lock_request", "book_id": f"Recurso-{rng.randint(1, args.resources)}", "request_id": next(request_ids)}
+        sock.sendto(json.dumps(message).encode(), target)
+
+    time.sleep(max(0.0, start_at - time.time()))
+    for sock in sockets:
+        for _ in range(args.window):
+            send(sock)
+    responses = approved = 0
+    end = time.time() + args.duration
+    while time.time() < end:
+        idle = True
+        for sock in sockets:
+            try:
+                data, _ = sock.recvfrom(RECV_BUFFER)
+            except BlockingIOError:
+                continue
+            idle = False
+            responses += 1
+            approved += json.loads(data.decode())["approved"]
+            send(sock)
+        if idle:
+            time.sleep(0.0005)
+    results.put((responses, approved))
+
+# Medir un nodo con una cantidad de workers
+def run(args, workers, port):
+    context = multiprocessing.get_context("fork")
+    ready = [context.Event() for _ in range(workers)]
+    servers = [context.Process(target=serve, args=(args, port, workers, i, ready[i]), daemon=True) for i in range(workers)]
+    for process in servers:
+        process.start()
+    for event in ready:
+        event.wait()
+    results = context.Queue()
+    start_at = time.time() + 0.5
+    clients = [context.Process(target=client, args=(args, port, i, start_at, results)) for i in range(args.clients)]
+    for process in clients:
+        process.start()
+    totals = [results.get() for _ in clients]
+    for process in clients:
+        process.join()
+    for process in servers:
+        process.terminate()
+    responses = sum(total[0] for total in totals)
+    return {
+        "workers": workers,
+        "locks_per_s": round(responses / args.duration, 1),
+        "approved": round(sum(total[1] for total in totals) / max(1, responses), 3),
+        "forwarded": round((workers - 1) / workers, 3)
+    }
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    counts = [int(count) for count in args.workers.split(",")]
+    results = [run(args, workers, BASE_PORT + i) for i, workers in enumerate(counts)]
+    print(json.dumps({
+        "benchmark": "workers",
+        "cpus": os.cpu_count(),
+        "resources": args.resources,
+        "clients": args.clients,
+        "sockets": args.sockets,
+        "window": args.window,
+        "results": results
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Los benchmarks usan el paquete p2p de la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from p2p.node import Node, percentile
+
+# Simulación local de varios nodos en un mismo bucle asyncio: se "matan" algunos
+# nodos (dejan de responder) y se mide latencia y corrección de las reservas.
+
+BASE_PORT = 16000  # Primer puerto de los nodos simulados
+
+# Detener un nodo simulado: deja de hacer gossip, de enviar latidos y de recibir
+def stop_node(node):
+    node.gossip_task.cancel()
+    node.heartbeat_task.cancel()
+    node.transport.close()
+
+# Reservar un libro midiendo cuánto tarda la decisión
+async def timed_reservation(node, book_id):
+    start = time.perf_counter()
+    approved = await node.reserve_book_async(book_id)
+    return node, book_id, approved, time.perf_counter() - start
+
+# Ejecutar una simulación con la cantidad de nodos, nodos caídos y modo de reserva indicados
+async def simulate(mode, total_nodes=7, killed=2, books=20, contenders=2, seed=1):
+    rng = random.Random(seed)
+    nodes = [Node("127.0.0.1", BASE_PORT + i, ("127.0.0.1", BASE_PORT - 1), reservation_mode=mode, membership="discovery", inventory_size=books) for i in range(total_nodes)]
+    for node in nodes:
+        await node.start_async()
+    addresses = [(node.host, node.port) for node in nodes]
+    for node in nodes:
+        node.peers = [addr for addr in addresses if addr != (node.host, node.port)]
+
+    # Los nodos caídos dejan de recibir y de hacer gossip, pero siguen en la lista de pares
+    for node in nodes[total_nodes - killed:]:
+        stop_node(node)
+    alive = nodes[:total_nodes - killed]
+
+    book_ids = list(nodes[0].inventory)
+    half = len(book_ids) // 2
+
+    # Primera mitad: cada libro lo pide un solo nodo vivo (latencia sin contención)
+    uncontended = await asyncio.gather(*[timed_reservation(rng.choice(alive), book_id) for book_id in book_ids[:half]])
+
+    # Segunda mitad: varios nodos vivos compiten a la vez por cada libro (corrección)
+    attempts = []
+    for book_id in book_ids[half:]:
+        for node in rng.sample(alive, min(contenders, len(alive))):
+            attempts.append(timed_reservation(node, book_id))
+    contended = await asyncio.gather(*attempts)
+
+    winners = {}
+    for node, book_id, approved, _ in uncontended + contended:
+        if approved:
+            winners.setdefault(book_id, []).append(f"{node.host}:{node.port}")
+    latencies = sorted(latency for _, _, _, latency in uncontended)
+
+    for node in alive:
+        stop_node(node)
+    await asyncio.sleep(0)
+
+    return {
+        "mode": mode,
+        "nodes": total_nodes,
+        "killed": killed,
+        "uncontended_reserved": sum(1 for _, _, approved, _ in uncontended if approved),
+        "uncontended_attempts": len(uncontended),
+        "contended_reserved": len({book_id for _, book_id, approved, _ in contended if approved}),
+        "contended_books": len(book_ids) - half,
+        "double_reservations": sum(1 for owners in winners.values() if len(owners) > 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2)
+    }
+
+async def main():
+    results = []
+    for mode in ("all", "quorum"):
+        results.append(await simulate(mode))
+    for result in results:
+        print(json.dumps(result))
+    if any(result["double_reservations"] for result in results if result["mode"] == "quorum"):
+        print("ERROR: hubo libros reservados por más de un nodo en modo quórum")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
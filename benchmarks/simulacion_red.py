@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Los benchmarks usan el paquete p2p de la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from p2p.emulator import EmulatedNetwork, LinkProfile, lognormal, run_virtual
+from p2p.node import Node, percentile
+
+# Simulación de miles de nodos sobre la red emulada, en tiempo virtual: reservas con
+# condiciones de WAN (latencia de cola larga, pérdida, duplicación, reordenamiento) y luego
+# una partición en dos grupos. Mide el éxito de las reservas y el tiempo de convergencia.
+
+# Opciones de la simulación
+def build_parser():
+    parser = argparse.ArgumentParser(description="Simulación de una red P2P emulada en tiempo virtual")
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--books", type=int, default=100)
+    parser.add_argument("--reservations", type=int, default=40, help="reservas por fase")
+    parser.add_argument("--window", type=float, default=10, help="segundos virtuales en los que se reparten las reservas")
+    parser.add_argument("--latency", type=float, default=0.04, help="mediana de la latencia en segundos")
+    parser.add_argument("--jitter", type=float, default=0.5, help="dispersión (sigma) de la latencia log-normal")
+    parser.add_argument("--drop", type=float, default=0.01)
+    parser.add_argument("--duplicate", type=float, default=0.005)
+    parser.add_argument("--reorder", type=float, default=0.01)
+    parser.add_argument("--partition", type=float, default=20, help="segundos virtuales de partición (0 = sin partición)")
+    parser.add_argument("--reservation-mode", choices=("all", "quorum"), default="quorum")
+    parser.add_argument("--membership", choices=("swim", "discovery"), default="discovery")
+    parser.add_argument("--convergence-timeout", type=float, default=300)
+    parser.add_argument("--reliable", action="store_true", help="canal confiable para los mensajes de control")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser
+
+# Esperar (en tiempo virtual) a que todas las réplicas tengan el mismo digest
+async def wait_for_convergence(nodes, timeout):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    while len({node.digest_root() for node in nodes}) > 1:
+        if loop.time() - start > timeout:
+            return None
+        await asyncio.sleep(0.1)
+    return loop.time() - start
+
+# Lanzar reservas repartidas en la ventana; devuelve (nodo, libro, aprobada, latencia virtual)
+async def reservation_phase(nodes, books, count, window, rng):
+    loop = asyncio.get_running_loop()
+
+    async def reserve(node, book_id, delay):
+        await asyncio.sleep(delay)
+        start = loop.time()
+        approved = await node.reserve_book_async(book_id)
+        return node, book_id, approved, loop.time() - start
+
+    return await asyncio.gather(*[reserve(rng.choice(nodes), rng.choice(books), rng.uniform(0, window)) for _ in range(count)])
+
+# Resumen de una fase de reservas
+def summarize(results):
+    winners = {}
+    for node, book_id, approved, _ in results:
+        if approved:
+            winners.setdefault(book_id, set()).add((node.host, node.port))
+    latencies = sorted(latency for _, _, _, latency in results)
+    return {
+        "attempts": len(results),
+        "approved": sum(1 for _, _, approved, _ in results if approved),
+        "success_rate": round(sum(1 for _, _, approved, _ in results if approved) / len(results), 3) if results else None,
+        "conflicting_books": sum(1 for owners in winners.values() if len(owners) > 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None
+    }
+
+async def simulate(args):
+    rng = random.Random(args.seed)
+    random.seed(args.seed)  # El gossip y SWIM usan el generador global
+    profile = LinkProfile(latency=lognormal(args.latency, args.jitter), drop=args.drop, duplicate=args.duplicate, reorder=args.reorder)
+    network = EmulatedNetwork(args.seed, profile)
+    discovery_addr = ("10.255.255.254", 4000)  # Sin servidor: la membresía inicial se carga directamente
+    addresses = [(f"10.0.{i // 250}.{i % 250 + 1}", 5000) for i in range(args.nodes)]
+    nodes = [Node(host, port, discovery_addr,
+                  reservation_mode=args.reservation_mode,
+                  membership=args.membership,
+                  inventory_size=args.books,
+                  network=network,
+                  reliable=args.reliable) for host, port in addresses]
+    for node in nodes:
+        await node.start_async()
+        node.peers = [addr for addr in addresses if addr != (node.host, node.port)]
+    books = list(nodes[0].inventory)
+
+    result = {"nodes": args.nodes, "reservation_mode": args.reservation_mode, "reliable": args.reliable, "drop": args.drop, "latency_ms": args.latency * 1000, "seed": args.seed}
+
+    wan = await reservation_phase(nodes, books, args.reservations, args.window, rng)
+    result["wan"] = summarize(wan)
+    convergence = await wait_for_convergence(nodes, args.convergence_timeout)
+    result["wan"]["convergence_s"] = round(convergence, 2) if convergence is not None else None
+
+    if args.partition > 0:
+        # Partición desigual (60/40): en modo quórum solo el lado mayoritario puede reservar
+        cut = len(addresses) * 3 // 5
+        network.partition(addresses[:cut], addresses[cut:])
+        split = await reservation_phase(nodes, books, args.reservations, min(args.window, args.partition), rng)
+        result["partition"] = summarize(split)
+        await asyncio.sleep(max(0, args.partition - args.window))
+        network.heal()
+        convergence = await wait_for_convergence(nodes, args.convergence_timeout)
+        result["partition"]["convergence_after_heal_s"] = round(convergence, 2) if convergence is not None else None
+
+    result["virtual_s"] = round(asyncio.get_running_loop().time(), 1)
+    result["network"] = dict(network.stats)
+    if args.reliable:
+        result["reliable_stats"] = {key: sum(node.channel.stats[key] for node in nodes) for key in nodes[0].channel.stats}
+    for node in nodes:
+        node.transport.close()
+    return result
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+    result = run_virtual(simulate(args))
+    result["real_s"] = round(time.perf_counter() - start, 1)
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# Biblioteca de nodos P2P de reservas: nodos, servidor de descubrimiento, protocolo y lanzador
+import logging
+
+from .codec import MessageType, encode_binary, decode_binary
+from .transport import Reassembler, fragment, get_local_ip
+from .metrics import REGISTRY, MetricsDumper, MetricsServer
+from .oplog import OpLog
+from .store import InventoryStore
+from .storage import Storage, SnapshotFile, WriteAheadLog
+from .reliable import ReliableChannel, RttEstimator
+from .workers import shard_of
+from .ring import HashRing, Placement, partition_of
+from .node import Node, PendingLock, NodeProtocol, percentile, run_nodes, start_node
+from .discovery import DiscoveryServer, DiscoveryProtocol
+from .emulator import EmulatedNetwork, LinkProfile, VirtualTimeLoop, run_virtual
+from .launcher import main
+
+# La biblioteca no muestra registros salvo que la aplicación configure logging (el lanzador lo hace)
+logging.getLogger(__name__).addHandler(logging.NullHandler())
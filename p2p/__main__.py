@@ -0,0 +1,4 @@
+from .launcher import main
+
+if __name__ == "__main__":
+    main()
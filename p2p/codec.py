@@ -0,0 +1,153 @@
+import struct
+from enum import IntEnum
+
+PROTOCOL_VERSION = 1  # Versión del protocolo binario
+WIRE_MAGIC = 0xB7  # Primer byte de todo mensaje binario (un mensaje JSON empieza con "{")
+HEADER = struct.Struct("!BBBI")  # Mágico, versión, tipo de mensaje y largo del cuerpo
+FLOAT = struct.Struct("!d")
+
+# Etiquetas de los valores del cuerpo binario
+TAG_NONE, TAG_FALSE, TAG_TRUE, TAG_INT, TAG_FLOAT, TAG_STR, TAG_LIST, TAG_DICT = range(8)
+
+# Tipos de mensaje del protocolo; OTHER lleva el tipo como texto dentro del cuerpo
+class MessageType(IntEnum):
+    OTHER = 0
+    JOIN = 1
+    GET_NODES = 2
+    NODE_LIST = 3
+    INVENTORY_UPDATE = 4
+    GOSSIP_DIGEST = 5
+    GOSSIP_BUCKETS = 6
+    GOSSIP_VERSIONS = 7
+    GOSSIP_PULL = 8
+    GOSSIP_DELTA = 9
+    OPLOG_UPDATE = 10
+    LOCK_REQUEST = 11
+    LOCK_RESPONSE = 12
+    LOCK_RELEASE = 13
+    RESERVATION = 14
+    UNRESERVE = 15
+    NODE_JOINED = 16
+    NODE_LEFT = 17
+    NODE_CHANGES = 18
+    LEAVE = 19
+    HEARTBEAT = 20
+    GET_STATS = 21
+    STATS = 22
+    PING = 23
+    PING_REQ = 24
+    ACK = 25
+    RELIABLE_ACK = 26
+
+MESSAGE_CODES = {member.name.lower(): member for member in MessageType if member is not MessageType.OTHER}
+
+# Escribir un entero sin signo en formato varint
+def write_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+# Leer un varint; devuelve (valor, nueva posición)
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+# Serializar un valor (None, bool, int, float, str, lista/tupla o dict con claves str)
+def write_value(value, out):
+    if value is None:
+        out.append(TAG_NONE)
+    elif value is True:
+        out.append(TAG_TRUE)
+    elif value is False:
+        out.append(TAG_FALSE)
+    elif isinstance(value, int):
+        out.append(TAG_INT)
+        write_varint(value << 1 if value >= 0 else (-value << 1) - 1, out)
+    elif isinstance(value, float):
+        out.append(TAG_FLOAT)
+        out += FLOAT.pack(value)
+    elif isinstance(value, str):
+        raw = value.encode()
+        out.append(TAG_STR)
+        write_varint(len(raw), out)
+        out += raw
+    elif isinstance(value, (list, tuple)):
+        out.append(TAG_LIST)
+        write_varint(len(value), out)
+        for item in value:
+            write_value(item, out)
+    elif isinstance(value, dict):
+        out.append(TAG_DICT)
+        write_varint(len(value), out)
+        for key, item in value.items():
+            raw = key.encode()
+            write_varint(len(raw), out)
+            out += raw
+            write_value(item, out)
+    else:
+        raise TypeError(f"Tipo no serializable en el protocolo binario: {type(value).__name__}")
+
+# Deserializar un valor; devuelve (valor, nueva posición)
+def read_value(data, pos):
+    tag = data[pos]
+    pos += 1
+    if tag == TAG_NONE:
+        return None, pos
+    if tag == TAG_TRUE:
+        return True, pos
+    if tag == TAG_FALSE:
+        return False, pos
+    if tag == TAG_INT:
+        raw, pos = read_varint(data, pos)
+        return (raw >> 1) if not raw & 1 else -((raw + 1) >> 1), pos
+    if tag == TAG_FLOAT:
+        return FLOAT.unpack_from(data, pos)[0], pos + FLOAT.size
+    if tag == TAG_STR:
+        length, pos = read_varint(data, pos)
+        return data[pos:pos + length].decode(), pos + length
+    if tag == TAG_LIST:
+        count, pos = read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = read_value(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == TAG_DICT:
+        count, pos = read_varint(data, pos)
+        result = {}
+        for _ in range(count):
+            length, pos = read_varint(data, pos)
+            key = data[pos:pos + length].decode()
+            result[key], pos = read_value(data, pos + length)
+        return result, pos
+    raise ValueError(f"Etiqueta desconocida en el mensaje binario: {tag}")
+
+# Codificar un mensaje en el formato binario: cabecera fija + cuerpo etiquetado
+def encode_binary(message):
+    code = MESSAGE_CODES.get(message["type"], MessageType.OTHER)
+    body = bytearray()
+    if code is MessageType.OTHER:
+        write_value(message, body)
+    else:
+        write_value({key: value for key, value in message.items() if key != "type"}, body)
+    return HEADER.pack(WIRE_MAGIC, PROTOCOL_VERSION, code, len(body)) + body
+
+# Decodificar un mensaje binario validando versión y largo
+def decode_binary(data):
+    magic, version, code, length = HEADER.unpack_from(data)
+    if magic != WIRE_MAGIC or version > PROTOCOL_VERSION:
+        raise ValueError(f"Mensaje binario no soportado (versión {version})")
+    if len(data) < HEADER.size + length:
+        raise ValueError("Mensaje binario truncado")
+    message, _ = read_value(data, HEADER.size)
+    if code != MessageType.OTHER:
+        message["type"] = MessageType(code).name.lower()
+    return message
@@ -0,0 +1,251 @@
+import socket
+import threading
+import asyncio
+import itertools
+import json
+import time
+import logging
+from collections import OrderedDict, deque
+
+from .codec import PROTOCOL_VERSION, WIRE_MAGIC, encode_binary, decode_binary
+from .metrics import REGISTRY
+from .transport import FRAGMENT_MAGIC, MIN_BATCH, RECV_BUFFER, Reassembler, batch_sender, fragment
+
+MEMBER_TTL = 15  # Segundos sin latidos tras los cuales un nodo se considera caído
+MAX_EXPIRED_MEMBERS = 1000  # Nodos vencidos que se recuerdan para las estadísticas
+
+log = logging.getLogger(__name__)
+
+# Métricas del servidor de descubrimiento (etiqueta server = "host:puerto")
+MESSAGES_RECEIVED = REGISTRY.counter("p2p_discovery_messages_received_total", "Mensajes recibidos por el servidor de descubrimiento por tipo", ("server", "type"))
+BYTES_RECEIVED = REGISTRY.counter("p2p_discovery_received_bytes_total", "Bytes recibidos por el servidor de descubrimiento", ("server",))
+BYTES_SENT = REGISTRY.counter("p2p_discovery_sent_bytes_total", "Bytes enviados por el servidor de descubrimiento", ("server",))
+HANDLE_SECONDS = REGISTRY.histogram("p2p_discovery_handle_message_seconds", "Duración de handle_message del servidor de descubrimiento por tipo", ("server", "type"))
+MEMBERS = REGISTRY.gauge("p2p_discovery_members", "Nodos vivos y vencidos conocidos por el servidor de descubrimiento", ("server", "state"))
+
+# Clase que representa el servidor de descubrimiento
+class DiscoveryServer:
+    def __init__(self, host, port, member_ttl=MEMBER_TTL, network=None):
+        self.host = host
+        self.port = port
+        self.name = f"{host}:{port}"  # Identificación del servidor en los registros y métricas
+        self.members = {}  # Nodos conectados: dirección -> último latido (en orden de alta)
+        self.expired = OrderedDict()  # Nodos que vencieron sin retirarse: dirección -> momento del vencimiento
+        self.member_ttl = member_ttl
+        self.epoch = 0  # Época de la membresía: aumenta con cada alta o baja
+        self.events = deque(maxlen=1000)  # Últimos cambios de membresía: [época, tipo, nodo]
+        # Altas, bajas, vencimientos y la época cambian desde el hilo de recepción y el de vencimientos
+        self.mutex = threading.RLock()
+        self.socket = None  # Socket del servidor, reutilizado para todos los envíos
+        self.transport = None  # Transporte asyncio cuando el servidor corre en el runtime asíncrono
+        self.sender = None  # Envío en lote (sendmmsg) por el socket del servidor, si el sistema lo tiene
+        self.peer_codecs = {}  # Nodos que hablan el protocolo binario
+        self.reassembler = Reassembler()  # Reensamblado de mensajes que llegan fragmentados
+        self.message_ids = itertools.count(1)  # Ids de los mensajes fragmentados enviados
+        self.network = network  # Red alternativa (por ejemplo el emulador); None usa un socket UDP real
+        self.loop = None  # Bucle asyncio cuando el servidor corre en el runtime asíncrono
+        for state in ("live", "expired"):
+            MEMBERS.track(self, lambda server, state=state: server.member_counts()[state], self.name, state)
+
+    # Método para iniciar el servidor en un hilo separado
+    def start_server(self):
+        server = threading.Thread(target=self.run_server)
+        server.daemon = True
+        server.start()
+        reaper = threading.Thread(target=self.reap_members)
+        reaper.daemon = True
+        reaper.start()
+
+    # Método principal del servidor que escucha mensajes de nodos
+    def run_server(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.bind((self.host, self.port))
+        self.socket = s
+        self.sender = batch_sender(s)
+        log.info("Servidor de descubrimiento iniciado en %s", self.name)
+
+        while True:
+            data, addr = s.recvfrom(RECV_BUFFER)  # Recibir datos de los nodos
+            message = self.receive_datagram(data, addr)
+            if message is None:
+                continue
+            self.handle_message(message, addr)
+
+    # Iniciar el servidor sobre el bucle asyncio actual en lugar de usar un hilo
+    async def start_async(self):
+        self.loop = asyncio.get_running_loop()
+        # El bucle asyncio es la red por defecto: el emulador ofrece el mismo create_datagram_endpoint
+        network = self.network or self.loop
+        await network.create_datagram_endpoint(lambda: DiscoveryProtocol(self), local_addr=(self.host, self.port))
+        self.reaper_task = self.loop.create_task(self.reap_members_async())
+        log.info("Servidor de descubrimiento asyncio iniciado en %s", self.name)
+
+    # Reloj monótono del servidor: en el runtime asyncio es el del bucle (virtual si se usa el emulador)
+    def now(self):
+        if self.loop is not None:
+            return self.loop.time()
+        return time.monotonic()
+
+    # Manejar un mensaje de un nodo, contándolo y midiendo cuánto tarda por tipo
+    def handle_message(self, message, addr):
+        message_type = message["type"]
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Mensaje recibido de %s: %s", addr, message)
+        started = time.perf_counter()
+        try:
+            self.dispatch_message(message, tuple(addr))
+        finally:
+            HANDLE_SECONDS.observe(time.perf_counter() - started, self.name, message_type)
+            MESSAGES_RECEIVED.inc(self.name, message_type)
+
+    # Manejar los mensajes de los nodos
+    def dispatch_message(self, message, addr):
+        with self.mutex:
+            if message["type"] == "join":
+                self.add_member(addr)
+                self.send_node_list(addr)  # Enviar la lista completa solo al nodo nuevo
+            elif message["type"] == "heartbeat":
+                if addr in self.members:
+                    self.members[addr] = self.now()
+                else:
+                    # Un latido de un nodo vencido (o desconocido) lo vuelve a dar de alta
+                    self.add_member(addr)
+                    self.send_node_list(addr)
+            elif message["type"] == "leave":
+                if self.members.pop(addr, None) is not None:
+                    log.info("Nodo retirado: %s", addr)
+                    self.record_event("node_left", addr)
+            elif message["type"] == "get_nodes":
+                self.send_changes(addr, message.get("since"))  # Enviar cambios (o la lista) solo a quien la pide
+            elif message["type"] == "get_stats":
+                self.broadcast(dict(self.member_counts(), type="stats", epoch=self.epoch), [addr])
+
+    # Dar de alta un nodo (o refrescarlo si ya estaba) sin duplicarlo
+    def add_member(self, addr):
+        known = addr in self.members
+        self.members[addr] = self.now()
+        if not known:
+            self.expired.pop(addr, None)
+            log.info("Nuevo nodo unido: %s", addr)
+            self.record_event("node_joined", addr)  # Avisar el alta a los demás nodos
+
+    # Dar de baja los nodos que dejaron de enviar latidos
+    def expire_members(self):
+        with self.mutex:
+            now = self.now()
+            for addr in [addr for addr, last_seen in list(self.members.items()) if now - last_seen > self.member_ttl]:
+                del self.members[addr]
+                self.expired[addr] = now
+                if len(self.expired) > MAX_EXPIRED_MEMBERS:
+                    self.expired.popitem(last=False)
+                log.warning("Nodo vencido por falta de latidos: %s", addr)
+                self.record_event("node_left", addr)
+
+    # Cantidad de nodos vivos y de nodos vencidos
+    def member_counts(self):
+        return {"live": len(self.members), "expired": len(self.expired)}
+
+    # Revisar periódicamente los vencimientos (runtime con hilos)
+    def reap_members(self):
+        while True:
+            time.sleep(self.member_ttl / 3)
+            try:
+                self.expire_members()
+            except Exception:
+                log.exception("Error al revisar los vencimientos de la membresía")
+
+    # Revisar periódicamente los vencimientos (runtime asyncio)
+    async def reap_members_async(self):
+        while True:
+            await asyncio.sleep(self.member_ttl / 3)
+            self.expire_members()
+
+    # Registrar un cambio de membresía y difundirlo una sola vez serializado
+    def record_event(self, kind, node):
+        with self.mutex:
+            self.epoch += 1
+            self.events.append([self.epoch, kind, list(node)])
+            event = {"type": kind, "node": list(node), "epoch": self.epoch}
+            self.broadcast(event, [other for other in self.members if other != node])
+
+    # Enviar a un nodo los cambios desde la época que conoce, o la lista completa si es muy vieja
+    def send_changes(self, node, since):
+        if since is not None and self.events and since >= self.events[0][0] - 1:
+            message = {"type": "node_changes", "epoch": self.epoch, "events": [event for event in self.events if event[0] > since]}
+            self.broadcast(message, [node])
+        else:
+            self.send_node_list(node)
+
+    # Procesar un datagrama: si es un fragmento se reensambla y solo se decodifica el mensaje completo
+    def receive_datagram(self, data, addr):
+        BYTES_RECEIVED.inc(self.name, amount=len(data))
+        if data[0] == FRAGMENT_MAGIC:
+            data = self.reassembler.add(data, addr)
+            if data is None:
+                return None
+        return self.decode_message(data, addr)
+
+    # Decodificar un datagrama (binario o JSON) y recordar si el nodo habla binario
+    def decode_message(self, data, addr):
+        if data[0] == WIRE_MAGIC:
+            message = decode_binary(data)
+            self.peer_codecs[tuple(addr)] = "binary"
+        else:
+            message = json.loads(data.decode())
+            if message.get("bin", 0) >= 1:
+                self.peer_codecs[tuple(addr)] = "binary"
+        return message
+
+    # Codificar un mensaje en el formato que entiende cada nodo
+    def encode_message(self, message, node):
+        if self.peer_codecs.get(tuple(node)) == "binary":
+            return encode_binary(message)
+        return json.dumps(dict(message, bin=PROTOCOL_VERSION)).encode()
+
+    # Método para enviar la lista completa de nodos a un nodo
+    def send_node_list(self, node):
+        message = {"type": "node_list", "nodes": list(self.members), "epoch": self.epoch}
+        self.broadcast(message, [node])
+        log.debug("Enviando lista de nodos a %s (época %d)", node, self.epoch)
+
+    # Enviar el mismo mensaje a varios nodos codificándolo una sola vez por formato; todos los
+    # datagramas salen juntos
+    def broadcast(self, message, targets):
+        encoded = {}
+        packets = []
+        for node in targets:
+            codec = self.peer_codecs.get(tuple(node), "json")
+            if codec not in encoded:
+                encoded[codec] = fragment(self.encode_message(message, node), next(self.message_ids) & 0xFFFFFFFF)
+            packets.extend((datagram, node) for datagram in encoded[codec])
+        self.send_datagrams(packets)
+
+    # Enviar datagramas [(datos, nodo)]: en lote si hay sendmmsg y el transporte no tiene envíos
+    # encolados; lo que no sale en lote va de a uno por el transporte asyncio o el socket del servidor
+    def send_datagrams(self, packets):
+        BYTES_SENT.inc(self.name, amount=sum(len(datagram) for datagram, _ in packets))
+        sent = 0
+        if self.sender is not None and len(packets) >= MIN_BATCH and (self.transport is None or not self.transport.get_write_buffer_size()):
+            sent = self.sender.send(packets)
+        for datagram, node in packets[sent:]:
+            if self.transport is not None:
+                self.transport.sendto(datagram, node)
+                continue
+            if self.socket is None:
+                self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.sendto(datagram, node)
+
+# Protocolo asyncio que entrega al servidor los datagramas recibidos
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def connection_made(self, transport):
+        self.server.transport = transport
+        self.server.sender = batch_sender(transport.get_extra_info("socket"))
+
+    def datagram_received(self, data, addr):
+        message = self.server.receive_datagram(data, addr)
+        if message is None:
+            return
+        self.server.handle_message(message, addr)
@@ -0,0 +1,182 @@
+import asyncio
+import math
+import random
+import selectors
+
+# Emulador de red en memoria para simular miles de nodos en un solo proceso.
+#
+# Una "red" es cualquier objeto con una corrutina create_datagram_endpoint(protocol_factory, local_addr)
+# que devuelve (transporte, protocolo), igual que el bucle asyncio. Node y DiscoveryServer aceptan
+# network=EmulatedNetwork(...) y en ese caso no abren sockets: los datagramas se entregan con
+# call_later según la latencia, pérdida, duplicación, reordenamiento y particiones configuradas.
+# Con VirtualTimeLoop el tiempo avanza solo cuando no hay nada listo para ejecutar, así que
+# minutos de simulación corren en segundos reales y con la misma semilla el resultado se repite.
+
+# Latencia constante
+def constant(seconds):
+    return lambda rng: seconds
+
+# Latencia uniforme entre low y high segundos
+def uniform(low, high):
+    return lambda rng: rng.uniform(low, high)
+
+# Latencia log-normal (cola larga, como en una WAN): mediana en segundos y dispersión sigma
+def lognormal(median, sigma):
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+# Selector que en lugar de bloquear avanza un reloj virtual hasta el próximo temporizador
+class VirtualSelector(selectors.DefaultSelector):
+    def __init__(self):
+        super().__init__()
+        self.now = 0.0
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events:
+            return events
+        if timeout is None:
+            # No hay temporizadores: solo puede despertar un descriptor real
+            return super().select(None)
+        self.now += timeout
+        return events
+
+# Bucle asyncio con tiempo virtual: asyncio.sleep, call_later y wait_for usan el reloj del selector
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        self.virtual_selector = VirtualSelector()
+        super().__init__(self.virtual_selector)
+
+    def time(self):
+        return self.virtual_selector.now
+
+# Ejecutar una corrutina en un bucle de tiempo virtual (equivalente a asyncio.run)
+def run_virtual(coroutine):
+    loop = VirtualTimeLoop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        # Cancelar las tareas que quedaron corriendo (gossip, latidos, detector de fallas)
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            # gather sin tareas crearía su future en el bucle por defecto, no en el virtual
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+
+# Transporte de un punto de la red emulada; imita la interfaz de un DatagramTransport
+class EmulatedTransport(asyncio.DatagramTransport):
+    def __init__(self, network, addr, protocol):
+        super().__init__()
+        self.network = network
+        self.addr = addr
+        self.protocol = protocol
+        self.closing = False
+
+    def sendto(self, data, addr=None):
+        if not self.closing:
+            self.network.send(self.addr, bytes(data), tuple(addr))
+
+    def get_extra_info(self, name, default=None):
+        if name == "sockname":
+            return self.addr
+        return default
+
+    def is_closing(self):
+        return self.closing
+
+    def close(self):
+        if not self.closing:
+            self.closing = True
+            self.network.unregister(self.addr)
+            self.protocol.connection_lost(None)
+
+    def abort(self):
+        self.close()
+
+# Parámetros de un enlace: latencia, pérdida, duplicación y reordenamiento
+class LinkProfile:
+    def __init__(self, latency=constant(0.001), drop=0.0, duplicate=0.0, reorder=0.0, reorder_delay=constant(0.05)):
+        self.latency = latency  # Función rng -> segundos de latencia de cada datagrama
+        self.drop = drop  # Probabilidad de perder un datagrama
+        self.duplicate = duplicate  # Probabilidad de entregar un datagrama dos veces
+        self.reorder = reorder  # Probabilidad de retrasar un datagrama para que llegue después de los siguientes
+        self.reorder_delay = reorder_delay  # Retraso extra de los datagramas reordenados
+
+# Red emulada en memoria, determinista para una semilla dada
+class EmulatedNetwork:
+    def __init__(self, seed=0, profile=None):
+        self.rng = random.Random(seed)
+        self.profile = profile or LinkProfile()  # Perfil por defecto de todos los enlaces
+        self.links = {}  # Perfiles particulares por (origen, destino)
+        self.endpoints = {}  # Dirección -> protocolo que recibe sus datagramas
+        self.groups = None  # Particiones activas: dirección -> número de grupo
+        self.stats = {"sent": 0, "delivered": 0, "dropped": 0, "duplicated": 0, "reordered": 0, "partitioned": 0, "unreachable": 0}
+
+    # Crear un punto de la red; misma firma que loop.create_datagram_endpoint
+    async def create_datagram_endpoint(self, protocol_factory, local_addr):
+        addr = tuple(local_addr)
+        if addr in self.endpoints:
+            raise OSError(f"La dirección {addr} ya está en uso en la red emulada")
+        protocol = protocol_factory()
+        transport = EmulatedTransport(self, addr, protocol)
+        self.endpoints[addr] = protocol
+        protocol.connection_made(transport)
+        return transport, protocol
+
+    # Quitar un punto de la red (los datagramas en vuelo hacia él se pierden)
+    def unregister(self, addr):
+        self.endpoints.pop(addr, None)
+
+    # Usar un perfil particular para el enlace origen -> destino (y el inverso si symmetric)
+    def set_link(self, source, destination, profile, symmetric=True):
+        self.links[(tuple(source), tuple(destination))] = profile
+        if symmetric:
+            self.links[(tuple(destination), tuple(source))] = profile
+
+    # Partir la red: solo se entregan datagramas entre direcciones del mismo grupo
+    def partition(self, *groups):
+        self.groups = {}
+        for index, group in enumerate(groups):
+            for addr in group:
+                self.groups[tuple(addr)] = index
+
+    # Quitar las particiones
+    def heal(self):
+        self.groups = None
+
+    # Enviar un datagrama aplicando el perfil del enlace
+    def send(self, source, data, destination):
+        self.stats["sent"] += 1
+        if self.groups is not None and self.groups.get(source) != self.groups.get(destination):
+            self.stats["partitioned"] += 1
+            return
+        profile = self.links.get((source, destination), self.profile)
+        rng = self.rng
+        if rng.random() < profile.drop:
+            self.stats["dropped"] += 1
+            return
+        copies = 1
+        if rng.random() < profile.duplicate:
+            self.stats["duplicated"] += 1
+            copies = 2
+        loop = asyncio.get_running_loop()
+        for _ in range(copies):
+            delay = profile.latency(rng)
+            if rng.random() < profile.reorder:
+                self.stats["reordered"] += 1
+                delay += profile.reorder_delay(rng)
+            loop.call_later(delay, self.deliver, source, data, destination)
+
+    # Entregar un datagrama si el destino sigue en la red y no quedó separado por una partición
+    def deliver(self, source, data, destination):
+        protocol = self.endpoints.get(destination)
+        if protocol is None:
+            self.stats["unreachable"] += 1
+            return
+        if self.groups is not None and self.groups.get(source) != self.groups.get(destination):
+            self.stats["partitioned"] += 1
+            return
+        self.stats["delivered"] += 1
+        protocol.datagram_received(data, source)
@@ -0,0 +1,98 @@
+from collections import deque
+
+try:
+    from tkinter import Tk, Label, Button, Entry, Text, END, messagebox
+except ImportError:
+    # Sin tkinter el nodo solo puede ejecutarse en modo headless
+    Tk = None
+
+from .node import book_status
+
+GUI_REFRESH_MS = 200  # Intervalo mínimo entre refrescos de la interfaz (los cambios intermedios se agrupan)
+
+# Clase para la interfaz gráfica del nodo
+class LibraryApp:
+    def __init__(self, root, node):
+        self.node = node
+        self.root = root
+        self.rows = {}  # Línea del widget y estado mostrado de cada libro
+        self.refresh_pending = False  # Hay cambios sin dibujar (lo marca el hilo de red)
+        self.changed = deque([None])  # Lotes de libros cambiados sin dibujar (None: revisar todo el inventario)
+        self.errors = deque()  # Errores pendientes de mostrar desde el hilo de Tk
+        self.root.title(f"P2P Nodo Reservas: {node.host}:{node.port}")
+
+        self.label = Label(root, text="Reservar libro (ID):")
+        self.label.pack()
+
+        self.book_id_entry = Entry(root)
+        self.book_id_entry.pack()
+
+        self.reserve_button = Button(root, text="Reservar", command=self.reserve_book)
+        self.reserve_button.pack()
+
+        self.unreserve_button = Button(root, text="Devolver Reserva", command=self.unreserve_book)
+        self.unreserve_button.pack()
+
+        self.inventory_text = Text(root, height=30, width=65)
+        self.inventory_text.pack()
+        self.refresh_pending = True
+        self.refresh()
+        self.node.add_observer(self)
+
+    # Método para reservar un libro desde la interfaz
+    def reserve_book(self):
+        book_id = self.book_id_entry.get()
+        if book_id:
+            self.node.reserve_book(book_id)
+            self.update_inventory_display([book_id])
+
+    # Método para devolver una reserva desde la interfaz
+    def unreserve_book(self):
+        book_id = self.book_id_entry.get()
+        if book_id:
+            self.node.unreserve_book(book_id)
+            self.update_inventory_display([book_id])
+
+    # Marcar que el inventario cambió; puede llamarse desde cualquier hilo y el dibujo se hace en refresh
+    def update_inventory_display(self, changed=None):
+        self.changed.append(None if changed is None else list(changed))
+        self.refresh_pending = True
+
+    # Refrescar la interfaz en el bucle de Tk, como mucho una vez cada GUI_REFRESH_MS
+    def refresh(self):
+        if self.refresh_pending:
+            self.refresh_pending = False
+            self.redraw_changed_rows()
+        while self.errors:
+            messagebox.showerror("Error", self.errors.popleft())
+        self.root.after(GUI_REFRESH_MS, self.refresh)
+
+    # Reescribir solo las líneas de los libros cuyo estado cambió desde el último dibujo; si los
+    # avisos traen los libros afectados solo se consultan esos, sin recorrer todo el inventario
+    def redraw_changed_rows(self):
+        book_ids = set()
+        scan_all = False
+        while self.changed:
+            batch = self.changed.popleft()
+            if batch is None:
+                scan_all = True
+            else:
+                book_ids.update(batch)
+        if scan_all:
+            entries = list(self.node.inventory.items())
+        else:
+            entries = [(book_id, self.node.inventory.get(book_id)) for book_id in sorted(book_ids)]
+        for book_id, data in entries:
+            status = book_status(data)
+            row = self.rows.get(book_id)
+            if row is None:
+                self.rows[book_id] = [len(self.rows) + 1, status]
+                self.inventory_text.insert(END, f"{book_id}: {status}\n")
+            elif row[1] != status:
+                row[1] = status
+                self.inventory_text.delete(f"{row[0]}.0", f"{row[0]}.end")
+                self.inventory_text.insert(f"{row[0]}.0", f"{book_id}: {status}")
+
+    # Encolar un error para mostrarlo desde el hilo de Tk
+    def show_error_message(self, message):
+        self.errors.append(message)
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .discovery import DiscoveryServer
+from .metrics import DUMP_INTERVAL, MetricsDumper, MetricsServer
+from .node import Node, book_status, run_nodes, start_node
+from .transport import get_local_ip
+
+# Valores por defecto de la configuración (los sobrescriben el archivo, el entorno y la línea de comandos)
+DEFAULTS = {
+    "role": "node",
+    "host": None,
+    "port": None,
+    "discovery": "192.168.0.15:4000",
+    "inventory_size": 4,
+    "nodes": 1,
+    "processes": 1,
+    "workers": 1,
+    "replication": None,
+    "asyncio": False,
+    "headless": False,
+    "quiet": False,
+    "gossip_mode": "delta",
+    "reservation_mode": "all",
+    "wire_format": "json",
+    "membership": "swim",
+    "reliable": False,
+    "data_dir": None,
+    "log_level": "info",
+    "metrics_port": None,
+    "metrics_file": None,
+    "metrics_interval": DUMP_INTERVAL
+}
+
+DEFAULT_PORTS = {"node": 8080, "discovery": 4000}  # Puerto por defecto de cada rol
+INT_OPTIONS = ("port", "inventory_size", "nodes", "processes", "workers", "replication", "metrics_port", "metrics_interval")
+LOG_LEVELS = ("debug", "info", "warning", "error")
+FLAG_OPTIONS = ("asyncio", "headless", "quiet", "reliable")
+
+# Opciones de la línea de comandos; las no indicadas quedan en None para no tapar al entorno
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m p2p", description="Nodo P2P de reservas o servidor de descubrimiento")
+    parser.add_argument("--config", help="archivo JSON con la configuración (también P2P_CONFIG)")
+    parser.add_argument("--role", choices=("node", "discovery"))
+    parser.add_argument("--host", help="IP local (por defecto la de la interfaz de salida)")
+    parser.add_argument("--port", type=int, help="puerto del nodo (el primero si se lanzan varios)")
+    parser.add_argument("--discovery", help="dirección host:puerto del servidor de descubrimiento")
+    parser.add_argument("--inventory-size", type=int, dest="inventory_size", help="cantidad de recursos del inventario")
+    parser.add_argument("--nodes", type=int, help="cantidad de nodos a lanzar en puertos consecutivos")
+    parser.add_argument("--processes", type=int, help="procesos entre los que se reparten los nodos")
+    parser.add_argument("--workers", type=int, help="procesos que atienden un único nodo en el mismo puerto (SO_REUSEPORT), cada uno con una franja del inventario")
+    parser.add_argument("--replication", type=int, help="particionar el inventario con un anillo de hash consistente y guardar cada recurso en esta cantidad de nodos (todos los nodos deben usar el mismo valor)")
+    parser.add_argument("--asyncio", action="store_const", const=True, help="usar el runtime asyncio")
+    parser.add_argument("--headless", action="store_const", const=True, help="sin interfaz gráfica")
+    parser.add_argument("--quiet", action="store_const", const=True, help="solo mostrar advertencias y errores de los nodos")
+    parser.add_argument("--gossip-mode", dest="gossip_mode", choices=("delta", "full"))
+    parser.add_argument("--reservation-mode", dest="reservation_mode", choices=("all", "quorum"))
+    parser.add_argument("--wire-format", dest="wire_format", choices=("binary", "json"))
+    parser.add_argument("--membership", choices=("swim", "discovery"))
+    parser.add_argument("--reliable", action="store_const", const=True, help="confirmar y reenviar los mensajes de control")
+    parser.add_argument("--data-dir", dest="data_dir", help="directorio para guardar el inventario (WAL y snapshots) entre reinicios")
+    parser.add_argument("--log-level", dest="log_level", choices=LOG_LEVELS, help="nivel de los registros (debug muestra cada mensaje enviado y recibido)")
+    parser.add_argument("--metrics-port", type=int, dest="metrics_port", help="puerto HTTP local para las métricas en formato Prometheus (/metrics)")
+    parser.add_argument("--metrics-file", dest="metrics_file", help="archivo donde escribir las métricas periódicamente")
+    parser.add_argument("--metrics-interval", type=int, dest="metrics_interval", help="segundos entre escrituras del archivo de métricas")
+    return parser
+
+# Leer la configuración del entorno: P2P_PORT, P2P_DISCOVERY, P2P_INVENTORY_SIZE, etc.
+def config_from_env(environ):
+    config = {}
+    for key in DEFAULTS:
+        value = environ.get(f"P2P_{key.upper()}")
+        if value is None:
+            continue
+        if key in INT_OPTIONS:
+            value = int(value)
+        elif key in FLAG_OPTIONS:
+            value = value.lower() in ("1", "true", "yes", "si", "sí")
+        config[key] = value
+    return config
+
+# Combinar la configuración: defaults < defaults del script < archivo < entorno < línea de comandos
+def load_config(argv=None, defaults=None, environ=None):
+    environ = os.environ if environ is None else environ
+    args = vars(build_parser().parse_args(argv))
+    config = dict(DEFAULTS)
+    config.update(defaults or {})
+    config_path = args.pop("config") or environ.get("P2P_CONFIG")
+    if config_path:
+        with open(config_path) as f:
+            config.update(json.load(f))
+    config.update(config_from_env(environ))
+    config.update({key: value for key, value in args.items() if value is not None})
+    if config["host"] is None:
+        config["host"] = get_local_ip()
+    if config["port"] is None:
+        config["port"] = DEFAULT_PORTS[config["role"]]
+    return config
+
+# Convertir "host:puerto" en una dirección
+def parse_address(text):
+    host, port = text.rsplit(":", 1)
+    return host, int(port)
+
+# Configurar los registros del proceso: --quiet deja solo advertencias y errores
+def configure_logging(config):
+    level = "warning" if config["quiet"] else config["log_level"]
+    logging.basicConfig(level=getattr(logging, level.upper()), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+# Exponer las métricas del proceso por HTTP local y/o en un archivo, según la configuración
+def start_metrics(config):
+    if config["metrics_port"] is not None:
+        server = MetricsServer(port=config["metrics_port"]).start()
+        logging.getLogger(__name__).info("Métricas en http://%s:%d/metrics", *server.address)
+    if config["metrics_file"]:
+        MetricsDumper(config["metrics_file"], interval=config["metrics_interval"]).start()
+
+# Crear un nodo (o uno de sus workers) con la configuración indicada
+def build_node(config, port, worker=0):
+    return Node(config["host"], port, parse_address(config["discovery"]),
+                gossip_mode=config["gossip_mode"],
+                reservation_mode=config["reservation_mode"],
+                wire_format=config["wire_format"],
+                membership=config["membership"],
+                inventory_size=config["inventory_size"],
+                reliable=config["reliable"],
+                data_dir=config["data_dir"],
+                workers=config["workers"],
+                worker=worker,
+                replication=config["replication"])
+
+# Ejecutar un grupo de nodos en un solo bucle asyncio (se usa dentro de cada proceso del pool)
+def run_node_group(config, ports):
+    configure_logging(config)
+    start_metrics(config)
+    asyncio.run(run_nodes([build_node(config, port) for port in ports]))
+
+# Lanzar muchos nodos en puertos consecutivos, en este proceso o repartidos en un pool de procesos
+def run_many(config):
+    ports = list(range(config["port"], config["port"] + config["nodes"]))
+    processes = max(1, min(config["processes"], len(ports)))
+    logging.getLogger(__name__).info("Lanzando %d nodos en %d proceso(s), puertos %d-%d", len(ports), processes, ports[0], ports[-1])
+    if processes == 1:
+        run_node_group(config, ports)
+        return
+    groups = [ports[i::processes] for i in range(processes)]
+    # Cada proceso expone sus propias métricas: puertos consecutivos y un archivo por proceso
+    configs = [process_metrics_config(config, i) for i in range(processes)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for result in pool.map(run_node_group, configs, groups):
+            pass
+
+# Configuración de métricas del i-ésimo proceso del pool
+def process_metrics_config(config, i):
+    config = dict(config)
+    if config["metrics_port"] is not None:
+        config["metrics_port"] += i
+    if config["metrics_file"]:
+        root, extension = os.path.splitext(config["metrics_file"])
+        config["metrics_file"] = f"{root}-{i}{extension}"
+    return config
+
+# Ejecutar el nodo sin interfaz gráfica: lee comandos de la entrada estándar o queda como demonio
+def run_headless(node):
+    print("Comandos: reservar <id>, devolver <id>, inventario, pares, rtt, salir")
+    try:
+        for line in sys.stdin:
+            command = line.split()
+            if not command:
+                continue
+            if command[0] == "salir":
+                return
+            elif command[0] == "reservar" and len(command) == 2:
+                node.reserve_book(command[1])
+            elif command[0] == "devolver" and len(command) == 2:
+                node.unreserve_book(command[1])
+            elif command[0] == "inventario":
+                for book_id, data in node.inventory.items():
+                    print(f"{book_id}: {book_status(data)}")
+            elif command[0] == "pares":
+                print(node.peers)
+            elif command[0] == "rtt":
+                print(json.dumps(node.rtt_table(), indent=2))
+            else:
+                print(f"Comando desconocido: {line.strip()}")
+        # Sin entrada estándar (demonio): seguir atendiendo la red hasta que se interrumpa
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+# Ejecutar un nodo repartido en varios procesos que comparten el puerto: el worker 0 queda en
+# este proceso (con la consola o la interfaz) y los demás se lanzan aparte con sus propias métricas
+def run_workers(config):
+    logging.getLogger(__name__).info("Lanzando el nodo en el puerto %d con %d workers", config["port"], config["workers"])
+    for i in range(1, config["workers"]):
+        process = multiprocessing.Process(target=run_worker, args=(process_metrics_config(config, i), i))
+        process.daemon = True
+        process.start()
+    run_single(process_metrics_config(config, 0))
+
+# Ejecutar uno de los workers adicionales de un nodo (en su propio proceso)
+def run_worker(config, worker):
+    configure_logging(config)
+    start_metrics(config)
+    node = build_node(config, config["port"], worker)
+    start_node(node)
+    # El proceso principal termina a los workers con SIGTERM: salir por el finally para dejar el snapshot
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        threading.Event().wait()
+    finally:
+        node.shutdown()
+
+# Ejecutar un único nodo, con interfaz gráfica si está disponible
+def run_single(config):
+    start_metrics(config)
+    node = build_node(config, config["port"])
+    # Con asyncio la red corre en un hilo de fondo; la interfaz (si la hay) sigue en el hilo principal
+    start_node(node, config["asyncio"])
+
+    from .gui import Tk, LibraryApp
+    if config["headless"] or Tk is None:
+        run_headless(node)
+    else:
+        root = Tk()
+        LibraryApp(root, node)
+        root.mainloop()
+    node.shutdown()
+
+# Ejecutar el servidor de descubrimiento
+def run_discovery(config):
+    start_metrics(config)
+    server = DiscoveryServer(config["host"], config["port"])
+    if config["asyncio"]:
+        async def serve():
+            await server.start_async()
+            await asyncio.Event().wait()
+
+        asyncio.run(serve())
+    else:
+        server.start_server()
+
+        # Mantener el servidor corriendo indefinidamente
+        threading.Event().wait()
+
+# Punto de entrada: python -m p2p [opciones]
+def main(argv=None, defaults=None):
+    config = load_config(argv, defaults)
+    if config["workers"] > 1 and (config["nodes"] > 1 or config["asyncio"]):
+        build_parser().error("--workers reparte un único nodo y usa el runtime con hilos (sin --nodes ni --asyncio)")
+    configure_logging(config)
+    try:
+        if config["role"] == "discovery":
+            run_discovery(config)
+        elif config["workers"] > 1:
+            run_workers(config)
+        elif config["nodes"] > 1:
+            run_many(config)
+        else:
+            run_single(config)
+    except KeyboardInterrupt:
+        pass
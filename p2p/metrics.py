@@ -0,0 +1,247 @@
+import bisect
+import os
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # Segundos
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # Bytes
+DUMP_INTERVAL = 10  # Segundos entre escrituras del archivo de métricas
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"  # Formato de texto de Prometheus
+
+# Métricas del proceso: contadores, medidores e histogramas con etiquetas, que se exponen en el
+# formato de texto de Prometheus por HTTP local o en un archivo que se reescribe periódicamente.
+# Los valores de las etiquetas se pasan por posición, en el orden con el que se declaró la métrica.
+
+# Escapar el valor de una etiqueta según el formato de Prometheus
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+# Texto {nombre="valor",...} de una serie
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+# Número en el formato de Prometheus
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+# Contador que solo crece (mensajes, bytes, errores)
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values = {}  # Valores de etiquetas -> total
+        self.mutex = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.mutex:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self.values.get(labels, 0)
+
+    # Líneas de texto de las series
+    def render(self):
+        with self.mutex:
+            values = list(self.values.items())
+        return [f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}" for labels, value in values]
+
+# Medidor de un valor que sube y baja; puede leerse de un objeto en el momento de exponerlo
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values = {}
+        self.tracked = {}  # Valores de etiquetas -> (referencia débil al objeto, función que lee el valor)
+        self.mutex = threading.Lock()
+
+    def set(self, value, *labels):
+        with self.mutex:
+            self.values[labels] = value
+
+    # Leer el valor con function(obj) al exponer las métricas; la serie desaparece con el objeto
+    def track(self, obj, function, *labels):
+        with self.mutex:
+            self.tracked[labels] = (weakref.ref(obj), function)
+
+    def value(self, *labels):
+        tracked = self.tracked.get(labels)
+        if tracked is not None:
+            obj = tracked[0]()
+            return None if obj is None else tracked[1](obj)
+        return self.values.get(labels)
+
+    def render(self):
+        with self.mutex:
+            values = dict(self.values)
+            tracked = list(self.tracked.items())
+        for labels, (ref, function) in tracked:
+            obj = ref()
+            if obj is None:
+                with self.mutex:
+                    self.tracked.pop(labels, None)
+                continue
+            values[labels] = function(obj)
+        return [f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}" for labels, value in values.items()]
+
+# Histograma con límites fijos (latencias, tamaños)
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # Valores de etiquetas -> [cuentas por límite (+Inf al final), suma, cantidad]
+        self.mutex = threading.Lock()
+
+    def observe(self, value, *labels):
+        position = bisect.bisect_left(self.buckets, value)
+        with self.mutex:
+            series = self.values.get(labels)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self.values[labels] = series
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    # Cantidad y suma de las observaciones de una serie
+    def value(self, *labels):
+        series = self.values.get(labels)
+        return (0, 0.0) if series is None else (series[2], series[1])
+
+    def render(self):
+        with self.mutex:
+            values = [(labels, list(series[0]), series[1], series[2]) for labels, series in self.values.items()]
+        lines = []
+        for labels, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                bound_label = 'le="' + format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, labels, [bound_label])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {count}")
+        return lines
+
+# Conjunto de métricas que se exponen juntas
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.mutex = threading.Lock()
+
+    # Registrar una métrica; si ya existe con ese nombre se devuelve la existente
+    def add(self, metric):
+        with self.mutex:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind:
+                    raise ValueError(f"La métrica {metric.name} ya existe como {existing.kind}")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, description, labels=()):
+        return self.add(Counter(name, description, labels))
+
+    def gauge(self, name, description, labels=()):
+        return self.add(Gauge(name, description, labels))
+
+    def histogram(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        return self.add(Histogram(name, description, labels, buckets))
+
+    def get(self, name):
+        return self.metrics.get(name)
+
+    # Todas las métricas en el formato de texto de Prometheus
+    def render(self):
+        with self.mutex:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()  # Métricas de los nodos y del servidor de descubrimiento de este proceso
+
+# Respuesta a GET /metrics con las métricas del registro del servidor
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Sin registro de cada consulta en la salida de error
+    def log_message(self, format, *args):
+        pass
+
+# Servidor HTTP local que expone las métricas en formato Prometheus
+class MetricsServer:
+    def __init__(self, registry=REGISTRY, host="127.0.0.1", port=9100):
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.registry = registry
+        self.address = self.server.server_address
+
+    # Atender consultas en un hilo de fondo
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# Escritura periódica de las métricas en un archivo (por ejemplo para el textfile collector de node_exporter)
+class MetricsDumper:
+    def __init__(self, path, registry=REGISTRY, interval=DUMP_INTERVAL):
+        self.path = path
+        self.registry = registry
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    # Reescribir el archivo de una vez, para que nunca se lea a medio escribir
+    def dump(self):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write(self.registry.render())
+        os.replace(temporary, self.path)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
+
+    def start(self):
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    # Detener la escritura periódica dejando el archivo con los últimos valores
+    def close(self):
+        self.stopped.set()
+        self.dump()
@@ -0,0 +1,1519 @@
+import socket
+import threading
+import asyncio
+import itertools
+import json
+import time
+import random
+import math
+import os
+import logging
+from collections import deque
+
+from .codec import PROTOCOL_VERSION, WIRE_MAGIC, encode_binary, decode_binary
+from .transport import FRAGMENT_MAGIC, MIN_BATCH, RECV_BUFFER, Reassembler, ReceiveQueue, batch_sender, drain_socket, fragment, kernel_drops, set_receive_buffer
+from .metrics import REGISTRY, SIZE_BUCKETS
+from .oplog import OpLog
+from .reliable import RELIABLE_TYPES, ReliableChannel, RttEstimator
+from .ring import PARTITIONS, Placement, partition_of
+from .store import DIGEST_BUCKETS, STORE_STRIPES, InventoryStore, newer
+from .storage import Storage
+from .workers import FORWARD_ENCODED, forward_path, forward_socket, reuseport_socket, shard_of, unwrap_forward, wrap_forward
+
+LOCK_TIMEOUT = 5  # Segundos máximos de espera por las respuestas de bloqueo (y espera con pares sin RTT medido)
+LOCK_MAX_BACKOFF = 2  # Duplicaciones máximas del plazo de bloqueo de un par que no respondió a tiempo
+LOCK_LEASE = 30  # Segundos que un nodo retiene un bloqueo concedido en modo quórum sin confirmación
+QUORUM_RELIABLE_TYPES = ("reservation", "lock_release")  # Cierres de un bloqueo en modo quórum: siempre por el canal confiable, antes de que venza LOCK_LEASE
+HEARTBEAT_INTERVAL = 5  # Segundos entre latidos al servidor de descubrimiento
+SWIM_PERIOD = 1.0  # Segundos por ronda de sondeo del detector de fallas
+SWIM_PING_TIMEOUT = 0.3  # Espera del ack directo antes de pedir sondeos indirectos
+SWIM_INDIRECT_PROBES = 3  # Pares a los que se pide un sondeo indirecto (ping_req)
+SWIM_SUSPICION_TIMEOUT = 5  # Segundos que un nodo sospechoso tiene para refutar antes de darse por caído
+SWIM_MAX_PIGGYBACK = 6  # Cambios de membresía que viajan en cada mensaje
+SWIM_RETRANSMIT_MULT = 3  # Cada cambio se difunde RETRANSMIT_MULT * log2(n) veces
+SWIM_REJOIN_INTERVAL = 5  # Segundos entre pings a un miembro dado por caído, para reunir el cluster tras una partición
+GOSSIP_LEAF_ENTRIES = 256  # Un rango del digest con hasta tantas entradas se compara versión por versión; uno mayor se subdivide
+GOSSIP_MAX_MODULUS = 2 ** 32  # Profundidad máxima del árbol de digest: el crc32 no tiene más bits para subdividir
+GOSSIP_TYPES = ("gossip_digest", "gossip_buckets", "gossip_versions", "gossip_pull", "gossip_delta", "inventory_update", "oplog_update")  # Mensajes de sincronización del inventario
+
+log = logging.getLogger(__name__)
+
+# Métricas de los nodos del proceso (etiqueta node = "host:puerto")
+MESSAGES_RECEIVED = REGISTRY.counter("p2p_messages_received_total", "Mensajes recibidos por tipo", ("node", "type"))
+MESSAGES_SENT = REGISTRY.counter("p2p_messages_sent_total", "Mensajes enviados por tipo (incluye reenvíos)", ("node", "type"))
+BYTES_RECEIVED = REGISTRY.counter("p2p_received_bytes_total", "Bytes recibidos en datagramas", ("node",))
+BYTES_SENT = REGISTRY.counter("p2p_sent_bytes_total", "Bytes enviados en datagramas", ("node",))
+MESSAGES_FAILED = REGISTRY.counter("p2p_messages_failed_total", "Mensajes recibidos que no se pudieron decodificar o atender", ("node", "type"))
+HANDLE_SECONDS = REGISTRY.histogram("p2p_handle_message_seconds", "Duración de handle_message por tipo de mensaje", ("node", "type"))
+LOCK_RTT_SECONDS = REGISTRY.histogram("p2p_lock_rtt_seconds", "Ida y vuelta entre una solicitud de bloqueo y cada respuesta", ("node",))
+LOCK_REQUEST_SECONDS = REGISTRY.histogram("p2p_lock_request_seconds", "Espera hasta decidir una solicitud de bloqueo", ("node", "outcome"))
+GOSSIP_BYTES = REGISTRY.histogram("p2p_gossip_payload_bytes", "Tamaño codificado de los mensajes de sincronización enviados", ("node", "type"), SIZE_BUCKETS)
+MERGE_SECONDS = REGISTRY.histogram("p2p_merge_seconds", "Duración de las fusiones de inventario recibidas", ("node", "kind"))
+QUEUE_DEPTH = REGISTRY.gauge("p2p_queue_depth", "Elementos pendientes en las colas internas del nodo", ("node", "queue"))
+RECEIVE_DROPPED = REGISTRY.counter("p2p_receive_dropped_total", "Mensajes recibidos descartados con la cola de su carril llena", ("node", "lane"))
+WORKER_FORWARDS = REGISTRY.counter("p2p_worker_forwards_total", "Mensajes reenviados a otro worker del nodo", ("node", "outcome"))
+KERNEL_DROPS = REGISTRY.gauge("p2p_receive_kernel_drops", "Datagramas descartados por el kernel con el buffer de recepción lleno", ("node",))
+QUEUES = ("pending_locks", "unacked", "fragments", "oplog", "receive_control", "receive_bulk")  # Colas que se exponen en QUEUE_DEPTH
+LANES = ("control", "bulk")  # Carriles de recepción, en orden de prioridad
+PRIORITY_TYPES = RELIABLE_TYPES + ("reliable_ack", "ping", "ping_req", "ack")  # Mensajes del carril de control: bloqueos, acks y sondeos
+MEMBERSHIP_TYPES = ("node_list", "node_joined", "node_left", "node_changes")  # Mensajes que reciben todos los workers de un nodo
+
+# Percentil (por rango más cercano) de una lista ya ordenada
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, -(-len(sorted_values) * pct // 100) - 1)
+    return sorted_values[int(index)]
+
+# Solicitud de bloqueo en curso: junta las respuestas y se decide apenas el resultado es seguro
+class PendingLock:
+    def __init__(self, book_id, expected, future=None, needed=None, started=None):
+        self.book_id = book_id
+        self.expected = expected  # Cantidad de pares consultados
+        self.needed = expected if needed is None else needed  # Aprobaciones necesarias para confirmar
+        self.quorum = needed is not None  # En modo quórum no hace falta la unanimidad
+        self.approvals = 0
+        self.denials = 0
+        self.decision = None  # True/False una vez decidida
+        self.started = time.monotonic() if started is None else started
+        self.peers = []  # Pares consultados
+        self.responders = set()  # Pares que ya respondieron
+        self.deadline = LOCK_TIMEOUT  # Segundos de espera, derivados del RTT de los pares
+        self.measured = False  # Si el plazo salió del RTT medido de todos los pares consultados
+        self.timed_out = False
+        self.future = future  # Future asyncio (solo en el runtime asíncrono)
+        self.event = threading.Event()  # Evento para el runtime con hilos
+        self.mutex = threading.Lock()
+
+    # Registrar una respuesta: se decide en cuanto se alcanzan las aprobaciones necesarias
+    # o en cuanto las negativas hacen imposible alcanzarlas
+    def record(self, approved):
+        with self.mutex:
+            if approved:
+                self.approvals += 1
+            else:
+                self.denials += 1
+            if self.decision is None:
+                if self.approvals >= self.needed:
+                    self.decide(True)
+                elif self.denials > self.expected - self.needed:
+                    self.decide(False)
+
+    # Cerrar la solicitud por tiempo: en modo quórum hace falta la mayoría (un par callado no
+    # vota). En modo unanimidad un par que no respondió dentro del plazo derivado de su RTT
+    # cuenta como negativa: la reserva falla rápido y no se aprueba sin su voto. Solo con pares
+    # sin RTT medido (plazo LOCK_TIMEOUT) se aprueba si no hubo negativas, como antes
+    def expire(self):
+        with self.mutex:
+            if self.decision is None:
+                self.timed_out = True
+                self.decide(self.approvals >= self.needed if self.quorum or self.measured else self.denials == 0)
+
+    def decide(self, decision):
+        self.decision = decision
+        self.event.set()
+        if self.future is not None and not self.future.done():
+            self.future.set_result(decision)
+
+# Clase que representa un nodo en la red P2P
+class Node:
+    def __init__(self, host, port, discovery_server, gossip_mode="delta", updates_retention=1000, reservation_mode="all", wire_format="json", membership="swim", inventory_size=4, network=None, reliable=False, data_dir=None, workers=1, worker=0, replication=None, gossip_interval=None):
+        self.host = host
+        self.port = port
+        self.workers = workers  # Procesos entre los que se reparte el nodo (comparten el puerto con SO_REUSEPORT)
+        self.worker = worker  # Número de este proceso dentro del nodo
+        self.name = f"{host}:{port}" if workers == 1 else f"{host}:{port}/w{worker}"  # Identificación del nodo en los registros y métricas
+        self.peers = []  # Lista de pares conocidos
+        self.membership_epoch = 0  # Última época de membresía aplicada
+        self.membership = membership  # "swim" (detección de fallas entre nodos) o "discovery" (solo el servidor)
+        self.members = {}  # Estado SWIM de cada par: estado, encarnación y desde cuándo
+        self.incarnation = 0  # Encarnación propia, para refutar sospechas
+        self.swim_updates = {}  # Cambios de membresía por difundir: dirección -> [cambio, envíos restantes]
+        self.swim_probes = {}  # Sondeos en curso por número de secuencia
+        self.swim_targets = []  # Orden de sondeo (ronda aleatoria sobre los pares)
+        self.last_rejoin_probe = 0.0  # Último ping a un miembro caído
+        # El estado SWIM (miembros, cambios por difundir, sondeos) lo tocan el detector de fallas,
+        # el gossip y los hilos de los carriles; los envíos se hacen fuera del candado
+        self.swim_lock = threading.RLock()
+        # Con varios workers cada uno numera sus sondeos, solicitudes y fragmentos en su propia clase
+        # de resto módulo workers, así las respuestas vuelven al worker que las pidió
+        self.swim_seq = itertools.count(worker + workers, workers)
+        self.observers = []  # Interfaces u otros observadores que reciben avisos de cambios y errores
+        self.replication = replication  # Réplicas por recurso en el anillo de hash consistente; None guarda todo en todos los nodos
+        self.ring = None  # Ubicación de las particiones para los pares actuales (se recalcula cuando cambian)
+        self.shared_partitions = set()  # Particiones que este nodo compartía con otra réplica en la ubicación anterior
+        # Particiones recibidas en un cambio de membresía que todavía no coincidieron con otra réplica:
+        # hasta entonces este nodo no vota por sus libros (podría no tener la fila de una reserva)
+        self.handoff = set()
+        self.handoff_matches = {}  # Partición en traspaso -> réplicas, también en traspaso, con las que ya coincidió
+        # En modo particionado cada franja del inventario es una partición del anillo
+        self.inventory = InventoryStore(f"{host}:{port}", stripes=PARTITIONS if replication else STORE_STRIPES)  # Inventario versionado de recursos
+        self.updates = OpLog(f"{host}:{port}", updates_retention)  # Registro de actualizaciones de inventario
+        self.storage = None  # Almacenamiento durable (WAL y snapshots) si se indicó data_dir
+        seeded = 0
+        if data_dir is not None:
+            self.storage = Storage(os.path.join(data_dir, f"{host}-{port}" if workers == 1 else f"{host}-{port}-w{worker}"))
+            seeded = self.storage.load(self.inventory, self.updates).get("seeded", 0)
+        # Los recursos ya sembrados en una ejecución anterior vienen en el snapshot
+        # En modo particionado el catálogo no se siembra: las filas aparecen con la primera escritura
+        book_ids = (f"Recurso-{i}" for i in range(seeded + 1, inventory_size + 1))
+        if replication is None:
+            self.inventory.seed(book_ids if workers == 1 else (book_id for book_id in book_ids if shard_of(book_id, workers) == worker))
+        self.seeded = max(seeded, inventory_size)
+        if self.storage is not None and inventory_size > seeded:
+            # La siembra no pasa por el WAL: sin este snapshot un reinicio volvería a sembrar todo
+            self.checkpoint()
+        self.peer_cursors = {}  # Último cursor del registro confirmado por cada par
+        self.reservation_mode = reservation_mode  # "all" (todos los pares) o "quorum" (mayoría)
+        self.lock_holds = {}  # Bloqueos concedidos en modo quórum: libro -> ((titular, id), vencimiento)
+        self.pending_locks = {}  # Solicitudes de bloqueo en curso por id
+        self.lock_samples = deque(maxlen=10000)  # (fin, latencia) de las últimas solicitudes de bloqueo
+        self.request_ids = itertools.count(worker + workers, workers)  # Generador de ids de solicitud
+        self.loop = None  # Bucle asyncio cuando el nodo corre en el runtime asíncrono
+        self.transport = None  # Transporte asyncio asociado al socket del nodo
+        self.gossip_mode = gossip_mode  # "delta" (digest + diferencias) o "full" (inventario completo)
+        self.gossip_interval = gossip_interval  # Segundos medios entre rondas de gossip (None: al azar entre 1 y 15)
+        self.wire_format = wire_format  # "json" o "binary" (negociado por par; el códec en Python puro aún es más lento que json)
+        self.peer_codecs = {}  # Pares que ya hablan el protocolo binario
+        self.reassembler = Reassembler()  # Reensamblado de mensajes que llegan fragmentados
+        self.message_ids = itertools.count(worker + workers, workers)  # Ids de los mensajes fragmentados enviados
+        self.reliable = reliable  # Enviar los mensajes de control por el canal confiable (acks y reenvíos)
+        self.channel = ReliableChannel(self)  # El lado receptor siempre confirma y descarta duplicados
+        self.channel.session += worker - self.channel.session % workers  # Los acks vuelven al worker por la sesión
+        self.rtt = {}  # Estimador de RTT (SRTT/RTTVAR) por par
+        self.rtt_overall = RttEstimator()  # RTT de todos los pares, para los que aún no tienen muestras
+        self.gossip_sent = {}  # Momento del último digest enviado a cada par, para medir el RTT con su respuesta
+        self.traffic = {"messages_sent": 0, "datagrams_sent": 0, "bytes_sent": 0, "datagrams_received": 0, "bytes_received": 0, "messages_failed": 0}  # Contadores de tráfico
+        self.discovery_server = discovery_server
+        self.network = network  # Red alternativa (por ejemplo el emulador); None usa un socket UDP real
+        self.socket = None
+        self.receive_buffer = None  # Bytes de buffer de recepción que concedió el kernel al socket
+        self.forward_socket = None  # Socket Unix por el que llegan los mensajes que reenvían los otros workers
+        self.forward_reassembler = Reassembler()
+        if network is None and workers > 1:
+            self.socket = reuseport_socket(self.host, self.port)
+            self.forward_socket = forward_socket(self.host, self.port, worker)
+            self.forward_paths = [forward_path(self.host, self.port, i) for i in range(workers)]
+        elif network is None:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.bind((self.host, self.port))
+        if network is None:
+            self.receive_buffer = set_receive_buffer(self.socket)
+            if kernel_drops(self.socket) is not None:
+                KERNEL_DROPS.track(self, lambda node: kernel_drops(node.socket) or 0, self.name)
+        self.sender = batch_sender(self.socket)  # Envío en lote (sendmmsg) por el socket del nodo, si el sistema lo tiene
+        self.receive_queue = ReceiveQueue(LANES)  # Mensajes recibidos a la espera de ser atendidos, por carril
+        self.drain_scheduled = False  # Ya hay una atención del carril de gossip agendada en el bucle asyncio
+        for queue in QUEUES:
+            QUEUE_DEPTH.track(self, lambda node, queue=queue: node.queue_depths()[queue], self.name, queue)
+
+    # Método para iniciar el servidor en un hilo separado
+    def start_server(self):
+        server = threading.Thread(target=self.run_server)
+        server.daemon = True
+        server.start()
+        self.register_with_discovery_server()  # Registrarse en el servidor de descubrimiento
+        heartbeat = threading.Thread(target=self.heartbeat)
+        heartbeat.daemon = True
+        heartbeat.start()
+        if self.membership == "swim":
+            detector = threading.Thread(target=self.failure_detector)
+            detector.daemon = True
+            detector.start()
+
+    # Iniciar el nodo sobre el bucle asyncio actual en lugar de usar hilos
+    async def start_async(self):
+        if self.workers > 1:
+            raise ValueError("Un nodo repartido en varios workers usa el runtime con hilos")
+        self.loop = asyncio.get_running_loop()
+        if self.network is not None:
+            await self.network.create_datagram_endpoint(lambda: NodeProtocol(self), local_addr=(self.host, self.port))
+        else:
+            self.socket.setblocking(False)
+            await self.loop.create_datagram_endpoint(lambda: NodeProtocol(self), sock=self.socket)
+        self.gossip_task = self.loop.create_task(self.gossip_async())
+        self.heartbeat_task = self.loop.create_task(self.heartbeat_async())
+        if self.membership == "swim":
+            self.detector_task = self.loop.create_task(self.failure_detector_async())
+        log.info("Servidor asyncio iniciado en %s", self.name)
+        self.register_with_discovery_server()
+
+    # Gossip periódico como tarea del bucle asyncio
+    async def gossip_async(self):
+        while True:
+            await asyncio.sleep(self.gossip_delay())
+            self.gossip_round()
+
+    # Latidos periódicos al servidor de descubrimiento (runtime con hilos)
+    def heartbeat(self):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            self.send_message({"type": "heartbeat"}, self.discovery_server)
+            if self.storage is not None and self.storage.needs_checkpoint():
+                self.checkpoint()
+
+    # Latidos periódicos al servidor de descubrimiento (runtime asyncio)
+    async def heartbeat_async(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            self.send_message({"type": "heartbeat"}, self.discovery_server)
+            if self.storage is not None and self.storage.needs_checkpoint():
+                # El snapshot se serializa fuera del bucle; el inventario admite lecturas concurrentes
+                segment, meta = self.begin_checkpoint()
+                await self.loop.run_in_executor(None, self.storage.checkpoint, self.inventory, segment, meta)
+
+    # Rotar el WAL y tomar los metadatos del snapshot (el registro se copia bajo su candado)
+    def begin_checkpoint(self):
+        segment = self.storage.begin_checkpoint()
+        return segment, {"seeded": self.seeded, "oplog": self.updates.state()}
+
+    # Escribir un snapshot del estado y descartar el WAL que cubre
+    def checkpoint(self):
+        segment, meta = self.begin_checkpoint()
+        path = self.storage.checkpoint(self.inventory, segment, meta)
+        log.info("Snapshot del inventario escrito en %s", path)
+
+    # Método principal del servidor que escucha mensajes de otros nodos: en cada despertar se
+    # lee todo lo que haya en el socket (hasta RECV_BATCH datagramas) y se reparte en las colas,
+    # que atiende un hilo por carril
+    def run_server(self):
+        log.info("Servidor iniciado en %s (buffer de recepción: %d bytes)", self.name, self.receive_buffer)
+        for lane in LANES:
+            worker = threading.Thread(target=self.process_lane, args=(lane,))
+            worker.daemon = True
+            worker.start()
+        if self.forward_socket is not None:
+            receiver = threading.Thread(target=self.run_forwarded)
+            receiver.daemon = True
+            receiver.start()
+
+        while True:
+            batch = [self.socket.recvfrom(RECV_BUFFER)]  # Esperar datos de otros nodos
+            self.route_datagrams(drain_socket(self.socket, batch))
+
+    # Atender los mensajes de un carril (runtime con hilos)
+    def process_lane(self, lane):
+        while True:
+            for message, data, addr in self.receive_queue.take(lane):
+                self.handle_queued(message, data, addr)
+
+    # Clasificar un datagrama recibido: devuelve (carril, (mensaje, datos, dirección)) o None si es
+    # un fragmento de un mensaje incompleto. Los mensajes de un datagrama se decodifican aquí para
+    # elegir el carril por su tipo; los que llegan fragmentados (grandes, de sincronización) van al
+    # carril de gossip y se decodifican al atenderlos
+    def classify_datagram(self, data, addr):
+        self.traffic["datagrams_received"] += 1
+        self.traffic["bytes_received"] += len(data)
+        BYTES_RECEIVED.inc(self.name, amount=len(data))
+        if data[0] == FRAGMENT_MAGIC:
+            data = self.reassembler.add(data, addr)
+            return None if data is None else ("bulk", (None, data, addr))
+        message = self.decode_message(data, addr)
+        if self.workers > 1 and "rseq" not in message:
+            # Lo que es de otro worker se le pasa tal cual desde aquí; lo que viene por el canal
+            # confiable se confirma primero en este worker (ver route_to_worker)
+            worker = self.message_worker(message)
+            if worker is not None and worker != self.worker:
+                self.forward(message, addr, worker, data)
+                return None
+        return "control" if message["type"] in PRIORITY_TYPES else "bulk", (message, None, addr)
+
+    # Recibir los mensajes que reenvían los otros workers del nodo y pasarlos a las colas
+    def run_forwarded(self):
+        while True:
+            batch = [self.forward_socket.recvfrom(RECV_BUFFER)]
+            self.route_datagrams(drain_socket(self.forward_socket, batch), forwarded=True)
+
+    # Clasificar un mensaje reenviado por otro worker: el datagrama original del par (o el mensaje
+    # vuelto a codificar) con la dirección del par. Se marca con "fwd" para no reenviarlo de nuevo
+    def classify_forwarded(self, data, path):
+        if data[0] == FRAGMENT_MAGIC:
+            data = self.forward_reassembler.add(data, path)
+            if data is None:
+                return None
+        data, addr, flags = unwrap_forward(data)
+        message = decode_binary(data) if flags & FORWARD_ENCODED else self.decode_message(data, addr)
+        message["fwd"] = True
+        return "control" if message["type"] in PRIORITY_TYPES else "bulk", (message, None, addr)
+
+    # Pasar un lote de datagramas [(datos, dirección)] a las colas de sus carriles
+    def route_datagrams(self, datagrams, forwarded=False):
+        classify = self.classify_forwarded if forwarded else self.classify_datagram
+        lanes = {lane: [] for lane in LANES}
+        for data, addr in datagrams:
+            try:
+                routed = classify(data, addr)
+            except Exception:
+                self.message_failed(None, addr)
+                continue
+            if routed is not None:
+                lanes[routed[0]].append(routed[1])
+        for lane, items in lanes.items():
+            if items:
+                self.enqueue(lane, items)
+
+    # Encolar mensajes en un carril contando los que no entran
+    def enqueue(self, lane, items):
+        dropped = self.receive_queue.put(lane, items)
+        if dropped:
+            RECEIVE_DROPPED.inc(self.name, lane, amount=dropped)
+            log.debug("%s: cola %s llena, %d mensajes descartados", self.name, lane, dropped)
+
+    # Manejar un mensaje sacado de una cola (decodificándolo si llegó fragmentado). Un mensaje
+    # mal formado se registra y se descarta: no puede tirar el hilo del carril
+    def handle_queued(self, message, data, addr):
+        try:
+            if message is None:
+                message = self.decode_message(data, addr)
+            self.handle_message(message, addr)
+        except Exception:
+            self.message_failed(message, addr)
+
+    # Registrar un mensaje recibido que falló al decodificarse o atenderse
+    def message_failed(self, message, addr):
+        message_type = message.get("type", "desconocido") if isinstance(message, dict) else "desconocido"
+        self.traffic["messages_failed"] += 1
+        MESSAGES_FAILED.inc(self.name, str(message_type))
+        log.exception("%s: error al procesar un mensaje %s de %s", self.name, message_type, addr)
+
+    # Recibir un datagrama en el runtime asyncio: el control se atiende en el momento y el gossip
+    # se encola y se atiende de a un mensaje por vuelta del bucle, así lo que llega mientras
+    # tanto (en particular el control) no espera detrás de toda una ráfaga
+    def receive_async(self, data, addr):
+        try:
+            routed = self.classify_datagram(data, addr)
+        except Exception:
+            self.message_failed(None, addr)
+            return
+        if routed is None:
+            return
+        lane, item = routed
+        if lane == "control":
+            self.handle_queued(*item)
+            return
+        self.enqueue(lane, [item])
+        if not self.drain_scheduled:
+            self.drain_scheduled = True
+            self.loop.call_soon(self.drain_bulk)
+
+    # Atender un mensaje de gossip encolado (runtime asyncio)
+    def drain_bulk(self):
+        for item in self.receive_queue.take("bulk", 1, block=False):
+            self.handle_queued(*item)
+        if self.receive_queue.depth("bulk"):
+            self.loop.call_soon(self.drain_bulk)
+        else:
+            self.drain_scheduled = False
+
+    # Manejar un mensaje recibido, contándolo y midiendo cuánto tarda por tipo
+    def handle_message(self, message, addr):
+        message_type = message["type"]
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s: mensaje recibido de %s: %s", self.name, addr, message)
+        started = time.perf_counter()
+        try:
+            self.dispatch_message(message, addr)
+        finally:
+            HANDLE_SECONDS.observe(time.perf_counter() - started, self.name, message_type)
+            MESSAGES_RECEIVED.inc(self.name, message_type)
+
+    # Manejar diferentes tipos de mensajes recibidos
+    def dispatch_message(self, message, addr):
+        if message["type"] == "reliable_ack":
+            if self.workers == 1 or not self.route_to_worker(message, addr):
+                self.channel.handle_ack(message, addr)
+            return
+        if "rseq" in message and not self.channel.accept(message, addr):
+            return
+        if self.workers > 1 and self.route_to_worker(message, addr):
+            return
+        if message["type"] == "inventory_update":
+            started = time.perf_counter()
+            changed = self.merge_inventory(message["inventory"], message["updates"], message.get("versions"))
+            MERGE_SECONDS.observe(time.perf_counter() - started, self.name, "inventory_update")
+            self.updates.raise_floors(message.get("floors", {}))
+            if "cursor" in message:
+                self.record_peer_cursor(addr, message["cursor"])
+            self.update_inventory_display(changed)
+        elif message["type"] == "gossip_digest":
+            self.apply_swim_updates(message.get("members", []), addr)
+            self.handle_gossip_digest(message, addr)
+        elif message["type"] == "gossip_buckets":
+            sent = self.gossip_sent.pop(addr, None)
+            if sent is not None and self.now() - sent < LOCK_TIMEOUT:
+                self.record_rtt(addr, self.now() - sent)
+            self.handle_gossip_buckets(message, addr)
+        elif message["type"] == "oplog_update":
+            self.handle_oplog_update(message, addr)
+        elif message["type"] == "gossip_versions":
+            self.handle_gossip_versions(message, addr)
+        elif message["type"] == "gossip_pull":
+            self.send_delta([book_id for book_id in message["book_ids"] if book_id in self.inventory], addr)
+        elif message["type"] == "gossip_delta":
+            started = time.perf_counter()
+            changed = self.inventory.merge(message["entries"])
+            MERGE_SECONDS.observe(time.perf_counter() - started, self.name, "gossip_delta")
+            log.debug("%s: delta de gossip aplicado, %d de %d entradas actualizadas", self.name, len(changed), len(message["entries"]))
+            self.update_inventory_display(changed)
+        elif message["type"] == "lock_request":
+            self.handle_lock_request(message, addr)
+        elif message["type"] == "lock_response":
+            pending = self.pending_locks.get(message.get("request_id"))
+            if pending is not None and addr not in pending.responders:
+                pending.responders.add(addr)
+                rtt = self.now() - pending.started
+                self.record_rtt(addr, rtt)
+                LOCK_RTT_SECONDS.observe(rtt, self.name)
+                pending.record(message["approved"])
+        elif message["type"] == "lock_release":
+            self.release_hold(message["book_id"], message["holder"], message["request_id"])
+        elif message["type"] == "reservation":
+            self.lock_holds.pop(message["book_id"], None)
+            data = message.get("data") or (time.time(), f"{addr[0]}:{addr[1]}")
+            if "version" in message:
+                self.inventory.apply_remote(message["book_id"], data, message["version"])
+            else:
+                self.inventory.set(message["book_id"], data)
+            self.update_inventory_display([message["book_id"]])
+        elif message["type"] == "unreserve":
+            if "version" in message:
+                self.inventory.apply_remote(message["book_id"], None, message["version"])
+            else:
+                self.inventory.set(message["book_id"], None)
+            self.update_inventory_display([message["book_id"]])
+        elif message["type"] == "node_list":
+            if self.membership == "swim":
+                # Con SWIM la lista del servidor solo sirve de arranque: se suman pares, no se quitan
+                for peer in message["nodes"]:
+                    self.add_peer(tuple(peer))
+            else:
+                self.peers = [tuple(peer) for peer in message["nodes"]]
+                if (self.host, self.port) in self.peers:
+                    self.peers.remove((self.host, self.port))
+                self.ring = None
+            self.membership_epoch = message.get("epoch", 0)
+            log.info("%s: lista de nodos actualizada: %s", self.name, self.peers)
+        elif message["type"] == "ping":
+            self.apply_swim_updates(message.get("members", []), addr)
+            self.send_message({"type": "ack", "seq": message["seq"], "members": self.take_piggyback()}, addr)
+        elif message["type"] == "ping_req":
+            self.apply_swim_updates(message.get("members", []), addr)
+            self.send_probe(tuple(message["target"]), requester=(tuple(addr), message["seq"]))
+        elif message["type"] == "ack":
+            self.apply_swim_updates(message.get("members", []), addr)
+            self.handle_swim_ack(message["seq"], addr)
+        elif message["type"] in ("node_joined", "node_left"):
+            self.apply_membership_events([[message["epoch"], message["type"], message["node"]]])
+        elif message["type"] == "node_changes":
+            self.apply_membership_events(message["events"])
+        elif message["type"] == "worker_reserve":
+            # Reserva pedida en otro worker del nodo; espera las respuestas fuera de los hilos de recepción
+            thread = threading.Thread(target=self.reserve_book, args=(message["book_id"],))
+            thread.daemon = True
+            thread.start()
+        elif message["type"] == "worker_unreserve":
+            self.unreserve_book(message["book_id"])
+
+    # Worker del nodo que atiende un mensaje: el dueño del recurso, el de la franja de gossip o
+    # el que numeró el sondeo o la sesión confiable que se responde; None si puede ser cualquiera
+    def message_worker(self, message):
+        if "book_id" in message:
+            return shard_of(message["book_id"], self.workers)
+        if "shard" in message:
+            return message["shard"] % self.workers
+        if message["type"] == "ack":
+            return message["seq"] % self.workers
+        if message["type"] == "reliable_ack":
+            return message["rsid"] % self.workers
+        return None
+
+    # Con varios workers, reenviar un mensaje al worker que lo atiende; devuelve True si lo atiende
+    # otro. Los cambios de membresía se reenvían a todos y también se atienden aquí
+    def route_to_worker(self, message, addr):
+        if "fwd" in message:
+            return False
+        if message["type"] in MEMBERSHIP_TYPES:
+            for worker in range(self.workers):
+                if worker != self.worker:
+                    self.forward(message, addr, worker)
+            return False
+        worker = self.message_worker(message)
+        if worker is None or worker == self.worker:
+            return False
+        self.forward(message, addr, worker)
+        return True
+
+    # Reenviar a otro worker del nodo un mensaje recibido de addr: el datagrama original si se
+    # tiene, o el mensaje codificado de nuevo (sin la secuencia del canal confiable, que ya se
+    # confirmó al recibirlo)
+    def forward(self, message, addr, worker, data=None):
+        if data is None:
+            if "rseq" in message:
+                message = {key: value for key, value in message.items() if key not in ("rsid", "rseq")}
+            data = wrap_forward(encode_binary(message), addr, FORWARD_ENCODED)
+        else:
+            data = wrap_forward(data, addr)
+        try:
+            for datagram in fragment(data, next(self.message_ids) & 0xFFFFFFFF):
+                self.forward_socket.sendto(datagram, socket.MSG_DONTWAIT, self.forward_paths[worker])
+        except OSError as e:
+            # Worker caído o con la cola llena: se pierde como un datagrama UDP
+            WORKER_FORWARDS.inc(self.name, "dropped")
+            log.debug("%s: no se pudo reenviar %s al worker %d: %s", self.name, message["type"], worker, e)
+            return
+        WORKER_FORWARDS.inc(self.name, "forwarded")
+
+    # Marcar los mensajes de gossip con la franja de este worker, para que el nodo que los
+    # recibe los pase a su worker de la misma franja
+    def tag_shard(self, message):
+        if self.workers > 1 and message["type"] in GOSSIP_TYPES:
+            return dict(message, shard=self.worker)
+        return message
+
+    # Manejar solicitud de bloqueo de un recurso
+    def handle_lock_request(self, message, addr):
+        book_id = message["book_id"]
+        if self.has_book(book_id):
+            # Una réplica nueva rechaza hasta sincronizar la partición: sin la fila no sabe si está reservado
+            approved = self.inventory.get(book_id) is None and not self.in_handoff(book_id)
+            if approved and message.get("quorum"):
+                approved = self.try_hold(book_id, message["holder"], message["request_id"])
+            response = {
+                "type": "lock_response",
+                "book_id": book_id,
+                "approved": approved
+            }
+        else:
+            response = {
+                "type": "lock_response",
+                "book_id": book_id,
+                "approved": False,
+                "error": "Book ID not found"
+            }
+        if "request_id" in message:
+            response["request_id"] = message["request_id"]
+        self.send_message(response, addr)
+
+    # Conceder un bloqueo exclusivo en modo quórum: un libro solo puede estar retenido
+    # por una solicitud a la vez, así dos mayorías nunca aprueban el mismo libro
+    def try_hold(self, book_id, holder, request_id):
+        hold = self.lock_holds.get(book_id)
+        now = self.now()
+        if hold is not None and hold[0] != (holder, request_id) and hold[1] > now:
+            return False
+        self.lock_holds[book_id] = ((holder, request_id), now + LOCK_LEASE)
+        return True
+
+    # Liberar un bloqueo si sigue retenido por la misma solicitud
+    def release_hold(self, book_id, holder, request_id):
+        hold = self.lock_holds.get(book_id)
+        if hold is not None and hold[0] == (holder, request_id):
+            del self.lock_holds[book_id]
+
+    # Reloj monótono del nodo: en el runtime asyncio es el del bucle (virtual si se usa el emulador)
+    def now(self):
+        if self.loop is not None:
+            return self.loop.time()
+        return time.monotonic()
+
+    # Incorporar una muestra de RTT hacia un par (respuestas de bloqueo, gossip, pings y acks)
+    def record_rtt(self, peer, rtt):
+        self.rtt.setdefault(tuple(peer), RttEstimator()).update(rtt)
+        self.rtt_overall.update(rtt)
+
+    # Espera por las respuestas de bloqueo: alcanza para una retransmisión más la vuelta del par
+    # más lento, con el retroceso por vencimientos acotado a LOCK_MAX_BACKOFF duplicaciones. Un
+    # par sin muestras propias usa el RTT del conjunto; sin ninguna muestra se usa LOCK_TIMEOUT
+    def lock_deadline(self, peers):
+        if not self.rtt_measured(peers):
+            return LOCK_TIMEOUT
+        deadline = 0
+        for peer in peers:
+            estimator = self.peer_rtt(peer)
+            deadline = max(deadline, 2 * estimator.rto(LOCK_MAX_BACKOFF) + estimator.srtt)
+        return min(LOCK_TIMEOUT, deadline)
+
+    # Estimador de RTT de un par, o el del conjunto si el par todavía no tiene muestras
+    def peer_rtt(self, peer):
+        estimator = self.rtt.get(tuple(peer))
+        if estimator is None or not estimator.samples:
+            return self.rtt_overall
+        return estimator
+
+    # Si hay RTT medido (propio o del conjunto) para todos los pares
+    def rtt_measured(self, peers):
+        return all(self.peer_rtt(peer).samples for peer in peers)
+
+    # Tabla de RTT por par (en milisegundos) para métricas e introspección
+    def rtt_table(self):
+        table = {}
+        for (host, port), estimator in self.rtt.items():
+            if not estimator.samples:
+                continue
+            table[f"{host}:{port}"] = {
+                "srtt_ms": round(estimator.srtt * 1000, 3),
+                "rttvar_ms": round(estimator.rttvar * 1000, 3),
+                "rto_ms": round(estimator.rto() * 1000, 3),
+                "deadline_ms": round(self.lock_deadline([(host, port)]) * 1000, 3),
+                "samples": estimator.samples,
+                "backoff": estimator.backoff
+            }
+        return table
+
+    # Codificar un mensaje según lo negociado con el par: binario si ya lo habla,
+    # si no JSON anunciando la versión binaria que este nodo entiende
+    def encode_message(self, message, peer):
+        if self.peer_codecs.get(tuple(peer)) == "binary":
+            return encode_binary(message)
+        if self.wire_format == "binary":
+            message = dict(message, bin=PROTOCOL_VERSION)
+        return json.dumps(message).encode()
+
+    # Decodificar un datagrama (binario o JSON) y recordar si el par habla binario
+    def decode_message(self, data, addr):
+        if data[0] == WIRE_MAGIC:
+            message = decode_binary(data)
+            self.peer_codecs[tuple(addr)] = "binary"
+        else:
+            message = json.loads(data.decode())
+            if self.wire_format == "binary" and message.get("bin", 0) >= 1:
+                self.peer_codecs[tuple(addr)] = "binary"
+        return message
+
+    # Si un mensaje va por el canal confiable: los de control si está activo, y en modo quórum
+    # siempre la confirmación o liberación de un bloqueo (si se pierde, el bloqueo vence y otra
+    # mayoría podría aprobar el mismo libro)
+    def tracked(self, message_type):
+        if self.reliable and message_type in RELIABLE_TYPES:
+            return True
+        return self.reservation_mode == "quorum" and message_type in QUORUM_RELIABLE_TYPES
+
+    # Enviar un mensaje a un par específico; los de control van por el canal confiable si está activo
+    def send_message(self, message, peer):
+        if self.tracked(message["type"]):
+            message = self.channel.track(message, peer)
+        self.transmit(message, peer)
+
+    # Codificar, fragmentar y enviar un mensaje tal cual (también se usa para los reenvíos)
+    def transmit(self, message, peer):
+        message = self.tag_shard(message)
+        data = self.encode_message(message, peer)
+        packets = [(datagram, peer) for datagram in fragment(data, next(self.message_ids) & 0xFFFFFFFF)]
+        self.send_datagrams(packets)
+        self.record_sent(message["type"], 1, packets, len(data))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s: mensaje enviado a %s: %s", self.name, peer, message)
+
+    # Enviar el mismo mensaje a varios pares: se codifica y fragmenta una vez por formato (con el
+    # canal confiable, una vez por par, porque cada copia lleva su secuencia) y todos los
+    # datagramas salen juntos
+    def broadcast(self, message, peers):
+        message = self.tag_shard(message)
+        tracked = self.tracked(message["type"])
+        encoded = {}  # Formato del par -> datagramas ya codificados
+        packets = []
+        size = 0
+        for peer in peers:
+            codec = None if tracked else self.peer_codecs.get(tuple(peer), "json")
+            datagrams = encoded.get(codec)
+            if datagrams is None:
+                data = self.encode_message(self.channel.track(message, peer) if tracked else message, peer)
+                datagrams = fragment(data, next(self.message_ids) & 0xFFFFFFFF)
+                size = len(data)
+                if codec is not None:
+                    encoded[codec] = datagrams
+            packets.extend((datagram, peer) for datagram in datagrams)
+        self.send_datagrams(packets)
+        self.record_sent(message["type"], len(peers), packets, size)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s: mensaje enviado a %d pares: %s", self.name, len(peers), message)
+
+    # Enviar datagramas [(datos, par)]: en lote por el socket si hay sendmmsg y el transporte no
+    # tiene envíos encolados (no se los adelanta); lo que no sale en lote va de a uno
+    def send_datagrams(self, packets):
+        sent = 0
+        if self.sender is not None and len(packets) >= MIN_BATCH and (self.transport is None or not self.transport.get_write_buffer_size()):
+            sent = self.sender.send(packets)
+        for datagram, peer in packets[sent:]:
+            if self.transport is not None:
+                self.transport.sendto(datagram, peer)
+            else:
+                self.socket.sendto(datagram, peer)
+
+    # Contar en el tráfico y las métricas los mensajes enviados (size: largo codificado de uno)
+    def record_sent(self, message_type, messages, packets, size):
+        sent = sum(len(datagram) for datagram, _ in packets)
+        self.traffic["messages_sent"] += messages
+        self.traffic["datagrams_sent"] += len(packets)
+        self.traffic["bytes_sent"] += sent
+        BYTES_SENT.inc(self.name, amount=sent)
+        MESSAGES_SENT.inc(self.name, message_type, amount=messages)
+        if message_type in GOSSIP_TYPES:
+            GOSSIP_BYTES.observe(size, self.name, message_type)
+
+    # Método de gossiping para compartir el estado del inventario con otros nodos
+    def gossip(self):
+        while True:
+            time.sleep(self.gossip_delay())
+            self.gossip_round()
+
+    # Espera hasta la próxima ronda de gossip: entre 1 y 15 segundos, o el intervalo configurado ±50%
+    def gossip_delay(self):
+        if self.gossip_interval is None:
+            return random.randint(1, 15)
+        return self.gossip_interval * random.uniform(0.5, 1.5)
+
+    # Una ronda de gossip con un par elegido al azar
+    def gossip_round(self):
+        # En modo particionado solo se sincroniza con pares que comparten particiones, y solo esas
+        shared = None if self.replication is None else self.placement().shared
+        peers = self.peers if shared is None else list(shared)
+        if peers:
+            peer = random.choice(peers)
+            partitions = None if shared is None else shared[peer]
+            handoff = partitions is not None and not self.handoff.isdisjoint(partitions)
+            if self.gossip_mode == "delta" or handoff:
+                # Solo se envía la raíz del digest y el cursor: si el par está sincronizado no hace falta nada más
+                message = {"type": "gossip_digest", "root": self.digest_root(partitions), "cursor_hash": self.updates.cursor_hash()}
+                if partitions is not None:
+                    message["partitions"] = partitions
+                if handoff:
+                    message["sync"] = True  # El par responde aunque las raíces coincidan, para confirmar el traspaso
+                    message["handoff"] = self.handoff_among(partitions)
+                self.gossip_sent[peer] = self.now()
+                if self.swim_updates:
+                    message["members"] = self.take_piggyback()
+            else:
+                # Inventario y versiones salen del mismo snapshot, sin lecturas a medio escribir
+                snapshot = self.inventory.snapshot()
+                entries = list(snapshot.items()) if partitions is None else [(snapshot.book_id(row), snapshot.entry(row)) for row in snapshot.stripe_rows(partitions)]
+                message = {
+                    "type": "inventory_update",
+                    "inventory": {book_id: entry[0] for book_id, entry in entries},
+                    "updates": self.updates.since(self.peer_cursors.get(peer, {})),
+                    "cursor": self.updates.cursor(),
+                    "floors": self.updates.floor_marks(),
+                    "versions": {book_id: entry[1] for book_id, entry in entries}
+                }
+            self.send_message(message, peer)
+            log.debug("%s: gossip enviado a %s", self.name, peer)
+
+    # Raíz del digest del inventario, o de algunas particiones en modo particionado
+    def digest_root(self, partitions=None):
+        return self.inventory.digest_root(partitions)
+
+    # Guardar el cursor confirmado por un par y compactar lo que todos los pares ya tienen
+    def record_peer_cursor(self, addr, cursor):
+        self.peer_cursors[tuple(addr)] = cursor
+        removed = self.updates.compact([self.peer_cursors.get(peer, {}) for peer in self.peers])
+        if removed:
+            log.debug("%s: registro de actualizaciones compactado, %d entradas eliminadas", self.name, removed)
+
+    # Enviar a un par las operaciones del registro que todavía no tiene (ninguna si no se conoce
+    # su cursor); con reply el par contesta con su cursor aunque no le falte nada
+    def send_oplog_update(self, addr, remote_cursor, reply=False):
+        message = {
+            "type": "oplog_update",
+            "updates": [] if remote_cursor is None else self.updates.since(remote_cursor),
+            "cursor": self.updates.cursor(),
+            "floors": self.updates.floor_marks()
+        }
+        if reply:
+            message["reply"] = True
+        self.send_message(message, addr)
+
+    # Incorporar operaciones de un par y devolverle las que le faltan. Solo se responde si algo
+    # cambió aquí o si el par está atrasado: así dos registros con huecos no se contestan sin fin
+    def handle_oplog_update(self, message, addr):
+        added = self.updates.extend(message["updates"])
+        self.updates.raise_floors(message.get("floors", {}))
+        self.record_peer_cursor(addr, message["cursor"])
+        if added or message.get("reply") or self.updates.ahead_of(message["cursor"]):
+            self.send_oplog_update(addr, message["cursor"])
+
+    # Responder a un digest remoto con las operaciones faltantes y los hashes por rango si las raíces difieren
+    def handle_gossip_digest(self, message, addr):
+        if "cursor" in message:
+            # Digest de un nodo anterior, con el cursor completo
+            self.record_peer_cursor(addr, message["cursor"])
+            if message["cursor"] != self.updates.cursor():
+                self.send_oplog_update(addr, message["cursor"])
+        elif message.get("cursor_hash") == self.updates.cursor_hash():
+            # El par tiene el mismo cursor: alcanza para compactar sin que el cursor viaje
+            self.record_peer_cursor(addr, self.updates.cursor())
+        else:
+            # Los cursores difieren: solo entonces se intercambian completos, con lo que le falte
+            # al par desde su último cursor conocido
+            self.send_oplog_update(addr, self.peer_cursors.get(tuple(addr)), reply=True)
+        partitions = message.get("partitions")
+        if message["root"] == self.digest_root(partitions):
+            if partitions is not None:
+                self.confirm_handoff(partitions, addr, message.get("handoff", []))
+                if message.get("sync"):
+                    self.send_sync_digest(addr, partitions, False)
+            return
+        if partitions is not None:
+            # Un hash por partición compartida en lugar de los rangos del inventario completo
+            buckets = [f"{self.inventory.stripe_hashes[partition]:016x}" for partition in partitions]
+            reply = {"type": "gossip_buckets", "buckets": buckets, "partitions": partitions}
+            handoff = self.handoff_among(partitions)
+            if handoff:
+                reply["handoff"] = handoff
+            self.send_message(reply, addr)
+            return
+        buckets = [f"{bucket_hash:016x}" for bucket_hash in self.inventory.bucket_hashes()]
+        self.send_message({"type": "gossip_buckets", "buckets": buckets}, addr)
+
+    # Bajar por el árbol de digest en cada rango que difiere del par. Un rango (bucket, modulus)
+    # son las claves con crc32 % modulus == bucket y sus DIGEST_BUCKETS hijos subdividen el módulo;
+    # el primer nivel son los rangos del digest (modulus 1 como padre) o las particiones compartidas
+    def handle_gossip_buckets(self, message, addr):
+        snapshot = self.inventory.snapshot()
+        if "partitions" in message:
+            # Las particiones chicas que difieren viajan juntas en un solo mensaje de versiones
+            stripes = len(snapshot.stripe_hashes)
+            partitions = []
+            for partition, remote_hash in zip(message["partitions"], message["buckets"]):
+                if remote_hash == f"{snapshot.stripe_hashes[partition]:016x}":
+                    self.confirm_handoff([partition], addr, message.get("handoff", []))
+                    continue
+                hashes, counts = snapshot.child_hashes(partition, stripes)
+                if sum(counts) <= GOSSIP_LEAF_ENTRIES:
+                    partitions.append(partition)
+                else:
+                    self.send_gossip_range(partition, stripes, hashes, addr)
+            if partitions:
+                versions = self.inventory.stripe_versions(partitions, snapshot)
+                self.send_message({"type": "gossip_versions", "partitions": partitions, "versions": versions}, addr)
+            return
+        parent = message.get("bucket", 0)
+        modulus = message.get("modulus", 1)
+        local_hashes = self.inventory.bucket_hashes() if modulus == 1 else snapshot.child_hashes(parent, modulus)[0]
+        for child, remote_hash in enumerate(message["buckets"]):
+            if remote_hash == f"{local_hashes[child]:016x}":
+                continue
+            bucket, child_modulus = parent + child * modulus, modulus * DIGEST_BUCKETS
+            hashes, counts = snapshot.child_hashes(bucket, child_modulus)
+            if sum(counts) <= GOSSIP_LEAF_ENTRIES or child_modulus * DIGEST_BUCKETS > GOSSIP_MAX_MODULUS:
+                versions = self.inventory.bucket_versions(bucket, snapshot, child_modulus)
+                self.send_message({"type": "gossip_versions", "bucket": bucket, "modulus": child_modulus, "versions": versions}, addr)
+            else:
+                self.send_gossip_range(bucket, child_modulus, hashes, addr)
+
+    # Pedir al par que compare los hijos de un rango grande que difiere, en vez de mandar todas sus versiones
+    def send_gossip_range(self, bucket, modulus, hashes, addr):
+        buckets = [f"{child_hash:016x}" for child_hash in hashes]
+        self.send_message({"type": "gossip_buckets", "bucket": bucket, "modulus": modulus, "buckets": buckets}, addr)
+
+    # Comparar versiones de un rango: enviar lo que está más nuevo aquí y pedir lo que está más nuevo allá
+    def handle_gossip_versions(self, message, addr):
+        remote_versions = message["versions"]
+        snapshot = self.inventory.snapshot()
+        newer_here = []
+        if "partitions" in message:
+            local_versions = self.inventory.stripe_versions(message["partitions"], snapshot)
+        else:
+            local_versions = self.inventory.bucket_versions(message["bucket"], snapshot, message.get("modulus", DIGEST_BUCKETS))
+        for book_id, version in local_versions.items():
+            remote_version = remote_versions.get(book_id)
+            if remote_version is None or newer(version, remote_version):
+                newer_here.append(book_id)
+        newer_there = []
+        for book_id, remote_version in remote_versions.items():
+            entry = snapshot.get(book_id)
+            if entry is None or newer(remote_version, entry[1]):
+                newer_there.append(book_id)
+        if newer_here:
+            self.send_delta(newer_here, addr, snapshot)
+        if newer_there:
+            self.send_message({"type": "gossip_pull", "book_ids": newer_there}, addr)
+
+    # Enviar solo las entradas indicadas, con su versión, tomadas de un snapshot
+    def send_delta(self, book_ids, addr, snapshot=None):
+        if not book_ids:
+            return
+        snapshot = self.inventory.snapshot() if snapshot is None else snapshot
+        entries = {book_id: snapshot[book_id] for book_id in book_ids}
+        self.send_message({"type": "gossip_delta", "entries": entries}, addr)
+
+    # Sincronizar el inventario con otro nodo: las entradas con versión y las que solo traen
+    # timestamp (nodos anteriores) se aplican cada grupo en una sola fusión masiva.
+    # Devuelve el conjunto de recursos que cambiaron
+    def merge_inventory(self, remote_inventory, remote_updates, remote_versions=None):
+        if remote_versions:
+            versioned = {book_id: (data, remote_versions[book_id]) for book_id, data in remote_inventory.items() if book_id in remote_versions}
+            legacy = {book_id: data for book_id, data in remote_inventory.items() if book_id not in remote_versions}
+        else:
+            versioned = {}
+            legacy = remote_inventory
+        changed = set(self.inventory.merge(versioned))
+        changed.update(self.inventory.merge_timestamps(legacy))
+        self.updates.extend(remote_updates)
+        log.debug("%s: inventario sincronizado, %d de %d entradas actualizadas", self.name, len(changed), len(remote_inventory))
+        return changed
+
+    # Método para reservar un libro
+    def reserve_book(self, book_id):
+        if self.workers > 1 and shard_of(book_id, self.workers) != self.worker:
+            self.forward({"type": "worker_reserve", "book_id": book_id}, (self.host, self.port), shard_of(book_id, self.workers))
+            return
+        if self.outside_loop():
+            # En el runtime asyncio toda la reserva (bloqueos, inventario, registro y avisos) corre
+            # en el bucle del nodo; la interfaz o la consola solo esperan el resultado
+            asyncio.run_coroutine_threadsafe(self.reserve_book_async(book_id), self.loop).result()
+            return
+        if self.loop is not None and self.loop.is_running():
+            self.loop.create_task(self.reserve_book_async(book_id))
+            return
+        if not self.has_book(book_id):
+            self.show_error_message(f"El libro {book_id} no existe en el inventario.")
+            return
+
+        log.info("%s: intentando reservar libro %s", self.name, book_id)
+        request_id, pending = self.send_lock_requests(book_id)
+        if not pending.event.wait(pending.deadline):
+            pending.expire()
+        self.close_lock_request(request_id, pending)
+        self.finish_reservation(book_id, pending.decision)
+
+    # Reservar un libro desde el runtime asyncio: las respuestas se esperan con un future por solicitud
+    async def reserve_book_async(self, book_id):
+        if not self.has_book(book_id):
+            self.show_error_message(f"El libro {book_id} no existe en el inventario.")
+            return False
+        approved = await self.request_locks_async(book_id)
+        return self.finish_reservation(book_id, approved)
+
+    # Pedir el bloqueo de un libro a todos los pares y esperar sus respuestas sin sondeo
+    async def request_locks_async(self, book_id):
+        log.info("%s: intentando reservar libro %s", self.name, book_id)
+        request_id, pending = self.send_lock_requests(book_id, self.loop.create_future())
+        try:
+            await asyncio.wait_for(asyncio.shield(pending.future), pending.deadline)
+        except asyncio.TimeoutError:
+            pending.expire()
+        self.close_lock_request(request_id, pending)
+        return pending.decision
+
+    # Registrar una solicitud de bloqueo con id propio y enviarla a los pares que guardan el libro
+    def send_lock_requests(self, book_id, future=None):
+        request_id = next(self.request_ids)
+        lock_request = {"type": "lock_request", "book_id": book_id, "request_id": request_id}
+        peers, local = self.book_replicas(book_id)
+        if self.reservation_mode == "quorum":
+            # Mayoría de las réplicas; el voto local (si este nodo es una) se resuelve sin red, y no
+            # cuenta mientras su partición está en traspaso
+            quorum = (len(peers) + local) // 2 + 1
+            vote = local and not self.in_handoff(book_id)
+            pending = PendingLock(book_id, len(peers), future, needed=quorum - vote, started=self.now())
+            lock_request["quorum"] = True
+            lock_request["holder"] = f"{self.host}:{self.port}"
+            if vote and (self.inventory.get(book_id) is not None or not self.try_hold(book_id, lock_request["holder"], request_id)):
+                pending.decide(False)
+                return request_id, pending
+        else:
+            pending = PendingLock(book_id, len(peers), future, started=self.now())
+        pending.peers = peers
+        pending.deadline = self.lock_deadline(pending.peers)
+        pending.measured = self.rtt_measured(pending.peers)
+        self.pending_locks[request_id] = pending
+        self.broadcast(lock_request, pending.peers)
+        if not peers:
+            pending.expire()
+        return request_id, pending
+
+    # Retirar una solicitud decidida de la tabla y registrar su latencia
+    def close_lock_request(self, request_id, pending):
+        self.pending_locks.pop(request_id, None)
+        if pending.timed_out:
+            # Los pares que no respondieron a tiempo tendrán más margen la próxima vez
+            for peer in pending.peers:
+                if peer not in pending.responders:
+                    self.rtt.setdefault(peer, RttEstimator()).timeout()
+        if self.reservation_mode == "quorum" and not pending.decision:
+            # Devolver los bloqueos que sí se concedieron para no retener el libro hasta que venzan
+            holder = f"{self.host}:{self.port}"
+            self.release_hold(pending.book_id, holder, request_id)
+            release = {"type": "lock_release", "book_id": pending.book_id, "holder": holder, "request_id": request_id}
+            self.broadcast(release, pending.peers)
+        finished = self.now()
+        self.lock_samples.append((finished, finished - pending.started))
+        outcome = "timeout" if pending.timed_out else "approved" if pending.decision else "denied"
+        LOCK_REQUEST_SECONDS.observe(finished - pending.started, self.name, outcome)
+
+    # Reservas por segundo y latencias p50/p99 (en segundos) de las últimas solicitudes de bloqueo
+    def reservation_metrics(self):
+        samples = list(self.lock_samples)
+        if not samples:
+            return {"count": 0, "throughput": 0.0, "p50": None, "p99": None}
+        latencies = sorted(latency for _, latency in samples)
+        elapsed = max(end for end, _ in samples) - min(end - latency for end, latency in samples)
+        return {
+            "count": len(samples),
+            "throughput": len(samples) / elapsed if elapsed > 0 else 0.0,
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99)
+        }
+
+    # Confirmar o rechazar una reserva según las respuestas de los pares
+    def finish_reservation(self, book_id, approved):
+        if approved and self.replication is not None:
+            self.inventory.seed([book_id])  # Fila del catálogo que todavía no se había escrito aquí
+        if approved and self.inventory.compare_and_set(book_id, None, (time.time(), f"{self.host}:{self.port}")) is None:
+            # Otra reserva del mismo libro se aplicó mientras se esperaban las respuestas
+            self.lock_holds.pop(book_id, None)
+            log.info("%s: reserva fallida para el libro %s, ya fue reservado por otro nodo", self.name, book_id)
+            self.show_error_message(f"No se pudo reservar el libro {book_id}: ya fue reservado por otro nodo")
+            return False
+        if approved:
+            log.info("%s: reserva confirmada para el libro %s", self.name, book_id)
+            self.lock_holds.pop(book_id, None)
+            self.updates.append(f"Reserva de {book_id}")
+            self.notify_peers(book_id, "reservation")
+        else:
+            log.info("%s: reserva fallida para el libro %s, no se recibió confirmación suficiente de los peers", self.name, book_id)
+            self.show_error_message(f"No se pudo reservar el libro {book_id}: no se recibió confirmación suficiente de los peers")
+        return approved
+
+    # Método para devolver una reserva de libro
+    def unreserve_book(self, book_id):
+        if self.workers > 1 and shard_of(book_id, self.workers) != self.worker:
+            self.forward({"type": "worker_unreserve", "book_id": book_id}, (self.host, self.port), shard_of(book_id, self.workers))
+            return
+        if self.outside_loop():
+            asyncio.run_coroutine_threadsafe(self.unreserve_book_async(book_id), self.loop).result()
+            return
+        if not self.has_book(book_id):
+            self.show_error_message(f"El libro {book_id} no existe en el inventario.")
+            return
+
+        current = self.inventory.get(book_id)
+        # La devolución solo se aplica si la reserva propia sigue vigente al escribir
+        if current and current[1] == f"{self.host}:{self.port}" and self.inventory.compare_and_set(book_id, current, None) is not None:
+            log.info("%s: devolviendo reserva del libro %s", self.name, book_id)
+            self.updates.append(f"Devolución de {book_id}")
+            self.notify_peers(book_id, "unreserve")
+        else:
+            self.show_error_message(f"No se puede devolver el libro {book_id} porque no está reservado por este nodo.")
+
+    # Devolver una reserva dentro del bucle del nodo (runtime asyncio)
+    async def unreserve_book_async(self, book_id):
+        self.unreserve_book(book_id)
+
+    # Si se llama desde otro hilo (interfaz o consola) mientras el nodo corre en un bucle asyncio
+    def outside_loop(self):
+        if self.loop is None or not self.loop.is_running():
+            return False
+        try:
+            return asyncio.get_running_loop() is not self.loop
+        except RuntimeError:
+            return True
+
+    # Notificar a los pares que guardan el libro sobre una reserva o devolución
+    def notify_peers(self, book_id, msg_type):
+        log.debug("%s: notificando a los peers sobre %s del libro %s", self.name, msg_type, book_id)
+        data, version = self.inventory.entry(book_id)
+        notification = {
+            "type": msg_type,
+            "book_id": book_id,
+            "data": data,
+            "version": version
+        }
+        self.broadcast(notification, self.book_replicas(book_id)[0])
+
+    # Ubicación de las particiones en el anillo para la membresía actual (modo particionado).
+    # Las particiones que pasa a compartir con otra réplica (recibidas de otro nodo, o las que
+    # guardaba solo) quedan en traspaso hasta compararlas con un par que las guarde
+    def placement(self):
+        placement = self.ring
+        if placement is None:
+            placement = Placement((self.host, self.port), self.peers, self.replication, self.inventory.stripes)
+            shared = {partition for partitions in placement.shared.values() for partition in partitions}
+            gained = shared - self.shared_partitions
+            self.handoff = (self.handoff | gained) & shared
+            self.handoff_matches = {partition: matches for partition, matches in self.handoff_matches.items() if partition in self.handoff and partition not in gained}
+            self.shared_partitions = shared
+            self.ring = placement
+            if gained:
+                log.info("%s: %d particiones en traspaso, sin votar hasta sincronizarlas", self.name, len(gained))
+                for peer, partitions in placement.shared.items():
+                    if not gained.isdisjoint(partitions):
+                        self.send_sync_digest(peer, partitions)
+        return placement
+
+    # Enviar el digest de las particiones compartidas con un par; con sync el par responde
+    # con el suyo aunque coincidan, así este nodo confirma el traspaso. El digest lleva las
+    # particiones que este nodo tiene en traspaso: para esas su coincidencia no prueba nada
+    def send_sync_digest(self, peer, partitions, sync=True):
+        message = {"type": "gossip_digest", "root": self.digest_root(partitions), "cursor_hash": self.updates.cursor_hash(), "partitions": partitions}
+        if sync:
+            message["sync"] = True
+        handoff = self.handoff_among(partitions)
+        if handoff:
+            message["handoff"] = handoff
+        self.send_message(message, peer)
+
+    # Particiones de una lista que este nodo tiene en traspaso
+    def handoff_among(self, partitions):
+        handoff = self.handoff
+        return [partition for partition in partitions if partition in handoff]
+
+    # Particiones cuyo hash coincidió con el de un par que las guarda. Solo salen del traspaso si
+    # el par no está él mismo en traspaso (tenía la partición en la ubicación anterior), o si
+    # coincidieron todas las réplicas actuales, todas nuevas: entonces ninguna tiene más datos
+    # (pasa al arrancar el cluster). Dos réplicas nuevas y vacías no se confirman entre sí
+    def confirm_handoff(self, partitions, peer, peer_handoff):
+        if not self.handoff or self.handoff.isdisjoint(partitions):
+            return
+        placement = self.placement()
+        peer = tuple(peer)
+        peer_handoff = set(peer_handoff)
+        confirmed = set()
+        for partition in partitions:
+            replicas = placement.peers_for(partition)[0]
+            if partition not in self.handoff or peer not in replicas:
+                continue
+            if partition not in peer_handoff:
+                confirmed.add(partition)
+                continue
+            matches = self.handoff_matches.setdefault(partition, set())
+            matches.add(peer)
+            if matches.issuperset(replicas):
+                confirmed.add(partition)
+        if confirmed:
+            self.handoff = self.handoff - confirmed
+            for partition in confirmed:
+                self.handoff_matches.pop(partition, None)
+            if not self.handoff:
+                log.info("%s: traspaso de particiones completo", self.name)
+
+    # Si un libro está en una partición en traspaso (este nodo todavía no vota por él)
+    def in_handoff(self, book_id):
+        if self.replication is None:
+            return False
+        self.placement()
+        return partition_of(book_id, self.inventory.stripes) in self.handoff
+
+    # Pares que guardan un libro y si este nodo también lo guarda: todos sin particionar
+    def book_replicas(self, book_id):
+        if self.replication is None:
+            return list(self.peers), True
+        return self.placement().peers_for(partition_of(book_id, self.inventory.stripes))
+
+    # Si un libro existe: en modo particionado basta con que sea del catálogo, aunque no tenga fila aquí
+    def has_book(self, book_id):
+        return book_id in self.inventory or (self.replication is not None and self.in_catalog(book_id))
+
+    # Recurso del catálogo sembrado (Recurso-1 .. Recurso-seeded)
+    def in_catalog(self, book_id):
+        prefix, _, number = book_id.partition("-")
+        return prefix == "Recurso" and number.isdigit() and 1 <= int(number) <= self.seeded
+
+    # Hash de cada partición que este nodo guarda, para comparar réplicas
+    def partition_hashes(self):
+        return {partition: self.inventory.stripe_hashes[partition] for partition in self.placement().local}
+
+    # Aplicar cambios de membresía en orden de época; si falta alguno se piden los cambios desde la última conocida
+    def apply_membership_events(self, events):
+        for epoch, kind, node in sorted(events):
+            if epoch <= self.membership_epoch:
+                continue
+            if epoch > self.membership_epoch + 1:
+                self.get_node_list()
+                return
+            node = tuple(node)
+            if kind == "node_joined":
+                self.add_peer(node)
+            elif kind == "node_left" and node in self.peers and self.membership != "swim":
+                # Con SWIM las bajas las decide el detector de fallas, no el servidor
+                self.peers.remove(node)
+                self.ring = None
+            self.membership_epoch = epoch
+        log.info("%s: lista de nodos actualizada (época %d), %d pares", self.name, self.membership_epoch, len(self.peers))
+
+    # Agregar un par conocido (sin duplicarlo ni agregarse a sí mismo). Con SWIM un par que vuelve
+    # queda vivo: si siguiera marcado caído o sospechoso nunca se lo volvería a sospechar
+    def add_peer(self, addr):
+        if addr != (self.host, self.port) and addr not in self.peers:
+            self.peers.append(addr)
+            self.ring = None
+            if self.membership == "swim":
+                with self.swim_lock:
+                    member = self.members.get(addr)
+                    if member is not None and member["state"] != "alive":
+                        self.members[addr] = {"state": "alive", "incarnation": member["incarnation"], "since": self.now()}
+            return True
+        return False
+
+    # Detector de fallas SWIM (runtime con hilos): un sondeo por período
+    def failure_detector(self):
+        while True:
+            seq = self.start_swim_probe()
+            time.sleep(SWIM_PING_TIMEOUT)
+            self.send_indirect_probes(seq)
+            time.sleep(SWIM_PERIOD - SWIM_PING_TIMEOUT)
+            self.finish_swim_probe(seq)
+            self.expire_suspects()
+            self.probe_dead_member()
+
+    # Detector de fallas SWIM (runtime asyncio)
+    async def failure_detector_async(self):
+        while True:
+            seq = self.start_swim_probe()
+            await asyncio.sleep(SWIM_PING_TIMEOUT)
+            self.send_indirect_probes(seq)
+            await asyncio.sleep(SWIM_PERIOD - SWIM_PING_TIMEOUT)
+            self.finish_swim_probe(seq)
+            self.expire_suspects()
+            self.probe_dead_member()
+
+    # Estado SWIM de un par; los pares recién conocidos se consideran vivos
+    def swim_member(self, addr):
+        with self.swim_lock:
+            member = self.members.get(addr)
+            if member is None:
+                member = {"state": "alive", "incarnation": 0, "since": self.now()}
+                self.members[addr] = member
+            return member
+
+    # Elegir el próximo par a sondear: se recorren todos en orden aleatorio, una vez por ronda
+    def next_swim_target(self):
+        with self.swim_lock:
+            while self.swim_targets:
+                target = self.swim_targets.pop()
+                if target in self.peers:
+                    return target
+            if not self.peers:
+                return None
+            self.swim_targets = list(self.peers)
+            random.shuffle(self.swim_targets)
+            return self.swim_targets.pop()
+
+    # Enviar un ping directo; si hay un solicitante, el ack se le reenvía (sondeo indirecto)
+    def send_probe(self, target, requester=None):
+        seq = next(self.swim_seq)
+        with self.swim_lock:
+            self.swim_probes[seq] = {"target": target, "acked": False, "requester": requester, "started": self.now()}
+        self.send_message({"type": "ping", "seq": seq, "members": self.take_piggyback()}, target)
+        return seq
+
+    # Iniciar la ronda: ping directo al próximo par
+    def start_swim_probe(self):
+        target = self.next_swim_target()
+        if target is None:
+            return None
+        return self.send_probe(target)
+
+    # Sin ack directo: pedir a k pares al azar que sondeen al objetivo
+    def send_indirect_probes(self, seq):
+        with self.swim_lock:
+            probe = self.swim_probes.get(seq)
+            if probe is None or probe["acked"]:
+                return
+        helpers = [peer for peer in self.peers if peer != probe["target"]]
+        for helper in random.sample(helpers, min(SWIM_INDIRECT_PROBES, len(helpers))):
+            self.send_message({"type": "ping_req", "seq": seq, "target": list(probe["target"]), "members": self.take_piggyback()}, helper)
+
+    # Cerrar la ronda: si nadie confirmó al objetivo pasa a sospechoso
+    def finish_swim_probe(self, seq):
+        with self.swim_lock:
+            probe = self.swim_probes.pop(seq, None)
+            # Los sondeos hechos a pedido de otros que nunca respondieron también se descartan
+            stale = self.now() - SWIM_PERIOD
+            for other in [key for key, value in self.swim_probes.items() if value["requester"] and value["started"] < stale]:
+                self.swim_probes.pop(other, None)
+            if probe is None or probe["acked"] or probe["target"] not in self.peers:
+                return
+            member = self.swim_member(probe["target"])
+            if member["state"] == "alive":
+                self.apply_swim_updates([["suspect", list(probe["target"]), member["incarnation"]]])
+
+    # Un ack confirma el sondeo; si era indirecto se le avisa al nodo que lo pidió
+    def handle_swim_ack(self, seq, addr):
+        with self.swim_lock:
+            probe = self.swim_probes.get(seq)
+            if probe is None:
+                return
+            if not probe["acked"] and probe["target"] == addr:
+                self.record_rtt(addr, self.now() - probe["started"])
+            probe["acked"] = True
+            if probe["requester"] is None or self.swim_probes.pop(seq, None) is None:
+                return
+        requester, requester_seq = probe["requester"]
+        self.send_message({"type": "ack", "seq": requester_seq, "members": self.take_piggyback()}, requester)
+
+    # Cada SWIM_REJOIN_INTERVAL, ping a un miembro dado por caído: los caídos no se sondean en las
+    # rondas y el servidor solo avisa de altas, así que sin esto dos lados de una partición no se
+    # vuelven a encontrar. Si responde, su ack (o su ping) lo vuelve a sumar como par
+    def probe_dead_member(self):
+        with self.swim_lock:
+            now = self.now()
+            if now - self.last_rejoin_probe < SWIM_REJOIN_INTERVAL:
+                return
+            self.last_rejoin_probe = now
+            dead = [addr for addr, member in self.members.items() if member["state"] == "dead" and addr not in self.peers]
+        if dead:
+            self.send_message({"type": "ping", "seq": next(self.swim_seq), "members": self.take_piggyback()}, random.choice(dead))
+
+    # Dar por caídos a los sospechosos que no refutaron a tiempo
+    def expire_suspects(self):
+        with self.swim_lock:
+            now = self.now()
+            for addr, member in list(self.members.items()):
+                if member["state"] == "suspect" and now - member["since"] > SWIM_SUSPICION_TIMEOUT:
+                    self.apply_swim_updates([["dead", list(addr), member["incarnation"]]])
+
+    # Aplicar cambios de membresía recibidos (o generados localmente) con las reglas de SWIM
+    def apply_swim_updates(self, updates, sender=None):
+        with self.swim_lock:
+            if self.membership != "swim":
+                return
+            if sender is not None and self.add_peer(tuple(sender)):
+                self.queue_swim_update(["alive", list(sender), self.swim_member(tuple(sender))["incarnation"]])
+            me = (self.host, self.port)
+            for kind, addr, incarnation in updates:
+                addr = tuple(addr)
+                if addr == me:
+                    if kind != "alive" and incarnation >= self.incarnation:
+                        # Refutar la sospecha con una encarnación mayor
+                        self.incarnation = incarnation + 1
+                        self.queue_swim_update(["alive", list(me), self.incarnation])
+                    continue
+                member = self.members.get(addr)
+                if kind == "alive":
+                    if member is None or incarnation > member["incarnation"] or (member["state"] == "dead" and incarnation >= member["incarnation"]):
+                        self.members[addr] = {"state": "alive", "incarnation": incarnation, "since": self.now()}
+                        self.add_peer(addr)
+                        self.queue_swim_update([kind, list(addr), incarnation])
+                elif kind == "suspect":
+                    if member is not None and member["state"] != "dead" and (incarnation > member["incarnation"] or (incarnation == member["incarnation"] and member["state"] == "alive")):
+                        self.members[addr] = {"state": "suspect", "incarnation": incarnation, "since": self.now()}
+                        log.warning("%s: nodo sospechoso %s", self.name, addr)
+                        self.queue_swim_update([kind, list(addr), incarnation])
+                elif kind == "dead":
+                    if member is None or member["state"] != "dead" and incarnation >= member["incarnation"]:
+                        self.members[addr] = {"state": "dead", "incarnation": incarnation, "since": self.now()}
+                        if addr in self.peers:
+                            self.peers.remove(addr)
+                            self.ring = None
+                            log.warning("%s: nodo caído %s", self.name, addr)
+                        self.queue_swim_update([kind, list(addr), incarnation])
+
+    # Encolar un cambio para difundirlo en los próximos mensajes
+    def queue_swim_update(self, update):
+        with self.swim_lock:
+            retransmits = SWIM_RETRANSMIT_MULT * max(1, math.ceil(math.log2(len(self.peers) + 2)))
+            self.swim_updates[tuple(update[1])] = [update, retransmits]
+
+    # Tomar los cambios a adjuntar en un mensaje, priorizando los menos difundidos
+    def take_piggyback(self):
+        with self.swim_lock:
+            if not self.swim_updates:
+                return []
+            chosen = sorted(self.swim_updates.items(), key=lambda item: -item[1][1])[:SWIM_MAX_PIGGYBACK]
+            updates = []
+            for addr, entry in chosen:
+                updates.append(entry[0])
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    self.swim_updates.pop(addr, None)
+            return updates
+
+    # Registrar el nodo con el servidor de descubrimiento
+    def register_with_discovery_server(self):
+        log.info("%s: registrando nodo con el servidor de descubrimiento %s", self.name, self.discovery_server)
+        message = {"type": "join"}
+        self.send_message(message, self.discovery_server)
+        self.get_node_list()
+
+    # Solicitar la lista de nodos del servidor de descubrimiento
+    def get_node_list(self):
+        log.debug("%s: solicitando lista de nodos del servidor de descubrimiento", self.name)
+        message = {"type": "get_nodes"}
+        if self.membership_epoch:
+            message["since"] = self.membership_epoch
+        self.send_message(message, self.discovery_server)
+
+    # Cerrar el nodo: avisar al servidor de descubrimiento (una vez por nodo, desde el worker 0) y
+    # dejar un snapshot con todo lo escrito, así el próximo arranque no tiene que repasar el WAL
+    def shutdown(self):
+        if self.worker == 0:
+            self.leave_discovery_server()
+        if self.storage is not None:
+            self.checkpoint()
+            self.storage.close()
+
+    # Avisar al servidor de descubrimiento que el nodo se retira
+    def leave_discovery_server(self):
+        log.info("%s: retirando nodo del servidor de descubrimiento %s", self.name, self.discovery_server)
+        self.send_message({"type": "leave"}, self.discovery_server)
+
+    # Elementos pendientes en las colas internas del nodo (se exponen en las métricas)
+    def queue_depths(self):
+        return {
+            "pending_locks": len(self.pending_locks),
+            "unacked": self.channel.pending(),
+            "fragments": sum(len(messages) for messages in self.reassembler.pending.values()),
+            "oplog": len(self.updates),
+            "receive_control": self.receive_queue.depth("control"),
+            "receive_bulk": self.receive_queue.depth("bulk")
+        }
+
+    # Registrar un observador (por ejemplo la interfaz gráfica)
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    # Avisar a los observadores que el inventario cambió; changed son los recursos afectados
+    # (None si no se sabe cuáles y hay que revisar todo el inventario)
+    def update_inventory_display(self, changed=None):
+        for observer in self.observers:
+            observer.update_inventory_display(changed)
+
+    # Avisar de un error a los observadores, o mostrarlo en consola si no hay ninguno
+    def show_error_message(self, message):
+        if not self.observers:
+            log.error("%s: %s", self.name, message)
+        for observer in self.observers:
+            observer.show_error_message(message)
+
+# Protocolo asyncio que entrega al nodo los datagramas recibidos
+class NodeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, node):
+        self.node = node
+
+    def connection_made(self, transport):
+        self.node.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.node.receive_async(data, addr)
+
+    def error_received(self, exc):
+        log.warning("Error de red en %s: %s", self.node.name, exc)
+
+# Ejecutar muchos nodos en un mismo bucle asyncio (un solo proceso, un solo hilo)
+async def run_nodes(nodes):
+    for node in nodes:
+        await node.start_async()
+    await asyncio.Event().wait()
+
+# Arrancar el nodo con hilos o con el runtime asyncio en un hilo de fondo
+def start_node(node, use_asyncio=False):
+    if use_asyncio:
+        loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=loop.run_forever)
+        loop_thread.daemon = True
+        loop_thread.start()
+        asyncio.run_coroutine_threadsafe(node.start_async(), loop).result()
+    else:
+        node.start_server()
+
+        gossip_thread = threading.Thread(target=node.gossip)
+        gossip_thread.daemon = True
+        gossip_thread.start()
+
+# Texto de estado de un libro para mostrar en consola o en la interfaz
+def book_status(data):
+    if data is None:
+        return "Disponible"
+    timestamp, owner = data
+    return f"Reservado por {owner} (timestamp: {timestamp})"
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Registro de operaciones acotado y sin duplicados, indexado por (nodo de origen, número de secuencia).
+# Lo modifican los hilos de recepción y lo leen el gossip y los snapshots: todo pasa por mutex
+class OpLog:
+    def __init__(self, origin, max_entries=1000):
+        self.origin = origin  # Origen de las operaciones locales
+        self.max_entries = max_entries  # Retención máxima aunque no todos los pares hayan confirmado
+        self.entries = OrderedDict()  # (origen, secuencia) -> descripción, en orden de llegada
+        self.heads = {}  # Secuencia contigua más alta recibida por origen (cursor)
+        self.tails = {}  # Secuencia más alta recibida por origen
+        self.floors = {}  # Secuencia hasta la cual el log ya fue compactado, por origen
+        self.journal = None  # Recibe cada operación nueva (record_op) para hacerla durable
+        self.mutex = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    # Registrar una operación local con el siguiente número de secuencia
+    def append(self, description):
+        with self.mutex:
+            seq = self.tails.get(self.origin, 0) + 1
+            self.add_locked(self.origin, seq, description)
+        return seq
+
+    # Registrar una operación (local o remota); devuelve False si ya se conocía
+    def add(self, origin, seq, description):
+        with self.mutex:
+            return self.add_locked(origin, seq, description)
+
+    # add() con el candado ya tomado
+    def add_locked(self, origin, seq, description):
+        key = (origin, seq)
+        if key in self.entries or seq <= self.floors.get(origin, 0):
+            return False
+        self.entries[key] = description
+        if self.journal is not None:
+            self.journal.record_op(origin, seq, description)
+        self.tails[origin] = max(self.tails.get(origin, 0), seq)
+        self.advance_head(origin)
+        if len(self.entries) > self.max_entries:
+            (old_origin, old_seq), _ = self.entries.popitem(last=False)
+            self.floors[old_origin] = max(self.floors.get(old_origin, 0), old_seq)
+            self.advance_head(old_origin)
+        return True
+
+    # Llevar el cursor de un origen hasta el piso y luego por las entradas contiguas (con el candado tomado)
+    def advance_head(self, origin):
+        head = max(self.heads.get(origin, 0), self.floors.get(origin, 0))
+        while (origin, head + 1) in self.entries:
+            head += 1
+        self.heads[origin] = head
+
+    # Incorporar operaciones recibidas como [origen, secuencia, descripción]
+    def extend(self, remote_entries):
+        added = 0
+        for origin, seq, description in remote_entries:
+            if self.add(origin, seq, description):
+                added += 1
+        return added
+
+    # Cursor actual: secuencia contigua más alta conocida de cada origen
+    def cursor(self):
+        with self.mutex:
+            return dict(self.heads)
+
+    # Huella de tamaño fijo del cursor: dos pares sincronizados la comparan sin enviar el cursor entero
+    def cursor_hash(self):
+        with self.mutex:
+            heads = sorted((origin, head) for origin, head in self.heads.items() if head > 0)
+        return hashlib.blake2b(json.dumps(heads).encode(), digest_size=8).hexdigest()
+
+    # Pisos de compactación de cada origen, para que un par salte lo que ya no se puede reenviar
+    def floor_marks(self):
+        with self.mutex:
+            return {origin: floor for origin, floor in self.floors.items() if floor > 0}
+
+    # Subir los pisos a los de un par: las operaciones por debajo ya no están en ningún registro
+    # que las pueda enviar, así el cursor deja de quedar trabado en ese hueco. Devuelve cuántos orígenes avanzaron
+    def raise_floors(self, floors):
+        raised = 0
+        with self.mutex:
+            for origin, floor in floors.items():
+                if floor > self.heads.get(origin, 0):
+                    self.floors[origin] = max(self.floors.get(origin, 0), floor)
+                    self.advance_head(origin)
+                    raised += 1
+        return raised
+
+    # Si el cursor de un par está por detrás de este registro en algún origen
+    def ahead_of(self, cursor):
+        with self.mutex:
+            return any(head > cursor.get(origin, 0) for origin, head in self.heads.items())
+
+    # Operaciones más nuevas que el cursor de un par, en orden de secuencia por origen
+    def since(self, cursor):
+        result = []
+        with self.mutex:
+            for origin, tail in self.tails.items():
+                start = max(cursor.get(origin, 0), self.floors.get(origin, 0))
+                for seq in range(start + 1, tail + 1):
+                    description = self.entries.get((origin, seq))
+                    if description is not None:
+                        result.append([origin, seq, description])
+        return result
+
+    # Eliminar las operaciones que todos los pares conocidos ya confirmaron
+    def compact(self, peer_cursors):
+        if not peer_cursors:
+            return 0
+        removed = 0
+        with self.mutex:
+            for origin in list(self.tails):
+                acked = min(cursor.get(origin, 0) for cursor in peer_cursors)
+                for seq in range(self.floors.get(origin, 0) + 1, acked + 1):
+                    if self.entries.pop((origin, seq), None) is not None:
+                        removed += 1
+                if acked > self.floors.get(origin, 0):
+                    self.floors[origin] = acked
+        return removed
+
+    # Estado completo del registro, serializable, para los snapshots
+    def state(self):
+        with self.mutex:
+            return {
+                "entries": [[origin, seq, description] for (origin, seq), description in self.entries.items()],
+                "heads": dict(self.heads),
+                "tails": dict(self.tails),
+                "floors": dict(self.floors)
+            }
+
+    # Restaurar el estado guardado por state()
+    def restore(self, state):
+        with self.mutex:
+            self.entries = OrderedDict(((origin, seq), description) for origin, seq, description in state["entries"])
+            self.heads = dict(state["heads"])
+            self.tails = dict(state["tails"])
+            self.floors = dict(state["floors"])
@@ -0,0 +1,203 @@
+import asyncio
+import heapq
+import logging
+import os
+import threading
+import time
+
+RTO_INITIAL = 1.0  # RTO antes de tener muestras de RTT (RFC 6298)
+RTO_MIN = 0.01  # Piso del RTO: en una LAN el RTT es de décimas de milisegundo
+RTO_MAX = 4.0  # Techo del RTO, por debajo del tiempo de espera de los bloqueos
+MAX_RETRANSMITS = 6  # Reenvíos de un mensaje antes de darlo por perdido
+MAX_BACKOFF = 5  # Duplicaciones máximas del RTO de un par que no responde
+DEDUP_WINDOW = 1024  # Números de secuencia por encima del acumulado que recuerda el receptor
+MAX_SACK = 32  # Secuencias fuera de orden que se informan en cada ack
+MAX_SESSIONS = 64  # Sesiones de emisor que se recuerdan por par (reinicios y workers de un mismo nodo)
+RELIABLE_TYPES = ("lock_request", "lock_response", "lock_release", "reservation", "unreserve")  # Mensajes de control que van por el canal confiable
+
+log = logging.getLogger(__name__)
+
+# Estimador de RTT y RTO por par según RFC 6298 (SRTT, RTTVAR, retroceso ante vencimientos)
+class RttEstimator:
+    def __init__(self):
+        self.srtt = None  # RTT suavizado en segundos
+        self.rttvar = None  # Variación del RTT
+        self.samples = 0
+        self.backoff = 0  # Vencimientos seguidos sin respuesta: cada uno duplica el RTO
+
+    # Incorporar una muestra de RTT (solo de mensajes que no se reenviaron)
+    def update(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.samples += 1
+        self.backoff = 0
+
+    # El par no respondió a tiempo: duplicar el RTO hasta la próxima muestra
+    def timeout(self):
+        self.backoff = min(MAX_BACKOFF, self.backoff + 1)
+
+    # RTO actual: SRTT + 4 * RTTVAR acotado, con el retroceso aplicado (hasta max_backoff duplicaciones)
+    def rto(self, max_backoff=MAX_BACKOFF):
+        if self.srtt is None:
+            return RTO_INITIAL
+        return min(RTO_MAX, max(RTO_MIN, self.srtt + 4 * self.rttvar) * 2 ** min(self.backoff, max_backoff))
+
+# Canal confiable sobre UDP: números de secuencia por par, acks selectivos, reenvío con RTO
+# adaptativo y ventana de duplicados en el receptor. Los mensajes llevan "rsid" (sesión del
+# emisor, para detectar reinicios) y "rseq"; el receptor responde con un reliable_ack.
+class ReliableChannel:
+    def __init__(self, node):
+        self.node = node
+        self.session = int.from_bytes(os.urandom(4), "big")  # Identifica esta instancia del emisor
+        self.outgoing = {}  # Par -> {"next", "unacked": seq -> [mensaje, enviado, reenvíos, temporizador]}
+        self.incoming = {}  # Par -> {sesión: [acumulado, secuencias recibidas por encima del acumulado]}
+        self.mutex = threading.Lock()
+        self.timers = []  # Revisiones de reenvío del runtime con hilos: heap de (momento, par, secuencia)
+        self.timers_ready = threading.Condition()  # Avisa al hilo de temporizadores que hay una revisión nueva
+        self.timer_thread = None  # Un solo hilo por canal atiende todas las revisiones
+        self.stats = {"sent": 0, "retransmits": 0, "acked": 0, "duplicates": 0, "gave_up": 0}
+
+    # Estado de envío hacia un par
+    def peer_state(self, peer):
+        state = self.outgoing.get(peer)
+        if state is None:
+            state = {"next": 1, "unacked": {}}
+            self.outgoing[peer] = state
+        return state
+
+    # Numerar un mensaje, registrarlo como pendiente de ack y programar su reenvío
+    def track(self, message, peer):
+        peer = tuple(peer)
+        with self.mutex:
+            state = self.peer_state(peer)
+            seq = state["next"]
+            state["next"] += 1
+            message = dict(message, rsid=self.session, rseq=seq)
+            entry = [message, self.node.now(), 0, None]
+            state["unacked"][seq] = entry
+            self.stats["sent"] += 1
+            entry[3] = self.schedule(self.retransmit_delay(peer, 0), peer, seq)
+        return message
+
+    # Espera antes del siguiente reenvío: RTO del par (o la estimación general del nodo si aún no
+    # hay muestras del par) duplicado por cada reenvío ya hecho
+    def retransmit_delay(self, peer, retransmits):
+        estimator = self.node.rtt.get(peer)
+        if estimator is None or not estimator.samples:
+            estimator = self.node.rtt_overall
+        return min(RTO_MAX, estimator.rto() * 2 ** retransmits)
+
+    # Programar una revisión de reenvío en el bucle del nodo o, en el runtime con hilos, en el heap
+    # del hilo de temporizadores del canal (sin un hilo por mensaje). Las revisiones de mensajes
+    # que ya recibieron ack no se cancelan: al vencer no encuentran nada que reenviar
+    def schedule(self, delay, peer, seq):
+        loop = self.node.loop
+        if loop is not None:
+            try:
+                on_loop = asyncio.get_running_loop() is loop
+            except RuntimeError:
+                on_loop = False
+            if on_loop:
+                return loop.call_later(delay, self.retransmit, peer, seq)
+            loop.call_soon_threadsafe(self.schedule, delay, peer, seq)
+            return None
+        with self.timers_ready:
+            heapq.heappush(self.timers, (time.monotonic() + delay, peer, seq))
+            if self.timer_thread is None:
+                self.timer_thread = threading.Thread(target=self.run_timers)
+                self.timer_thread.daemon = True
+                self.timer_thread.start()
+            self.timers_ready.notify()
+        return None
+
+    # Hilo de temporizadores (runtime con hilos): espera la revisión más próxima y la atiende
+    def run_timers(self):
+        while True:
+            with self.timers_ready:
+                while not self.timers or self.timers[0][0] > time.monotonic():
+                    self.timers_ready.wait(self.timers[0][0] - time.monotonic() if self.timers else None)
+                due = []
+                now = time.monotonic()
+                while self.timers and self.timers[0][0] <= now:
+                    due.append(heapq.heappop(self.timers))
+            for _, peer, seq in due:
+                try:
+                    self.retransmit(peer, seq)
+                except Exception:
+                    log.exception("Error al reenviar el mensaje %d a %s", seq, peer)
+
+    # Reenviar un mensaje que no recibió ack a tiempo, con retroceso exponencial por mensaje
+    def retransmit(self, peer, seq):
+        with self.mutex:
+            state = self.outgoing.get(peer)
+            entry = state["unacked"].get(seq) if state else None
+            if entry is None:
+                return
+            if entry[2] >= MAX_RETRANSMITS:
+                del state["unacked"][seq]
+                self.stats["gave_up"] += 1
+                return
+            entry[2] += 1
+            self.stats["retransmits"] += 1
+            entry[3] = self.schedule(self.retransmit_delay(peer, entry[2]), peer, seq)
+            message = entry[0]
+        self.node.transmit(message, peer)
+
+    # Mensajes enviados que todavía esperan ack
+    def pending(self):
+        with self.mutex:
+            return sum(len(state["unacked"]) for state in self.outgoing.values())
+
+    # Procesar un ack: acumulado más secuencias sueltas; solo los mensajes sin reenvío dan muestras de RTT
+    def handle_ack(self, message, addr):
+        peer = tuple(addr)
+        if message.get("rsid") != self.session:
+            return
+        now = self.node.now()
+        with self.mutex:
+            state = self.outgoing.get(peer)
+            if state is None:
+                return
+            acked = [seq for seq in state["unacked"] if seq <= message["cum"]]
+            acked.extend(seq for seq in message.get("sack", []) if seq in state["unacked"] and seq > message["cum"])
+            for seq in acked:
+                entry = state["unacked"].pop(seq)
+                if entry[2] == 0:
+                    # Algoritmo de Karn: un mensaje reenviado no da una muestra confiable
+                    self.node.record_rtt(peer, now - entry[1])
+                if entry[3] is not None:
+                    entry[3].cancel()
+                self.stats["acked"] += 1
+
+    # Registrar un mensaje recibido y confirmar; devuelve False si es un duplicado ya procesado
+    def accept(self, message, addr):
+        peer = tuple(addr)
+        session, seq = message["rsid"], message["rseq"]
+        with self.mutex:
+            sessions = self.incoming.setdefault(peer, {})
+            window = sessions.get(session)
+            if window is None:
+                # Par nuevo, reiniciado u otro worker del mismo nodo: empieza una ventana nueva
+                if len(sessions) >= MAX_SESSIONS:
+                    del sessions[next(iter(sessions))]
+                window = [0, set()]
+                sessions[session] = window
+            duplicate = seq <= window[0] or seq in window[1]
+            if not duplicate:
+                window[1].add(seq)
+                if seq > window[0] + DEDUP_WINDOW:
+                    # Demasiado adelantado: se olvida lo que quedó fuera de la ventana
+                    window[0] = seq - DEDUP_WINDOW
+                    window[1] = {received for received in window[1] if received > window[0]}
+                while window[0] + 1 in window[1]:
+                    window[0] += 1
+                    window[1].discard(window[0])
+            else:
+                self.stats["duplicates"] += 1
+            ack = {"type": "reliable_ack", "rsid": session, "cum": window[0], "sack": sorted(window[1])[:MAX_SACK]}
+        self.node.transmit(ack, peer)
+        return not duplicate
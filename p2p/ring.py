@@ -0,0 +1,61 @@
+import bisect
+import hashlib
+import zlib
+
+VNODES = 64  # Puntos de cada nodo en el anillo (reparten la carga de forma pareja)
+PARTITIONS = 1024  # Particiones del inventario en modo particionado (franjas del InventoryStore, múltiplo de DIGEST_BUCKETS)
+
+# Inventario particionado entre los nodos: cada recurso cae en una de PARTITIONS particiones
+# (crc32 del id, la misma cuenta que elige su franja en el InventoryStore, así el hash XOR de
+# cada franja es el digest de la partición) y un anillo de hash consistente con nodos
+# virtuales asigna a cada partición sus réplicas. Al sumar o quitar un nodo solo cambian de
+# dueño las particiones vecinas a sus puntos en el anillo.
+
+# Posición en el anillo de un texto (64 bits, estable entre procesos)
+def ring_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+# Partición de un recurso
+def partition_of(book_id, partitions=PARTITIONS):
+    return zlib.crc32(book_id.encode()) % partitions
+
+# Anillo de hash consistente con VNODES puntos por nodo
+class HashRing:
+    def __init__(self, members, vnodes=VNODES):
+        points = sorted((ring_hash(f"{host}:{port}#{i}"), (host, port)) for host, port in set(members) for i in range(vnodes))
+        self.hashes = [point for point, _ in points]
+        self.owners = [owner for _, owner in points]
+        self.size = len(set(members))
+
+    # Los count primeros nodos distintos que siguen a una clave en el anillo
+    def lookup(self, key, count):
+        found = []
+        if not self.owners:
+            return found
+        count = min(count, self.size)
+        start = bisect.bisect(self.hashes, ring_hash(key))
+        for i in range(len(self.owners)):
+            owner = self.owners[(start + i) % len(self.owners)]
+            if owner not in found:
+                found.append(owner)
+                if len(found) == count:
+                    break
+        return found
+
+# Réplicas de cada partición para una membresía dada, vistas desde un nodo
+class Placement:
+    def __init__(self, me, peers, replication, partitions=PARTITIONS, vnodes=VNODES):
+        ring = HashRing([me] + list(peers), vnodes)
+        self.me = me
+        self.replicas = [ring.lookup(f"partition-{partition}", replication) for partition in range(partitions)]
+        self.local = [partition for partition, replicas in enumerate(self.replicas) if me in replicas]  # Particiones que guarda este nodo
+        self.shared = {}  # Par -> particiones que guardan los dos (lo único que se sincroniza con él)
+        for partition in self.local:
+            for peer in self.replicas[partition]:
+                if peer != me:
+                    self.shared.setdefault(peer, []).append(partition)
+
+    # Otras réplicas de una partición y si este nodo es una de ellas
+    def peers_for(self, partition):
+        replicas = self.replicas[partition]
+        return [peer for peer in replicas if peer != self.me], self.me in replicas
@@ -0,0 +1,285 @@
+import array
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+from .codec import read_value, write_value
+
+# Almacenamiento durable del inventario y del registro de operaciones: un WAL de solo agregado
+# y snapshots periódicos. El snapshot guarda las columnas del inventario tal como están en
+# memoria (ids, columnas e índice hash), así que al reiniciar se mapea con mmap y se copia
+# con unas pocas operaciones de memoria, sin decodificar recurso por recurso.
+#
+# Snapshot (little endian, secciones alineadas a 8 bytes):
+#   encabezado, hashes de franja (Q), metadatos (write_value), offsets de los ids (Q),
+#   ids concatenados (UTF-8), crc32 de los ids (I), timestamps (d, NaN = disponible),
+#   dueños (i, -1 = disponible), contadores de versión (q), orígenes de versión (i),
+#   índice hash (i, fila + 1; 0 = vacío)
+# WAL: registros [largo, crc32] + write_value(["e", recurso, datos, versión] | ["o", origen, secuencia, descripción])
+
+SNAPSHOT_MAGIC = b"P2PS"
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_HEADER = struct.Struct("<4sHHQQQQQ")  # Mágico, formato, franjas, filas, segmento cubierto, largo de ids, tamaño del índice, largo de metadatos
+RECORD_HEADER = struct.Struct("<II")  # Largo y crc32 de cada registro del WAL
+CHECKPOINT_EVERY = 20000  # Registros del WAL que disparan un nuevo snapshot (acota el tiempo de reinicio)
+SNAPSHOT_NAME = re.compile(r"snapshot-(\d+)\.snap$")
+SEGMENT_NAME = re.compile(r"wal-(\d+)\.log$")
+
+log = logging.getLogger(__name__)
+
+# Relleno hasta el próximo múltiplo de 8
+def padding(size):
+    return -size % 8
+
+# Escribir un snapshot (InventorySnapshot) del inventario
+def write_snapshot(path, snapshot, stripes, segment, meta):
+    rows = snapshot.rows
+    meta_bytes = bytearray()
+    write_value(dict(meta, clock=snapshot.clock, strings=snapshot.strings), meta_bytes)
+    ids = bytes(snapshot.ids[:snapshot.offsets[rows]])
+    sections = [
+        array.array("Q", snapshot.stripe_hashes).tobytes(),
+        bytes(meta_bytes),
+        snapshot.offsets[:rows + 1].tobytes(),
+        ids,
+        snapshot.hashes.tobytes(),
+        snapshot.timestamps.tobytes(),
+        snapshot.owners.tobytes(),
+        snapshot.counters.tobytes(),
+        snapshot.origins.tobytes(),
+        snapshot.index.tobytes()
+    ]
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, stripes, rows, segment, len(ids), len(snapshot.index), len(meta_bytes)))
+        for section in sections:
+            f.write(section)
+            f.write(bytes(padding(len(section))))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+# Snapshot mapeado en memoria: expone cada sección sin copiarla hasta que el inventario la carga
+class SnapshotFile:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        try:
+            magic, version, self.stripes, self.rows, self.segment, ids_size, index_size, meta_size = SNAPSHOT_HEADER.unpack_from(self.view)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_FORMAT:
+                raise ValueError(f"{path} no es un snapshot de inventario válido")
+            self.position = SNAPSHOT_HEADER.size
+            self.stripe_hashes = list(self.section(8 * self.stripes).cast("Q"))
+            self.meta, _ = read_value(bytes(self.section(meta_size)), 0)
+            self.offsets = self.section(8 * (self.rows + 1))
+            self.ids = self.section(ids_size)
+            self.hashes = self.section(4 * self.rows)
+            self.timestamps = self.section(8 * self.rows)
+            self.owners = self.section(4 * self.rows)
+            self.counters = self.section(8 * self.rows)
+            self.origins = self.section(4 * self.rows)
+            self.index = self.section(4 * index_size)
+        except (struct.error, ValueError):
+            self.close()
+            raise
+        self.strings = self.meta["strings"]
+        self.clock = self.meta["clock"]
+
+    # Tomar la próxima sección del archivo (sin copiarla)
+    def section(self, size):
+        start = self.position
+        if start + size > len(self.view):
+            raise ValueError(f"{self.path} está truncado")
+        self.position += size + padding(size)
+        return self.view[start:start + size]
+
+    # Soltar las vistas y el mapeo
+    def close(self):
+        for name in ("offsets", "ids", "hashes", "timestamps", "owners", "counters", "origins", "index"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self.view.release()
+        self.map.close()
+
+# Log de escritura anticipada en segmentos numerados; cada snapshot cubre los segmentos anteriores
+class WriteAheadLog:
+    def __init__(self, directory, sync=False):
+        self.directory = directory
+        self.sync = sync  # fsync en cada registro (sobrevive a cortes de energía, no solo a caídas del proceso)
+        self.file = None
+        self.segment = 0
+        self.records = 0  # Registros escritos desde la última rotación
+        self.mutex = threading.RLock()
+
+    # Números de los segmentos presentes, en orden
+    def segments(self):
+        found = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_NAME.match(name)
+            if match:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    # Ruta de un segmento
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f"wal-{segment:08d}.log")
+
+    # Leer los registros de los segmentos posteriores a after; un final cortado se recorta
+    def replay(self, after):
+        for segment in self.segments():
+            if segment <= after:
+                continue
+            path = self.segment_path(segment)
+            with open(path, "rb") as f:
+                data = f.read()
+            pos = 0
+            while pos + RECORD_HEADER.size <= len(data):
+                size, crc = RECORD_HEADER.unpack_from(data, pos)
+                payload = data[pos + RECORD_HEADER.size:pos + RECORD_HEADER.size + size]
+                if len(payload) < size or zlib.crc32(payload) != crc:
+                    break
+                yield read_value(payload, 0)[0]
+                pos += RECORD_HEADER.size + size
+            if pos < len(data):
+                log.warning("WAL %s: registro incompleto al final, se descartan %d bytes", path, len(data) - pos)
+                with open(path, "r+b") as f:
+                    f.truncate(pos)
+
+    # Abrir un segmento nuevo para agregar registros
+    def open(self, segment):
+        with self.mutex:
+            if self.file is not None:
+                self.file.close()
+            self.segment = segment
+            self.file = open(self.segment_path(segment), "ab")
+            self.records = 0
+
+    # Agregar un registro al segmento actual
+    def append(self, value):
+        payload = bytearray()
+        write_value(value, payload)
+        frame = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self.mutex:
+            self.file.write(frame)
+            self.file.flush()
+            if self.sync:
+                os.fsync(self.file.fileno())
+            self.records += 1
+
+    # Pasar a un segmento nuevo; devuelve el que se cerró
+    def rotate(self):
+        with self.mutex:
+            segment = self.segment
+            self.open(segment + 1)
+            return segment
+
+    # Borrar los segmentos ya cubiertos por un snapshot
+    def discard(self, upto):
+        for segment in self.segments():
+            if segment <= upto:
+                os.remove(self.segment_path(segment))
+
+    def close(self):
+        with self.mutex:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+# Motor de almacenamiento de un nodo: recupera el estado al arrancar, registra cada cambio
+# en el WAL y escribe snapshots para que el WAL (y el tiempo de reinicio) no crezca sin límite
+class Storage:
+    def __init__(self, directory, sync=False, checkpoint_every=CHECKPOINT_EVERY):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        os.makedirs(directory, exist_ok=True)
+        self.wal = WriteAheadLog(directory, sync)
+        self.checkpoint_mutex = threading.Lock()  # Un solo snapshot a la vez
+
+    # Números de los snapshots presentes, del más nuevo al más viejo
+    def snapshots(self):
+        found = []
+        for name in os.listdir(self.directory):
+            match = SNAPSHOT_NAME.match(name)
+            if match:
+                found.append(int(match.group(1)))
+        return sorted(found, reverse=True)
+
+    # Ruta del snapshot que cubre hasta un segmento
+    def snapshot_path(self, segment):
+        return os.path.join(self.directory, f"snapshot-{segment:08d}.snap")
+
+    # Recuperar inventario y registro: el snapshot más nuevo que se pueda leer más el WAL posterior.
+    # Después de cargar, los cambios del inventario y del registro se escriben en el WAL.
+    # Devuelve los metadatos del snapshot (vacíos si no había)
+    def load(self, store, oplog):
+        meta = {}
+        covered = 0
+        for segment in self.snapshots():
+            try:
+                snapshot = SnapshotFile(self.snapshot_path(segment))
+            except (OSError, ValueError) as e:
+                log.warning("Snapshot ilegible, se prueba uno anterior: %s", e)
+                continue
+            try:
+                store.restore(snapshot)
+            finally:
+                snapshot.close()
+            oplog.restore(snapshot.meta["oplog"])
+            meta = snapshot.meta
+            covered = snapshot.segment
+            break
+        replayed = 0
+        for record in self.wal.replay(covered):
+            if record[0] == "e":
+                store.apply_remote(record[1], record[2], record[3])
+            elif record[0] == "o":
+                oplog.add(record[1], record[2], record[3])
+            replayed += 1
+        segments = self.wal.segments()
+        self.wal.open(max([covered] + segments) + 1)
+        store.journal = self
+        oplog.journal = self
+        log.info("Estado recuperado de %s: %d recursos, %d registros del WAL", self.directory, len(store), replayed)
+        return meta
+
+    # Registrar en el WAL la escritura de una entrada del inventario
+    def record_entry(self, book_id, data, version):
+        self.wal.append(["e", book_id, data, version])
+
+    # Registrar en el WAL una operación nueva del registro de actualizaciones
+    def record_op(self, origin, seq, description):
+        self.wal.append(["o", origin, seq, description])
+
+    # Hay suficientes registros en el WAL como para escribir un snapshot
+    def needs_checkpoint(self):
+        return self.wal.records >= self.checkpoint_every
+
+    # Iniciar un snapshot: todo lo escrito en el WAL hasta aquí quedará cubierto por él.
+    # Devuelve el segmento cubierto; el estado que se guarde debe tomarse después de esta llamada
+    def begin_checkpoint(self):
+        return self.wal.rotate()
+
+    # Escribir el snapshot del inventario y borrar los segmentos y snapshots que quedan cubiertos
+    def checkpoint(self, store, segment, meta):
+        with self.checkpoint_mutex:
+            path = self.snapshot_path(segment)
+            write_snapshot(path, store.snapshot(), store.stripes, segment, meta)
+            self.wal.discard(segment)
+            for older in self.snapshots():
+                if older < segment:
+                    try:
+                        os.remove(self.snapshot_path(older))
+                    except OSError:
+                        # Si otro proceso lo tiene abierto (Windows) se borra en el próximo snapshot
+                        pass
+        return path
+
+    def close(self):
+        self.wal.close()
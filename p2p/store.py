@@ -0,0 +1,644 @@
+import hashlib
+import itertools
+import math
+import threading
+import time
+import zlib
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Sin NumPy la fusión masiva aplica las entradas una por una
+
+DIGEST_BUCKETS = 16  # Cantidad de rangos de claves que se resumen en el digest de gossip
+STORE_STRIPES = 64  # Candados del inventario; múltiplo de DIGEST_BUCKETS para que cada franja caiga en un solo rango
+ZERO_VERSION = (0, "")  # Versión de las entradas que nunca se modificaron
+INITIAL_INDEX = 64  # Posiciones iniciales del índice hash (potencia de 2)
+SNAPSHOT_RETRIES = 8  # Intentos de copia sin candados antes de bloquear las escrituras
+SEED_CHUNK = 4096  # Recursos que se siembran por cada toma de los candados
+LOOKUP_CHUNK = 65536  # Recursos que se buscan juntos en el índice durante una fusión masiva (acota la memoria temporal)
+
+# Índice del rango de claves al que pertenece un recurso (estable entre procesos)
+def bucket_of(book_id):
+    return zlib.crc32(book_id.encode()) % DIGEST_BUCKETS
+
+# Hash de 64 bits de la versión de una entrada, usado para construir el digest
+def entry_hash(book_id, version):
+    digest = hashlib.blake2b(f"{book_id}|{version[0]}|{version[1]}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+# Comparar versiones [contador, origen]: True si version es más nueva que other
+def newer(version, other):
+    return (version[0], version[1]) > (other[0], other[1])
+
+# Posición libre de una fila en un índice hash con sondeo lineal
+def index_insert(index, mask, crc, row):
+    slot = crc & mask
+    while index[slot]:
+        slot = (slot + 1) & mask
+    index[slot] = row + 1
+
+# Vista inmutable del inventario en un instante: copias de las columnas y del índice, más los
+# ids y las cadenas del inventario, que solo crecen. Se usa como un dict recurso -> (datos, versión)
+class InventorySnapshot:
+    def __init__(self, store, rows, hashes, timestamps, owners, counters, origins, index, stripe_hashes, clock, strings):
+        self.ids = store.ids  # Ids concatenados (compartidos: solo se agregan al final)
+        self.offsets = store.offsets
+        self.rows = rows
+        self.hashes = hashes
+        self.timestamps = timestamps
+        self.owners = owners
+        self.counters = counters
+        self.origins = origins
+        self.index = index
+        self.mask = len(index) - 1
+        self.stripe_hashes = stripe_hashes
+        self.clock = clock
+        self.strings = strings
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        for row in range(self.rows):
+            yield self.book_id(row)
+
+    def __contains__(self, book_id):
+        return self.find(book_id) >= 0
+
+    def __getitem__(self, book_id):
+        row = self.find(book_id)
+        if row < 0:
+            raise KeyError(book_id)
+        return self.entry(row)
+
+    # Entrada (datos, versión) de un recurso, o default si no existe
+    def get(self, book_id, default=None):
+        row = self.find(book_id)
+        return default if row < 0 else self.entry(row)
+
+    # Fila de un recurso, o -1
+    def find(self, book_id):
+        raw = book_id.encode()
+        slot = zlib.crc32(raw) & self.mask
+        while True:
+            row = self.index[slot] - 1
+            if row < 0:
+                return -1
+            if self.ids[self.offsets[row]:self.offsets[row + 1]] == raw:
+                return row
+            slot = (slot + 1) & self.mask
+
+    # Id del recurso de una fila
+    def book_id(self, row):
+        return self.ids[self.offsets[row]:self.offsets[row + 1]].decode()
+
+    # Entrada (datos, versión) de una fila
+    def entry(self, row):
+        owner = self.owners[row]
+        data = None if owner < 0 else (self.timestamps[row], self.strings[owner])
+        return data, (self.counters[row], self.strings[self.origins[row]])
+
+    # Pares (recurso, (datos, versión)) de todas las filas
+    def items(self):
+        for row in range(self.rows):
+            yield self.book_id(row), self.entry(row)
+
+    # Filas de un rango del árbol de digest: las claves con crc32 % modulus == bucket
+    def range_rows(self, bucket, modulus=DIGEST_BUCKETS):
+        if np is not None:
+            return np.flatnonzero(np.frombuffer(self.hashes, dtype=np.uint32) % modulus == bucket).tolist()
+        return [row for row, crc in enumerate(self.hashes) if crc % modulus == bucket]
+
+    # Versiones de las entradas de un rango del digest
+    def bucket_versions(self, bucket, modulus=DIGEST_BUCKETS):
+        return {self.book_id(row): (self.counters[row], self.strings[self.origins[row]]) for row in self.range_rows(bucket, modulus)}
+
+    # Hash XOR y cantidad de filas de cada uno de los DIGEST_BUCKETS subrangos de un rango;
+    # el subrango j es el de residuo bucket + j * modulus sobre modulus * DIGEST_BUCKETS
+    def child_hashes(self, bucket, modulus):
+        hashes = [0] * DIGEST_BUCKETS
+        counts = [0] * DIGEST_BUCKETS
+        for row in self.range_rows(bucket, modulus):
+            child = self.hashes[row] // modulus % DIGEST_BUCKETS
+            hashes[child] ^= entry_hash(self.book_id(row), (self.counters[row], self.strings[self.origins[row]]))
+            counts[child] += 1
+        return hashes, counts
+
+    # Filas de un conjunto de franjas (particiones del modo particionado)
+    def stripe_rows(self, stripes):
+        count = len(self.stripe_hashes)
+        if np is not None:
+            return np.flatnonzero(np.isin(np.frombuffer(self.hashes, dtype=np.uint32) % count, list(stripes))).tolist()
+        stripes = set(stripes)
+        return [row for row, crc in enumerate(self.hashes) if crc % count in stripes]
+
+    # Versiones de las entradas de un conjunto de franjas
+    def stripe_versions(self, stripes):
+        return {self.book_id(row): (self.counters[row], self.strings[self.origins[row]]) for row in self.stripe_rows(stripes)}
+
+# Inventario versionado, compacto y seguro entre hilos. Cada recurso es una fila de columnas
+# paralelas (array): timestamp, dueño, contador y origen de la versión, con dueños y orígenes
+# internados como enteros chicos; los ids van concatenados en un bytearray con un índice hash
+# propio, sin un objeto Python por recurso (unos 60 bytes por recurso en total).
+# Una fila se lee y se escribe bajo el candado de su franja, así nunca se ve un dato con la
+# versión de otro, y las escrituras de franjas distintas no se bloquean entre sí. Agregar filas
+# toma además insert_lock. El gossip serializa desde snapshot(), una copia versionada: se copian
+# las columnas sin candados y se reintenta si alguna escritura se cruzó (como un seqlock).
+class InventoryStore:
+    def __init__(self, origin, book_ids=(), stripes=STORE_STRIPES):
+        self.origin = origin  # Origen de las versiones generadas localmente
+        self.ids = bytearray()  # Ids de los recursos concatenados (UTF-8)
+        self.offsets = array("Q", [0])  # Inicio del id de cada fila en ids (y el final de la última)
+        self.hashes = array("I")  # crc32 del id de cada fila (franja e índice)
+        self.timestamps = array("d")  # Momento de la reserva (NaN si está disponible)
+        self.owners = array("i")  # Dueño de la reserva en strings (-1 si está disponible)
+        self.counters = array("q")  # Contador de la versión
+        self.origins = array("i")  # Origen de la versión en strings
+        self.table = (array("i", bytes(4 * INITIAL_INDEX)), INITIAL_INDEX - 1)  # Índice hash (fila + 1; 0 = libre) y su máscara
+        self.rows = 0
+        self.strings = [""]  # Dueños y orígenes internados
+        self.string_ids = {"": 0}
+        self.stripes = stripes
+        self.locks = [threading.Lock() for _ in range(stripes)]  # Un candado por franja de claves
+        self.insert_lock = threading.Lock()  # Agregar filas (se toma antes que el de la franja)
+        self.strings_lock = threading.Lock()
+        self.stripe_hashes = [0] * stripes  # XOR de los hashes de versión de cada franja
+        self.clock = 0  # Reloj lógico para versionar las entradas
+        self.generation = 0  # Aumenta con cada escritura terminada
+        self.writing = 0  # Escrituras en curso
+        self.counter_lock = threading.Lock()  # Protege el reloj, la generación y las escrituras en curso
+        self.cached = (-1, None)  # (generación, copia) del último snapshot
+        self.journal = None  # Recibe cada escritura (record_entry) para hacerla durable
+        self.seed(book_ids)
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __contains__(self, book_id):
+        return self.find(book_id) >= 0
+
+    def __getitem__(self, book_id):
+        entry = self.lookup(book_id)
+        if entry is None:
+            raise KeyError(book_id)
+        return entry[0]
+
+    # Fila de un recurso, o -1 si no existe
+    def find(self, book_id):
+        raw = book_id.encode()
+        index, mask = self.table
+        ids, offsets = self.ids, self.offsets
+        slot = zlib.crc32(raw) & mask
+        while True:
+            row = index[slot] - 1
+            if row < 0:
+                return -1
+            if ids[offsets[row]:offsets[row + 1]] == raw:
+                return row
+            slot = (slot + 1) & mask
+
+    # Fila de un recurso, agregándolo como disponible si no existe
+    def row_for(self, book_id):
+        row = self.find(book_id)
+        if row < 0:
+            with self.insert_lock:
+                row = self.find(book_id)
+                if row < 0:
+                    row = self.append_row(book_id)
+        return row
+
+    # Agregar una fila disponible con la versión inicial (con insert_lock tomado)
+    def append_row(self, book_id):
+        self.reserve_rows(1)
+        raw = book_id.encode()
+        crc = zlib.crc32(raw)
+        with self.locks[crc % self.stripes]:
+            self.begin_write()
+            try:
+                return self.add_row(book_id, raw, crc)
+            finally:
+                self.end_write()
+
+    # Escribir la fila nueva (con insert_lock, el candado de la franja y la escritura marcada)
+    def add_row(self, book_id, raw, crc):
+        row = self.rows
+        index, mask = self.table
+        self.ids += raw
+        self.offsets.append(len(self.ids))
+        self.hashes.append(crc)
+        self.timestamps.append(math.nan)
+        self.owners.append(-1)
+        self.counters.append(ZERO_VERSION[0])
+        self.origins.append(0)
+        index_insert(index, mask, crc, row)
+        self.rows = row + 1
+        self.stripe_hashes[crc % self.stripes] ^= entry_hash(book_id, ZERO_VERSION)
+        return row
+
+    # Agrandar el índice si no entran count filas más con ocupación de hasta la mitad
+    def reserve_rows(self, count):
+        size = len(self.table[0])
+        while 2 * (self.rows + count) > size:
+            size *= 2
+        if size != len(self.table[0]):
+            self.rehash(size)
+
+    # Reconstruir el índice con más posiciones; los lectores con el índice anterior siguen siendo válidos
+    def rehash(self, size):
+        index = array("i", bytes(4 * size))
+        mask = size - 1
+        for row, crc in enumerate(self.hashes):
+            index_insert(index, mask, crc, row)
+        self.table = (index, mask)
+        return self.table
+
+    # Id interno de un dueño u origen
+    def intern(self, text):
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            with self.strings_lock:
+                string_id = self.string_ids.get(text)
+                if string_id is None:
+                    string_id = len(self.strings)
+                    self.strings.append(text)
+                    self.string_ids[text] = string_id
+        return string_id
+
+    # Marcar el inicio y el fin de una escritura, para que snapshot() detecte copias cruzadas
+    def begin_write(self):
+        with self.counter_lock:
+            self.writing += 1
+
+    def end_write(self):
+        with self.counter_lock:
+            self.writing -= 1
+            self.generation += 1
+
+    # Entrada (datos, versión) de una fila (con el candado de su franja tomado)
+    def read_row(self, row):
+        owner = self.owners[row]
+        data = None if owner < 0 else (self.timestamps[row], self.strings[owner])
+        return data, (self.counters[row], self.strings[self.origins[row]])
+
+    # Entrada (datos, versión) de un recurso; None si no existe
+    def lookup(self, book_id):
+        row = self.find(book_id)
+        if row < 0:
+            return None
+        with self.locks[self.hashes[row] % self.stripes]:
+            return self.read_row(row)
+
+    # Datos de un recurso (None si está disponible o no existe)
+    def get(self, book_id, default=None):
+        entry = self.lookup(book_id)
+        return default if entry is None else entry[0]
+
+    # Versión de un recurso, o None si no existe
+    def version(self, book_id):
+        entry = self.lookup(book_id)
+        return None if entry is None else entry[1]
+
+    # Par (datos, versión) consistente de un recurso
+    def entry(self, book_id):
+        entry = self.lookup(book_id)
+        return (None, None) if entry is None else entry
+
+    # Pares (recurso, datos) tomados de un snapshot
+    def items(self):
+        return [(book_id, entry[0]) for book_id, entry in self.snapshot().items()]
+
+    # Copia consistente del inventario; se comparte entre lectores hasta la próxima escritura
+    def snapshot(self):
+        cached_generation, snapshot = self.cached
+        if cached_generation == self.generation:
+            return snapshot
+        for _ in range(SNAPSHOT_RETRIES):
+            generation = self.generation
+            if self.writing:
+                time.sleep(0)
+                continue
+            snapshot = self.copy()
+            if not self.writing and self.generation == generation:
+                self.cached = (generation, snapshot)
+                return snapshot
+        # Escrituras continuas: copiar con todas las franjas bloqueadas (las filas nuevas también las toman)
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            generation = self.generation
+            snapshot = self.copy()
+        finally:
+            for lock in self.locks:
+                lock.release()
+        self.cached = (generation, snapshot)
+        return snapshot
+
+    # Copiar columnas, índice y hashes tal como están
+    def copy(self):
+        rows = self.rows
+        return InventorySnapshot(self, rows,
+                                 self.hashes[:rows],
+                                 self.timestamps[:rows],
+                                 self.owners[:rows],
+                                 self.counters[:rows],
+                                 self.origins[:rows],
+                                 array("i", self.table[0]),
+                                 list(self.stripe_hashes),
+                                 self.clock,
+                                 list(self.strings))
+
+    # Versiones de las entradas de un rango del digest
+    def bucket_versions(self, bucket, snapshot=None, modulus=DIGEST_BUCKETS):
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        return snapshot.bucket_versions(bucket, modulus)
+
+    # Versiones de las entradas de un conjunto de franjas
+    def stripe_versions(self, stripes, snapshot=None):
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        return snapshot.stripe_versions(stripes)
+
+    # Hash XOR de cada rango del digest
+    def bucket_hashes(self):
+        hashes = [0] * DIGEST_BUCKETS
+        for stripe, stripe_hash in enumerate(self.stripe_hashes):
+            hashes[stripe % DIGEST_BUCKETS] ^= stripe_hash
+        return hashes
+
+    # Raíz del digest: XOR de los hashes de todas las franjas, o solo de las indicadas
+    def digest_root(self, stripes=None):
+        root = 0
+        for stripe_hash in (self.stripe_hashes if stripes is None else (self.stripe_hashes[stripe] for stripe in stripes)):
+            root ^= stripe_hash
+        return f"{root:016x}"
+
+    # Agregar recursos disponibles con la versión inicial; no son cambios, así que no van al journal.
+    # Se agregan por tandas con todas las franjas tomadas, para no pagar los candados por recurso
+    def seed(self, book_ids):
+        added = 0
+        book_ids = iter(book_ids)
+        while True:
+            chunk = list(itertools.islice(book_ids, SEED_CHUNK))
+            if not chunk:
+                return added
+            with self.insert_lock:
+                self.reserve_rows(len(chunk))
+                for lock in self.locks:
+                    lock.acquire()
+                self.begin_write()
+                try:
+                    for book_id in chunk:
+                        if self.find(book_id) < 0:
+                            raw = book_id.encode()
+                            self.add_row(book_id, raw, zlib.crc32(raw))
+                            added += 1
+                finally:
+                    self.end_write()
+                    for lock in self.locks:
+                        lock.release()
+
+    # Escribir una entrada; sin versión se genera una local nueva. Devuelve la versión escrita
+    def set(self, book_id, data, version=None):
+        row = self.row_for(book_id)
+        with self.locks[self.hashes[row] % self.stripes]:
+            return self.write(row, book_id, data, version)
+
+    # Aplicar una entrada remota solo si su versión es más nueva que la local (último escritor gana)
+    def apply_remote(self, book_id, data, version):
+        row = self.row_for(book_id)
+        with self.locks[self.hashes[row] % self.stripes]:
+            if not newer(version, (self.counters[row], self.strings[self.origins[row]])):
+                return False
+            self.write(row, book_id, data, version)
+            return True
+
+    # Reemplazar los datos solo si siguen siendo los esperados; devuelve la nueva versión o None
+    def compare_and_set(self, book_id, expected, data):
+        if expected is not None:
+            expected = tuple(expected)
+        row = self.find(book_id)
+        if row < 0:
+            return None
+        with self.locks[self.hashes[row] % self.stripes]:
+            if self.read_row(row)[0] != expected:
+                return None
+            return self.write(row, book_id, data, None)
+
+    # Escritura de una fila con el candado de su franja tomado: columnas, digest y journal
+    def write(self, row, book_id, data, version):
+        owner = -1 if data is None else self.intern(data[1])
+        with self.counter_lock:
+            if version is None:
+                self.clock += 1
+                version = (self.clock, self.origin)
+            else:
+                version = (version[0], version[1])
+                self.clock = max(self.clock, version[0])
+        origin = self.intern(version[1])
+        stripe = self.hashes[row] % self.stripes
+        self.begin_write()
+        try:
+            self.stripe_hashes[stripe] ^= entry_hash(book_id, (self.counters[row], self.strings[self.origins[row]])) ^ entry_hash(book_id, version)
+            self.timestamps[row] = math.nan if data is None else data[0]
+            self.owners[row] = owner
+            self.counters[row] = version[0]
+            self.origins[row] = origin
+        finally:
+            self.end_write()
+        if self.journal is not None:
+            self.journal.record_entry(book_id, None if data is None else (data[0], data[1]), version)
+        return version
+
+    # Aplicar muchas entradas remotas {recurso: (datos, versión)} con último escritor gana.
+    # Con NumPy la comparación de versiones y la escritura de columnas se hacen por franja en
+    # operaciones vectorizadas; solo las filas que cambian pasan por Python (digest y journal).
+    # Devuelve los recursos que cambiaron
+    def merge(self, entries):
+        if not entries:
+            return []
+        if np is None:
+            return [book_id for book_id, (data, version) in entries.items() if self.apply_remote(book_id, data, version)]
+        book_ids = list(entries)
+        values = list(entries.values())
+        remote_times = np.array([math.nan if data is None else data[0] for data, _ in values], dtype=np.float64)
+        remote_counters = np.array([version[0] for _, version in values], dtype=np.int64)
+        remote_origins = np.array([self.intern(version[1]) for _, version in values], dtype=np.int32)
+
+        # Gana la versión más nueva; los empates de contador los decide el origen (pocos casos, se comparan las cadenas)
+        def winners(picked, targets, columns):
+            local_counters = columns[2][targets]
+            local_origins = columns[3][targets]
+            won = picked[remote_counters[picked] > local_counters]
+            tied = (remote_counters[picked] == local_counters) & (remote_origins[picked] != local_origins)
+            if tied.any():
+                won_ties = [i for i, origin in zip(picked[tied].tolist(), local_origins[tied].tolist()) if self.strings[remote_origins[i]] > self.strings[origin]]
+                won = np.concatenate((won, np.array(won_ties, dtype=np.int64)))
+            return won
+
+        return self.merge_columns(book_ids, [data for data, _ in values], remote_times, winners, remote_counters, remote_origins)
+
+    # Aplicar muchas entradas sin versión {recurso: datos} con el criterio por timestamp de los
+    # nodos anteriores a las versiones: se toma el dato remoto si el local está disponible o si
+    # el remoto es más reciente. Las entradas que ganan reciben una versión local nueva.
+    # Devuelve los recursos que cambiaron
+    def merge_timestamps(self, entries):
+        if not entries:
+            return []
+        if np is None:
+            changed = []
+            for book_id, data in entries.items():
+                row = self.row_for(book_id)
+                if data is None:
+                    continue
+                with self.locks[self.hashes[row] % self.stripes]:
+                    current = self.read_row(row)[0]
+                    if current is None or current[0] < data[0]:
+                        self.write(row, book_id, data, None)
+                        changed.append(book_id)
+            return changed
+        book_ids = list(entries)
+        values = list(entries.values())
+        remote_times = np.array([math.nan if data is None else data[0] for data in values], dtype=np.float64)
+
+        # Con NaN en los disponibles: un remoto disponible nunca gana y un local disponible siempre pierde
+        def winners(picked, targets, columns):
+            local_times = columns[0][targets]
+            times = remote_times[picked]
+            return picked[~np.isnan(times) & ((columns[1][targets] < 0) | (local_times < times))]
+
+        return self.merge_columns(book_ids, values, remote_times, winners)
+
+    # Filas de muchos recursos, agregando como disponibles los que no existen (con insert_lock
+    # tomado). El sondeo del índice y la comparación de los ids se hacen en bloque con NumPy
+    def rows_for(self, book_ids):
+        rows = np.full(len(book_ids), -1, dtype=np.int64)
+        for start in range(0, len(book_ids), LOOKUP_CHUNK):
+            rows[start:start + LOOKUP_CHUNK] = self.find_rows(book_ids[start:start + LOOKUP_CHUNK])
+        for i in np.flatnonzero(rows < 0).tolist():
+            rows[i] = self.append_row(book_ids[i])
+        return rows
+
+    # Buscar un grupo de recursos en el índice con sondeo lineal vectorizado; -1 si no existe
+    def find_rows(self, book_ids):
+        raws = [book_id.encode() for book_id in book_ids]
+        crcs = np.fromiter(map(zlib.crc32, raws), dtype=np.uint32, count=len(raws))
+        lengths = np.fromiter(map(len, raws), dtype=np.int64, count=len(raws))
+        starts = np.cumsum(lengths) - lengths
+        remote_ids = np.frombuffer(b"".join(raws), dtype=np.uint8)
+        rows = np.full(len(raws), -1, dtype=np.int64)
+        index, mask = self.table
+        index = np.frombuffer(index, dtype=np.int32)
+        ids = np.frombuffer(self.ids, dtype=np.uint8)
+        offsets = np.frombuffer(self.offsets, dtype=np.int64)
+        hashes = np.frombuffer(self.hashes, dtype=np.uint32)
+        pending = np.arange(len(raws))
+        slots = crcs.astype(np.int64) & mask
+        while len(pending):
+            candidates = index[slots].astype(np.int64) - 1
+            # Una posición vacía termina la búsqueda: el recurso no existe
+            probing = candidates >= 0
+            pending, slots, candidates = pending[probing], slots[probing], candidates[probing]
+            sizes = offsets[candidates + 1] - offsets[candidates]
+            same = (hashes[candidates] == crcs[pending]) & (sizes == lengths[pending])
+            found = np.zeros(len(pending), dtype=bool)
+            if same.any():
+                # Comparar los bytes de los ids candidatos con los buscados, todos juntos
+                same = np.flatnonzero(same)
+                keys, rows_same = pending[same], candidates[same]
+                size = lengths[keys]
+                position = np.arange(int(size.sum())) - np.repeat(np.cumsum(size) - size, size)
+                differs = ids[np.repeat(offsets[rows_same], size) + position] != remote_ids[np.repeat(starts[keys], size) + position]
+                matched = np.bincount(np.repeat(np.arange(len(keys)), size), weights=differs, minlength=len(keys)) == 0
+                rows[keys[matched]] = rows_same[matched]
+                found[same[matched]] = True
+            pending, slots = pending[~found], (slots[~found] + 1) & mask
+        del index, ids, offsets, hashes
+        return rows
+
+    # Parte común de las fusiones masivas: busca las filas, las agrupa por franja y, con el
+    # candado de cada franja, elige las ganadoras con winners(índices, filas, columnas) y escribe
+    # sus columnas de una vez. Sin versiones remotas, las ganadoras reciben contadores locales consecutivos
+    def merge_columns(self, book_ids, values, remote_times, winners, remote_counters=None, remote_origins=None):
+        remote_owners = np.array([-1 if data is None else self.intern(data[1]) for data in values], dtype=np.int32)
+        local_origin = self.intern(self.origin)
+        changed = []
+        with self.insert_lock:
+            rows = self.rows_for(book_ids)
+            # Con insert_lock tomado no se agregan filas, así que las vistas sobre las columnas son válidas
+            columns = (
+                np.frombuffer(self.timestamps, dtype=np.float64),
+                np.frombuffer(self.owners, dtype=np.int32),
+                np.frombuffer(self.counters, dtype=np.int64),
+                np.frombuffer(self.origins, dtype=np.int32)
+            )
+            timestamps, owners, counters, origins = columns
+            stripes = np.frombuffer(self.hashes, dtype=np.uint32)[rows] % self.stripes
+            order = np.argsort(stripes, kind="stable")
+            bounds = np.searchsorted(stripes[order], np.arange(self.stripes + 1))
+            for stripe in range(self.stripes):
+                picked = order[bounds[stripe]:bounds[stripe + 1]]
+                if not len(picked):
+                    continue
+                with self.locks[stripe]:
+                    won = winners(picked, rows[picked], columns)
+                    if not len(won):
+                        continue
+                    targets = rows[won]
+                    if remote_counters is None:
+                        with self.counter_lock:
+                            new_counters = np.arange(self.clock + 1, self.clock + 1 + len(won), dtype=np.int64)
+                            self.clock += len(won)
+                        new_origins = np.full(len(won), local_origin, dtype=np.int32)
+                    else:
+                        new_counters = remote_counters[won]
+                        new_origins = remote_origins[won]
+                        with self.counter_lock:
+                            self.clock = max(self.clock, int(new_counters.max()))
+                    old_versions = list(zip(counters[targets].tolist(), origins[targets].tolist()))
+                    versions = [(counter, self.strings[origin]) for counter, origin in zip(new_counters.tolist(), new_origins.tolist())]
+                    self.begin_write()
+                    try:
+                        timestamps[targets] = remote_times[won]
+                        owners[targets] = remote_owners[won]
+                        counters[targets] = new_counters
+                        origins[targets] = new_origins
+                        stripe_hash = self.stripe_hashes[stripe]
+                        for i, (old_counter, old_origin), version in zip(won.tolist(), old_versions, versions):
+                            stripe_hash ^= entry_hash(book_ids[i], (old_counter, self.strings[old_origin])) ^ entry_hash(book_ids[i], version)
+                        self.stripe_hashes[stripe] = stripe_hash
+                    finally:
+                        self.end_write()
+                    for i, version in zip(won.tolist(), versions):
+                        data = values[i]
+                        changed.append(book_ids[i])
+                        if self.journal is not None:
+                            self.journal.record_entry(book_ids[i], None if data is None else (data[0], data[1]), version)
+            del columns, timestamps, owners, counters, origins
+        return changed
+
+    # Cargar el contenido de un snapshot en disco en un inventario vacío (al reiniciar)
+    def restore(self, snapshot):
+        with self.insert_lock:
+            if self.rows:
+                raise ValueError("Solo se puede cargar un snapshot en un inventario vacío")
+            if snapshot.stripes != self.stripes:
+                raise ValueError(f"El snapshot usa {snapshot.stripes} franjas y el inventario {self.stripes}")
+            columns = []
+            for code, data in (("Q", snapshot.offsets), ("I", snapshot.hashes), ("d", snapshot.timestamps), ("i", snapshot.owners), ("q", snapshot.counters), ("i", snapshot.origins), ("i", snapshot.index)):
+                column = array(code)
+                column.frombytes(data)
+                columns.append(column)
+            self.offsets, self.hashes, self.timestamps, self.owners, self.counters, self.origins, index = columns
+            self.ids = bytearray(snapshot.ids)
+            self.table = (index, len(index) - 1)
+            self.rows = snapshot.rows
+            self.strings = list(snapshot.strings)
+            self.string_ids = {text: string_id for string_id, text in enumerate(self.strings)}
+            self.stripe_hashes = list(snapshot.stripe_hashes)
+            with self.counter_lock:
+                self.clock = max(self.clock, snapshot.clock)
+                self.generation += 1
@@ -0,0 +1,296 @@
+import errno
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None  # Sin ctypes los datagramas se envían de a uno con sendto
+
+FRAGMENT_MAGIC = 0xF7  # Primer byte de un fragmento de un mensaje grande
+FRAGMENT_HEADER = struct.Struct("!BIHHI")  # Mágico, id de mensaje, índice, cantidad de fragmentos, largo total
+FRAGMENT_PAYLOAD = 1200  # Bytes de mensaje por fragmento (entra en la MTU típica)
+RECV_BUFFER = 65535  # Tamaño máximo de un datagrama recibido
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024  # Tamaño máximo de un mensaje reensamblado
+MAX_PENDING_PER_SENDER = 16  # Mensajes incompletos que se guardan por remitente
+REASSEMBLY_TIMEOUT = 5  # Segundos para completar un mensaje antes de descartarlo
+SEND_BATCH = 1024  # Datagramas por llamada a sendmmsg (UIO_MAXIOV en Linux)
+MAX_ADDRESSES = 4096  # Direcciones sockaddr_in que se guardan armadas para los envíos en lote
+MIN_BATCH = 32  # Datagramas desde los que sendmmsg conviene (por debajo pesa más armar el lote que las llamadas)
+RECV_BATCH = 256  # Datagramas que se leen del socket por cada despertar del hilo receptor
+RECV_QUEUE = 4096  # Mensajes que admite cada cola de recepción antes de descartar los que llegan
+SOCKET_RCVBUF = 4 * 1024 * 1024  # Buffer de recepción que se pide al kernel para absorber ráfagas
+RECV_FLAGS = getattr(socket, "MSG_DONTWAIT", 0)  # Lectura sin bloqueo por llamada (0 si el sistema no la tiene)
+
+# Dividir un mensaje codificado en fragmentos si no entra en un datagrama
+def fragment(data, message_id):
+    if len(data) <= FRAGMENT_PAYLOAD:
+        return [data]
+    view = memoryview(data)
+    count = -(-len(data) // FRAGMENT_PAYLOAD)
+    return [
+        FRAGMENT_HEADER.pack(FRAGMENT_MAGIC, message_id, index, count, len(data)) + view[index * FRAGMENT_PAYLOAD:(index + 1) * FRAGMENT_PAYLOAD]
+        for index in range(count)
+    ]
+
+# Reensamblado de mensajes fragmentados con buffers acotados por remitente
+class Reassembler:
+    def __init__(self, timeout=REASSEMBLY_TIMEOUT, max_pending=MAX_PENDING_PER_SENDER, max_bytes=MAX_MESSAGE_BYTES):
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.pending = {}  # remitente -> OrderedDict(id de mensaje -> mensaje en construcción)
+        self.completed = OrderedDict()  # (remitente, id) de los últimos mensajes completos, para ignorar fragmentos repetidos
+        self.dropped = 0  # Mensajes descartados por vencidos, inválidos o por falta de espacio
+        self.last_purge = time.monotonic()
+
+    # Agregar un fragmento; devuelve el mensaje completo (bytearray) o None si todavía faltan partes
+    def add(self, data, sender):
+        now = time.monotonic()
+        if now - self.last_purge > self.timeout:
+            self.purge(now)
+        _, message_id, index, count, total = FRAGMENT_HEADER.unpack_from(data)
+        if total > self.max_bytes or count != -(-total // FRAGMENT_PAYLOAD) or index >= count:
+            self.dropped += 1
+            return None
+        if (sender, message_id) in self.completed:
+            return None
+        messages = self.pending.setdefault(sender, OrderedDict())
+        entry = messages.get(message_id)
+        if entry is None or entry["total"] != total:
+            if len(messages) >= self.max_pending:
+                messages.popitem(last=False)
+                self.dropped += 1
+            # El buffer se reserva una sola vez y cada fragmento se copia directo a su lugar
+            buffer = bytearray(total)
+            entry = {"buffer": buffer, "view": memoryview(buffer), "received": bytearray(count), "missing": count, "total": total, "deadline": now + self.timeout}
+            messages[message_id] = entry
+        if entry["received"][index]:
+            return None
+        chunk = memoryview(data)[FRAGMENT_HEADER.size:]
+        offset = index * FRAGMENT_PAYLOAD
+        if len(chunk) != min(FRAGMENT_PAYLOAD, total - offset):
+            self.dropped += 1
+            return None
+        entry["view"][offset:offset + len(chunk)] = chunk
+        entry["received"][index] = 1
+        entry["missing"] -= 1
+        if entry["missing"]:
+            return None
+        del messages[message_id]
+        if not messages:
+            del self.pending[sender]
+        self.completed[(sender, message_id)] = True
+        if len(self.completed) > 1024:
+            self.completed.popitem(last=False)
+        entry["view"].release()
+        return entry["buffer"]
+
+    # Descartar los mensajes incompletos que vencieron
+    def purge(self, now):
+        self.last_purge = now
+        for sender in list(self.pending):
+            messages = self.pending[sender]
+            for message_id in [key for key, entry in messages.items() if entry["deadline"] <= now]:
+                messages[message_id]["view"].release()
+                del messages[message_id]
+                self.dropped += 1
+            if not messages:
+                del self.pending[sender]
+
+# sendmmsg(2) de la libc (Linux). Los encabezados (struct mmsghdr) y los vectores (struct iovec)
+# se empaquetan con struct en un bytearray; las estructuras de ctypes solo dan la distribución
+# de los campos de la plataforma
+sendmmsg = None
+if ctypes is not None and sys.platform.startswith("linux"):
+    class MessageHeader(ctypes.Structure):
+        _fields_ = [
+            ("name", ctypes.c_void_p),
+            ("namelen", ctypes.c_uint32),
+            ("iov", ctypes.c_void_p),
+            ("iovlen", ctypes.c_size_t),
+            ("control", ctypes.c_void_p),
+            ("controllen", ctypes.c_size_t),
+            ("flags", ctypes.c_int)
+        ]
+
+    class MultiMessageHeader(ctypes.Structure):
+        _fields_ = [("header", MessageHeader), ("length", ctypes.c_uint)]
+
+    # Nombre, largo del nombre, vector, cantidad de vectores, control, largo del control, flags y largo enviado
+    MMSG_HEADER = struct.Struct("@PIPNPNi%dxI%dx" % (
+        ctypes.sizeof(MessageHeader) - struct.calcsize("@PIPNPNi"),
+        ctypes.sizeof(MultiMessageHeader) - ctypes.sizeof(MessageHeader) - struct.calcsize("I")
+    ))
+    IOVEC = struct.Struct("@PN")  # Dirección y largo de un buffer
+    SOCKADDR_IN = struct.Struct("=H")  # Familia en orden del host; puerto e IP siguen en orden de red
+    try:
+        if MMSG_HEADER.size != ctypes.sizeof(MultiMessageHeader):
+            raise AttributeError("distribución de mmsghdr inesperada")
+        sendmmsg = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True).sendmmsg
+        sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+        sendmmsg.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        sendmmsg = None
+
+# Envío en lote de datagramas UDP con sendmmsg: todo el lote sale con una llamada al sistema
+# cada SEND_BATCH datagramas. Los datagramas repetidos (el mismo mensaje a muchos pares)
+# comparten el buffer y su vector, y las direcciones de los pares se arman una sola vez
+class BatchSender:
+    def __init__(self, sock):
+        self.sock = sock
+        self.addresses = {}  # Par -> (sockaddr_in armada, su dirección en memoria)
+        self.stats = {"datagrams": 0, "syscalls": 0, "errors": 0}
+
+    # sockaddr_in armada de un par: (buffer, su dirección en memoria). No descarta nada del
+    # caché: eso solo se hace entre lotes, con ningún encabezado apuntando a los buffers
+    def address(self, peer):
+        entry = self.addresses.get(peer)
+        if entry is None:
+            host, port = peer
+            packed = SOCKADDR_IN.pack(socket.AF_INET) + struct.pack("!H", port) + socket.inet_aton(socket.gethostbyname(host)) + bytes(8)
+            buffer = ctypes.create_string_buffer(packed, len(packed))
+            entry = (buffer, ctypes.addressof(buffer))
+            self.addresses[peer] = entry
+        return entry
+
+    # Enviar [(datagrama, par)]; devuelve cuántos salieron (menos que todos solo si el socket
+    # no bloqueante se llenó: el resto queda para el transporte). Un datagrama que el sistema
+    # rechaza (par inalcanzable) se descarta sin frenar a los demás, como con sendto en UDP
+    def send(self, packets):
+        sent = 0
+        while sent < len(packets):
+            batch = packets[sent:sent + SEND_BATCH]
+            count = len(batch)
+            datagrams = {}  # id del datagrama -> posición de su vector
+            buffers = []
+            for datagram, _ in batch:
+                if id(datagram) not in datagrams:
+                    datagrams[id(datagram)] = len(buffers)
+                    buffers.append(bytes(datagram))
+            vectors = bytearray(IOVEC.size * len(buffers))
+            for i, buffer in enumerate(buffers):
+                IOVEC.pack_into(vectors, i * IOVEC.size, ctypes.cast(ctypes.c_char_p(buffer), ctypes.c_void_p).value, len(buffer))
+            vectors_view = (ctypes.c_char * len(vectors)).from_buffer(vectors)
+            vectors_address = ctypes.addressof(vectors_view)
+            if len(self.addresses) >= MAX_ADDRESSES:
+                self.addresses.clear()
+            # Las sockaddr del lote quedan referenciadas aquí hasta que vuelve sendmmsg
+            addresses = [self.address(peer if type(peer) is tuple else tuple(peer)) for _, peer in batch]
+            headers = bytearray(MMSG_HEADER.size * count)
+            pack, size = MMSG_HEADER.pack_into, MMSG_HEADER.size
+            for i, (datagram, _) in enumerate(batch):
+                pack(headers, i * size, addresses[i][1], 16, vectors_address + datagrams[id(datagram)] * IOVEC.size, 1, 0, 0, 0, 0)
+            headers_view = (ctypes.c_char * len(headers)).from_buffer(headers)
+            result = sendmmsg(self.sock.fileno(), headers_view, count, 0)
+            del headers_view, vectors_view, addresses
+            self.stats["syscalls"] += 1
+            if result < 0:
+                error = ctypes.get_errno()
+                if error == errno.EINTR:
+                    continue
+                if error in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS):
+                    break
+                self.stats["errors"] += 1
+                result = 1
+            else:
+                self.stats["datagrams"] += result
+            sent += result
+        return sent
+
+# Enviador en lote para un socket, o None si el sistema no tiene sendmmsg
+def batch_sender(sock):
+    if sendmmsg is None or sock is None or sock.family != socket.AF_INET:
+        return None
+    return BatchSender(sock)
+
+# Pedir al kernel un buffer de recepción grande; devuelve el tamaño que concedió
+# (Linux lo limita a net.core.rmem_max y reporta el doble de lo pedido)
+def set_receive_buffer(sock, size=SOCKET_RCVBUF):
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+    except OSError:
+        pass
+    return sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+# Leer del socket lo que ya está en el buffer, sin bloquear, hasta completar un lote de
+# limit datagramas; batch trae el primero, que se esperó con una lectura bloqueante
+def drain_socket(sock, batch, limit=RECV_BATCH):
+    if not RECV_FLAGS:
+        return batch
+    try:
+        while len(batch) < limit:
+            batch.append(sock.recvfrom(RECV_BUFFER, RECV_FLAGS))
+    except (BlockingIOError, InterruptedError):
+        pass
+    return batch
+
+# Datagramas que el kernel descartó en un socket por tener lleno el buffer de recepción
+# (columna drops de /proc/net/udp); None si el sistema no lo informa
+def kernel_drops(sock):
+    try:
+        inode = str(os.fstat(sock.fileno()).st_ino)
+        with open("/proc/net/udp") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 12 and fields[9] == inode:
+                    return int(fields[12])
+    except (OSError, ValueError):
+        pass
+    return None
+
+# Colas de recepción acotadas, una por carril de prioridad: cada carril se atiende aparte,
+# así los mensajes de control nunca esperan detrás de una fusión grande de inventario.
+# Si un carril está lleno se descarta lo que llega (el gossip se repara en la ronda
+# siguiente y el canal confiable reenvía) y se cuenta
+class ReceiveQueue:
+    def __init__(self, lanes, capacity=RECV_QUEUE):
+        self.capacity = capacity
+        self.lanes = {lane: deque() for lane in lanes}
+        self.dropped = dict.fromkeys(lanes, 0)  # Mensajes descartados por carril
+        self.mutex = threading.Lock()
+        self.ready = {lane: threading.Condition(self.mutex) for lane in lanes}
+
+    # Encolar mensajes en un carril; devuelve cuántos se descartaron por falta de lugar
+    def put(self, lane, items):
+        with self.mutex:
+            queue = self.lanes[lane]
+            room = self.capacity - len(queue)
+            queue.extend(items[:room])
+            dropped = max(0, len(items) - room)
+            self.dropped[lane] += dropped
+            self.ready[lane].notify()
+        return dropped
+
+    # Sacar hasta limit mensajes de un carril; con block espera a que haya alguno
+    def take(self, lane, limit=RECV_BATCH, block=True):
+        with self.mutex:
+            queue = self.lanes[lane]
+            while block and not queue:
+                self.ready[lane].wait()
+            return [queue.popleft() for _ in range(min(limit, len(queue)))]
+
+    # Mensajes pendientes en un carril
+    def depth(self, lane):
+        return len(self.lanes[lane])
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.lanes.values())
+
+# Función para obtener la IP local de la máquina
+def get_local_ip():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(("8.8.8.8", 80))
+        local_ip = s.getsockname()[0]
+    except Exception:
+        local_ip = "127.0.0.1"
+    finally:
+        s.close()
+    return local_ip
@@ -0,0 +1,58 @@
+import os
+import socket
+import struct
+import tempfile
+import zlib
+
+from .transport import set_receive_buffer
+
+# Nodo lógico repartido en varios procesos (workers) que comparten el puerto con SO_REUSEPORT:
+# el kernel reparte los datagramas entre los sockets según la dirección de origen, y cada
+# worker guarda solo los recursos de su franja (hash del id). Lo que llega a un worker que no
+# es el dueño se reenvía al que corresponde por un socket Unix de datagramas; el dueño
+# responde directamente al par desde el puerto compartido.
+
+FORWARD_MAGIC = 0xF8  # Primer byte de un mensaje reenviado entre workers
+FORWARD_HEADER = struct.Struct("!B4sHB")  # Mágico, IP y puerto del par que lo envió, marcas
+FORWARD_ENCODED = 1  # El mensaje se volvió a codificar en binario (no es el datagrama original del par)
+
+# Worker dueño de un recurso; usa los bits altos del crc32 para no coincidir con las franjas
+# de bloqueo ni con los buckets del digest, que usan los bajos
+def shard_of(book_id, workers):
+    return (zlib.crc32(book_id.encode()) >> 16) % workers
+
+# Socket UDP del nodo compartido entre los workers
+def reuseport_socket(host, port):
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise OSError("Este sistema no admite SO_REUSEPORT: no se puede repartir un nodo en varios procesos")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+# Envolver un mensaje para reenviarlo a otro worker con la dirección del par que lo envió
+def wrap_forward(data, addr, flags=0):
+    return FORWARD_HEADER.pack(FORWARD_MAGIC, socket.inet_aton(addr[0]), addr[1], flags) + data
+
+# Abrir un mensaje reenviado: devuelve (datos, dirección del par, marcas)
+def unwrap_forward(data):
+    magic, ip, port, flags = FORWARD_HEADER.unpack_from(data)
+    if magic != FORWARD_MAGIC:
+        raise ValueError("Mensaje reenviado entre workers con formato desconocido")
+    return data[FORWARD_HEADER.size:], (socket.inet_ntoa(ip), port), flags
+
+# Ruta del socket de reenvío de un worker
+def forward_path(host, port, worker):
+    return os.path.join(tempfile.gettempdir(), f"p2p-{host}-{port}-w{worker}.sock")
+
+# Socket Unix por el que un worker recibe los mensajes que le reenvían los demás
+def forward_socket(host, port, worker):
+    path = forward_path(host, port, worker)
+    try:
+        os.unlink(path)  # Restos de una ejecución anterior
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    set_receive_buffer(sock)
+    return sock